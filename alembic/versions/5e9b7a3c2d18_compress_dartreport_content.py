@@ -0,0 +1,93 @@
+"""Compress DartReport contents
+
+Revision ID: 5e9b7a3c2d18
+Revises: c41f0e9a7d25
+Create Date: 2026-10-19 14:21:05.518203
+
+"""
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5e9b7a3c2d18'
+down_revision = 'c41f0e9a7d25'
+branch_labels = None
+depends_on = None
+
+#: Number of rows to be converted at a time, so that we don't hold every
+#: report in memory
+BATCH_SIZE = 500
+
+
+def compress(value):
+    return None if value is None else zlib.compress(value.encode('utf-8'), 6)
+
+
+def decompress(value):
+    return None if value is None else zlib.decompress(value).decode('utf-8')
+
+
+def convert(source, target, func):
+    """Fills `target` with `func(source)` for every row, in batches ordered by
+    their IDs."""
+    table = sa.table('dart_report', sa.column('id', sa.BigInteger),
+                     sa.column(source), sa.column(target))
+    update = table.update() \
+        .where(table.c.id == sa.bindparam('_id')) \
+        .values({target: sa.bindparam('_value')})
+    conn = op.get_bind()
+    last_id = None
+    while True:
+        query = sa.select([table.c.id, table.c[source]]) \
+            .order_by(table.c.id).limit(BATCH_SIZE)
+        if last_id is not None:
+            query = query.where(table.c.id > last_id)
+        rows = conn.execute(query).fetchall()
+        if not rows:
+            break
+        conn.execute(update, [{'_id': id_, '_value': func(value)}
+                              for id_, value in rows])
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    # Search vectors are maintained by the application from now on, as the
+    # database cannot read compressed contents
+    op.execute('DROP TRIGGER dart_report_search_vector_update ON dart_report')
+    op.execute('DROP FUNCTION dart_report_search_vector_update()')
+
+    op.add_column('dart_report',
+                  sa.Column('compressed_content', sa.LargeBinary()))
+    convert('content', 'compressed_content', compress)
+    op.drop_column('dart_report', 'content')
+    op.alter_column('dart_report', 'compressed_content',
+                    new_column_name='content')
+
+
+def downgrade():
+    op.add_column('dart_report', sa.Column('text_content', sa.Text()))
+    convert('content', 'text_content', decompress)
+    op.drop_column('dart_report', 'content')
+    op.alter_column('dart_report', 'text_content', new_column_name='content')
+
+    # NOTE: Same as in c41f0e9a7d25
+    op.execute("""
+        CREATE OR REPLACE FUNCTION dart_report_search_vector_update()
+        RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('simple', concat_ws(
+                    ' ', NEW.title, NEW.entity)), 'A') ||
+                setweight(to_tsvector(
+                    'simple', left(coalesce(NEW.content, ''), 200000)), 'B');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER dart_report_search_vector_update
+        BEFORE INSERT OR UPDATE OF title, entity, content ON dart_report
+        FOR EACH ROW EXECUTE PROCEDURE dart_report_search_vector_update()
+    """)
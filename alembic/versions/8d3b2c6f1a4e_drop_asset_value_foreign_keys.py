@@ -0,0 +1,30 @@
+"""Drop foreign keys of AssetValue so that it may live in a separate database
+
+Revision ID: 8d3b2c6f1a4e
+Revises: 3127ef2df8ce
+Create Date: 2026-10-19 10:12:41.518243
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '8d3b2c6f1a4e'
+down_revision = '3127ef2df8ce'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_constraint(
+        'asset_value_asset_id_fkey', 'asset_value', type_='foreignkey')
+    op.drop_constraint(
+        'asset_value_base_asset_id_fkey', 'asset_value', type_='foreignkey')
+
+
+def downgrade():
+    op.create_foreign_key(
+        'asset_value_asset_id_fkey', 'asset_value', 'asset', ['asset_id'],
+        ['id'])
+    op.create_foreign_key(
+        'asset_value_base_asset_id_fkey', 'asset_value', 'asset',
+        ['base_asset_id'], ['id'])
@@ -0,0 +1,24 @@
+"""Add delisted_at field to Asset
+
+Revision ID: a7c3e51d9b62
+Revises: 5e9b7a3c2d18
+Create Date: 2026-10-19 16:42:10.730118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e51d9b62'
+down_revision = '5e9b7a3c2d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('asset', sa.Column(
+        'delisted_at', sa.DateTime(timezone=False), nullable=True))
+
+
+def downgrade():
+    op.drop_column('asset', 'delisted_at')
@@ -0,0 +1,55 @@
+"""Add a full-text search vector to DartReport
+
+Revision ID: c41f0e9a7d25
+Revises: 8d3b2c6f1a4e
+Create Date: 2026-10-19 11:03:27.094118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+# revision identifiers, used by Alembic.
+revision = 'c41f0e9a7d25'
+down_revision = '8d3b2c6f1a4e'
+branch_labels = None
+depends_on = None
+
+# NOTE: Keep this in sync with `finance.models.DART_REPORT_SEARCH_DDL`
+SEARCH_VECTOR = """
+    setweight(to_tsvector('simple', concat_ws(
+        ' ', {0}title, {0}entity)), 'A') ||
+    setweight(to_tsvector(
+        'simple', left(coalesce({0}content, ''), 200000)), 'B')
+"""
+
+
+def upgrade():
+    op.add_column('dart_report', sa.Column('search_vector', TSVECTOR()))
+    op.execute("""
+        CREATE OR REPLACE FUNCTION dart_report_search_vector_update()
+        RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """.format(SEARCH_VECTOR.format('NEW.')))
+    op.execute("""
+        CREATE TRIGGER dart_report_search_vector_update
+        BEFORE INSERT OR UPDATE OF title, entity, content ON dart_report
+        FOR EACH ROW EXECUTE PROCEDURE dart_report_search_vector_update()
+    """)
+    # Backfills existing reports before creating the index, which is much
+    # faster than updating the index row by row
+    op.execute('UPDATE dart_report SET search_vector = {}'.format(
+        SEARCH_VECTOR.format('')))
+    op.create_index('ix_dart_report_search_vector', 'dart_report',
+                    ['search_vector'], postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_dart_report_search_vector', 'dart_report')
+    op.execute('DROP TRIGGER dart_report_search_vector_update ON dart_report')
+    op.execute('DROP FUNCTION dart_report_search_vector_update()')
+    op.drop_column('dart_report', 'search_vector')
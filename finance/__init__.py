@@ -1,11 +1,6 @@
 import os
 import sys
 
-from flask import Flask
-from flask_admin import Admin
-from flask_admin.contrib.sqla import ModelView
-from flask_cors import CORS
-from flask_login import current_user, LoginManager
 from logbook import Logger, StreamHandler
 
 
@@ -13,56 +8,110 @@ __version__ = '0.3.5'
 __author__ = 'Sumin Byeon'
 __email__ = 'suminb@gmail.com'
 
-
-# FIXME: This is temporaroy
-ADMINS = ['suminb@gmail.com']
-
 StreamHandler(sys.stderr).push_application()
 log = Logger('finance')
 
 
-class AdminModelView(ModelView):
-    def is_accessible(self):
-        return not current_user.is_anonymous and \
-            current_user.email in ADMINS
-
-
 def create_app(name=__name__, config=None,
                static_folder='assets', template_folder='templates'):
+    """Creates an app that serves the web interface (views, admin, login) on
+    top of what `create_worker_app` sets up."""
+    # NOTE: Flask extensions are imported here rather than at the top of the
+    # module, so that importing `finance` (e.g., by CLI commands that do not
+    # need an app) stays cheap
+    from flask_cors import CORS
+    from flask_login import LoginManager
+
+    app = create_worker_app(name, config, static_folder=static_folder,
+                            template_folder=template_folder)
+
+    from finance import instrumentation
+    instrumentation.init_app(app)
+
+    CORS(app, resources={r"/entities/*": {"origins": "*"}})
+
+    from finance.main import main_module
+    app.register_blueprint(main_module, url_prefix='')
+
+    from finance import admin
+    admin.init_app(app)
+
+    login_manager = LoginManager(app)
+    login_manager.login_view = 'user.login'
+
+    from finance.utils import date_range
+    app.jinja_env.filters['date_range'] = date_range
+
+    return app
+
+
+def create_worker_app(name=__name__, config=None, **kwargs):
+    """Creates an app with nothing but the configuration and the database
+    binding, for CLI commands and Lambda functions that do not serve any
+    requests.
+
+    :param kwargs: Passed to `Flask`
+    """
+    from flask import Flask
 
     if config is None:
         config = {}
 
-    app = Flask(name, static_folder=static_folder,
-                template_folder=template_folder)
+    app = Flask(name, **kwargs)
     app.secret_key = os.environ.get('SECRET', 'secret')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DB_URL')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['DEBUG'] = bool(os.environ.get('DEBUG', False))
+    app.config['INSTRUMENTATION'] = \
+        bool(os.environ.get('INSTRUMENTATION', False))
+    app.config['VALUATION_CACHE'] = os.environ.get('VALUATION_CACHE')
+    app.config['VALUATION_CACHE_PATH'] = os.environ.get('VALUATION_CACHE_PATH')
+    app.config['IMPORT_CHECKPOINT_PATH'] = \
+        os.environ.get('IMPORT_CHECKPOINT_PATH')
+    app.config['DB_REPLICA_URL'] = os.environ.get('DB_REPLICA_URL')
+    app.config['DB_REPLICA_MAX_LAG'] = \
+        float(os.environ.get('DB_REPLICA_MAX_LAG', 10))
+    app.config['TIMESERIES_DB_URL'] = os.environ.get('TIMESERIES_DB_URL')
+    app.config['TIMESERIES_DB_REPLICA_URL'] = \
+        os.environ.get('TIMESERIES_DB_REPLICA_URL')
 
     app.config.update(config)
+    app.config['SQLALCHEMY_BINDS'] = make_binds(app.config)
 
-    CORS(app, resources={r"/entities/*": {"origins": "*"}})
+    # Makes `executemany()` send multi-row INSERT statements rather than one
+    # statement per row, which is what bulk inserts rely on
+    uri = app.config['SQLALCHEMY_DATABASE_URI'] or ''
+    if uri.startswith('postgres'):
+        engine_options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        engine_options.setdefault('executemany_mode', 'values')
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+
+    # NOTE: Workers need the valuation cache as well, as their writes
+    # invalidate it
+    from finance import cache
+    cache.init_app(app)
 
     from finance.models import db
     db.init_app(app)
 
-    from finance.main import main_module
-    app.register_blueprint(main_module, url_prefix='')
-
-    admin = Admin(app, name='finance', template_mode='bootstrap3')
-    from finance.models import (
-        Account, Asset, AssetValue, Portfolio, Record, Transaction, User)
-    classes = [Account, Asset, AssetValue, Portfolio, Record, Transaction,
-               User]
-    for cls in classes:
-        admin.add_view(ModelView(cls, db.session,
-                                 endpoint=cls.__name__))
-
-    login_manager = LoginManager(app)
-    login_manager.login_view = 'user.login'
+    return app
 
-    from finance.utils import date_range
-    app.jinja_env.filters['date_range'] = date_range
 
-    return app
+def make_binds(config):
+    """Asset values live in the `timeseries` bind, which is the main database
+    unless `TIMESERIES_DB_URL` is given. Read-only queries are routed to the
+    `replica` and `timeseries_replica` binds, if any (see `finance.replica`).
+    """
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    binds.setdefault('timeseries', config['TIMESERIES_DB_URL']
+                     or config['SQLALCHEMY_DATABASE_URI'])
+
+    if config['DB_REPLICA_URL']:
+        binds.setdefault('replica', config['DB_REPLICA_URL'])
+    # Asset values in the main database are replicated along with it
+    timeseries_replica_url = config['TIMESERIES_DB_REPLICA_URL'] or (
+        None if config['TIMESERIES_DB_URL'] else config['DB_REPLICA_URL'])
+    if timeseries_replica_url:
+        binds.setdefault('timeseries_replica', timeseries_replica_url)
+
+    return binds
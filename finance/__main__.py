@@ -4,21 +4,16 @@ import os
 import sys
 
 import click
-from click.testing import CliRunner
 from logbook import Logger
-from sqlalchemy.exc import IntegrityError
-
-from finance import create_app
-from finance.importers import \
-    import_stock_values as import_stock_values_  # Avoid name clashes
-from finance.models import (
-    Account, AccountType, Asset, AssetType, AssetValue, DartReport, db,
-    get_asset_by_fund_code, Granularity, Portfolio, Record, Transaction, User)
-from finance.providers import Dart, Kofia, Miraeasset, Yahoo
+
+from finance import create_worker_app
 from finance.utils import (
-    date_to_datetime, extract_numbers, get_dart_code, insert_stock_record,
-    parse_date, parse_stock_records, request_import_stock_values as
-    request_import_stock_values_, serialize_datetime)
+    date_to_datetime, extract_numbers, parse_date, read_json_lines,
+    serialize_datetime)
+
+# NOTE: Models, providers and importers are imported within the commands that
+# need them, as loading SQLAlchemy, Flask, requests and boto3 takes most of the
+# startup time of this CLI. See `finance import_time`.
 
 
 BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -29,6 +24,8 @@ def insert_stock_assets():
     """NOTE: This is a temporary workaround. All stock informaion shall be
     fetched automatically on the fly.
     """
+    from finance.models import Asset
+
     rows = [
         ('036570.KS', 'NCsoft Corporation'),
         ('145210.KS', 'SAEHWA IMC'),
@@ -48,14 +45,23 @@ def insert_stock_assets():
 
 
 @click.group()
-def cli():
-    pass
+@click.pass_context
+def cli(ctx):
+    if os.environ.get('INSTRUMENTATION'):
+        from finance import instrumentation
+        profile = instrumentation.start_profile(ctx.invoked_subcommand)
+
+        def report():
+            instrumentation.finish_profile(profile).report()
+        ctx.call_on_close(report)
 
 
 @cli.command()
 def create_all():
     """Creates necessary database tables."""
-    app = create_app(__name__)
+    from finance.models import db
+
+    app = create_worker_app(__name__)
     with app.app_context():
         db.create_all()
 
@@ -63,18 +69,22 @@ def create_all():
 @cli.command()
 def drop_all():
     """Drops all database tables."""
-    app = create_app(__name__)
+    from finance.models import db
+
+    app = create_worker_app(__name__)
     with app.app_context():
         db.drop_all()
 
 
-def create_account(type_: AccountType, institution: str, number: str, user):
+def create_account(type_: str, institution: str, number: str, user):
+    from finance.models import Account
     return Account.create(
         type=type_, name='Test account', institution=institution,
         number=number, user=user, ignore_if_exists=True)
 
 
-def create_asset(type_: AssetType, code: str, description: str):
+def create_asset(type_: str, code: str, description: str):
+    from finance.models import Asset
     return Asset.create(
         type=type_, code=code, description=description, ignore_if_exists=True)
 
@@ -82,7 +92,9 @@ def create_asset(type_: AssetType, code: str, description: str):
 @cli.command()
 def insert_test_data():
     """Inserts some sample data for testing."""
-    app = create_app(__name__)
+    from finance.models import AccountType, AssetType, Portfolio, User
+
+    app = create_worker_app(__name__)
     with app.app_context():
         user = User.create(
             family_name='Byeon', given_name='Sumin', email='suminb@gmail.com',
@@ -108,45 +120,192 @@ def insert_test_data():
 
 
 @cli.command()
-@click.argument('entity_name')
-def fetch_dart(entity_name):
+@click.argument('fin', type=click.File('r'), required=False)
+@click.option('-n', '--dry-run', is_flag=True,
+              help='Shows the changes without writing them')
+def sync_stock_codes(fin, dry_run):
+    """Makes KRX stock assets match stock_codes.csv (or the given file)."""
+    from finance.importers import sync_stock_assets
+    from finance.models import db
+    from finance.utils import load_stock_codes
+
+    if fin is None:
+        fin = open(os.path.join(BASE_PATH, 'stock_codes.csv'))
+    with fin:
+        codes = list(load_stock_codes(fin))
+
+    app = create_worker_app(__name__)
+    with app.app_context():
+        changes = sync_stock_assets(codes, commit=not dry_run)
+        if dry_run:
+            db.session.rollback()
+
+    for kind in changes._fields:
+        codes = getattr(changes, kind)
+        log.info('{} {} assets{}', len(codes), kind,
+                 ': ' + ', '.join(codes) if codes else '')
+
+
+@cli.command()
+@click.option('--seed', type=int, default=0, help='Random seed')
+@click.option('--accounts', 'account_count', type=int, default=1000,
+              help='Number of accounts')
+@click.option('--records', 'record_count', type=int, default=1000000,
+              help='Approximate number of records')
+@click.option('--stocks', 'stock_count', type=int, default=50,
+              help='Number of stocks sampled from stock_codes.csv')
+@click.option('-s', '--start', 'start_date',
+              help='Start date (e.g., 2017-01-01)')
+@click.option('-e', '--end', 'end_date',
+              help='End date, exclusive (e.g., 2019-01-01)')
+@click.option('--minute-bars/--no-minute-bars', default=True,
+              help='Generate minute bars in addition to daily bars')
+@click.option('--batch-size', type=int, default=10000)
+def generate_test_data(seed, account_count, record_count, stock_count,
+                       start_date, end_date, minute_bars, batch_size):
+    """Generates a seeded, production-scale synthetic dataset."""
+    from finance.generators import generate_dataset
+
+    if start_date is not None:
+        start_date = parse_date(start_date).date()
+    if end_date is not None:
+        end_date = parse_date(end_date).date()
+
+    app = create_worker_app(__name__)
+    with app.app_context():
+        with open(os.path.join(BASE_PATH, 'stock_codes.csv')) as fin:
+            counts = generate_dataset(
+                fin, seed=seed, account_count=account_count,
+                record_count=record_count, stock_count=stock_count,
+                start_date=start_date, end_date=end_date,
+                minute_bars=minute_bars, batch_size=batch_size)
+
+    for table_name, count in sorted(counts.items()):
+        log.info('{}: {} rows', table_name, count)
+
+
+def resolve_dart_entities(entity_names, entity_file=None):
+    """Resolves DART codes of entity names given as arguments or in a file (one
+    per line).
+
+    :return: An ordered dictionary of {entity_name: entity_code}
+    """
+    from finance.dartcodes import get_dart_code_registry
+
+    entity_names = list(entity_names)
+    if entity_file is not None:
+        entity_names.extend(line.strip() for line in entity_file)
+    entity_names = [name for name in entity_names if name]
+
+    entity_codes, missing = get_dart_code_registry().resolve(entity_names)
+    for entity_name in missing:
+        log.warning('CRP code for {} is not found', entity_name)
+    if not entity_codes:
+        raise click.UsageError('No entities to fetch reports for')
+    return entity_codes
+
+
+@cli.command()
+@click.argument('entity_names', nargs=-1)
+@click.option('-f', '--entity-file', type=click.File('r'),
+              help='A file of entity names, one per line')
+def fetch_dart(entity_names, entity_file):
     """Fetch all reports from DART (전자공시)."""
+    from finance.providers import Dart
 
-    entity_code = get_dart_code(entity_name)
+    entity_codes = resolve_dart_entities(entity_names, entity_file)
     provider = Dart()
+    for entity_name, entity_code in entity_codes.items():
+        log.info('Fetching DART reports for {}', entity_name)
+        # Writes newline-delimited JSON as reports arrive, so that memory
+        # usage does not grow with the number of reports
+        for report in provider.fetch_reports(entity_name, entity_code):
+            sys.stdout.write(
+                json.dumps(dict(report), default=serialize_datetime) + '\n')
+            sys.stdout.flush()
 
-    log.info('Fetching DART reports for {}', entity_name)
-    reports = provider.fetch_reports(entity_name, entity_code)
 
-    # Apparently generators are not JSON serializable
-    print(json.dumps([dict(r) for r in reports], default=serialize_datetime))
+@cli.command()
+@click.argument('entity_names', nargs=-1)
+@click.option('-f', '--entity-file', type=click.File('r'),
+              help='A file of entity names, one per line')
+@click.option('-d', '--days', type=int, default=365,
+              help='How far back to look for entities with no stored reports')
+def sync_dart(entity_names, entity_file, days):
+    """Fetches DART (전자공시) reports that have not been stored yet."""
+    from datetime import datetime, timedelta
+    from finance.models import DartReport
+    from finance.providers import Dart
+
+    entity_codes = resolve_dart_entities(entity_names, entity_file)
+    now = datetime.now()
+    provider = Dart()
+
+    app = create_worker_app(__name__)
+    with app.app_context():
+        latest_reports = DartReport.latest_reports(
+            int(code) for code in entity_codes.values())
+
+        total = 0
+        for entity_name, entity_code in entity_codes.items():
+            last_id, last_registered_at = latest_reports.get(
+                int(entity_code), (None, now - timedelta(days=days)))
+            # Reports of the same day as the latest one are listed as well,
+            # until the latest one is seen
+            reports = provider.fetch_new_reports(
+                entity_name, entity_code, last_id,
+                start_date=last_registered_at, end_date=now)
+            count = len(DartReport.bulk_upsert(
+                (dict(r) for r in reports), batch_size=500))
+            log.info('{} new reports for {}', count, entity_name)
+            total += count
+
+    log.info('{} reports have been synced for {} entities', total,
+             len(entity_codes))
 
 
-# TODO: Load data from stdin
 @cli.command()
-@click.argument('fin', type=click.File('r'))
-def import_dart(fin):
-    """Import DART (전자공시) data."""
+@click.argument('query')
+@click.option('-p', '--page', type=int, default=1)
+@click.option('-n', '--per-page', type=int, default=20)
+def search_dart(query, page, per_page):
+    """Searches DART (전자공시) reports by their titles, entity names and
+    contents."""
+    from finance.models import DartReport
+
+    app = create_worker_app(__name__)
+    with app.app_context():
+        result = DartReport.search(query, page, per_page)
+
+    print('{} reports found (page {})'.format(result.total, page))
+    for hit in result.hits:
+        print('\n[{rank:.4f}] {registered_at:%Y-%m-%d} {entity} - {title} '
+              '(DartReport-{id})'.format(**hit))
+        print('  ' + ' '.join(hit['snippet'].split()))
 
-    try:
-        data = json.loads(fin.read())
-    except json.decoder.JSONDecodeError as e:
-        log.error('Valid JSON data expected: {}', e)
 
-    app = create_app(__name__)
+@cli.command()
+@click.argument('fin', type=click.File('r'), default='-')
+@click.option('-b', '--batch-size', type=int, default=500)
+def import_dart(fin, batch_size):
+    """Import DART (전자공시) data, which is newline-delimited JSON as
+    `fetch_dart` writes. Existing reports are updated."""
+    from finance.models import DartReport
+
+    app = create_worker_app(__name__)
     with app.app_context():
-        for row in data:
-            try:
-                report = DartReport.create(**row)
-            except IntegrityError:
-                log.info('DartReport-{} already exists', row['id'])
-                db.session.rollback()
-            else:
-                log.info('Fetched report: {}', report)
+        try:
+            count = len(DartReport.bulk_upsert(
+                read_json_lines(fin), batch_size=batch_size))
+        except ValueError as e:
+            log.error('Valid JSON data expected: {}', e)
+            sys.exit(1)
+    log.info('Imported {} reports', count)
 
 
 @cli.command()
 def import_sp500_asset_values():
+    from click.testing import CliRunner
     runner = CliRunner()
     runner.invoke(import_fund, ['KR5223941018', '2015-01-01', '2016-06-01'],
                   catch_exceptions=True)
@@ -156,7 +315,10 @@ def import_sp500_asset_values():
 def import_sp500_records():
     """Import S&P500 fund sample data. Expects a tab seprated value document.
     """
-    app = create_app(__name__)
+    from finance.models import (Account, Asset, Transaction, UnitOfWork,
+                                deposit)
+
+    app = create_worker_app(__name__)
     app.app_context().push()
 
     account_checking = Account.get(id=1001)
@@ -167,7 +329,7 @@ def import_sp500_records():
     # Expected number of columns
     expected_col_count = 6
 
-    with open('sample-data/sp500.csv') as fin:
+    with open('sample-data/sp500.csv') as fin, UnitOfWork() as uow:
         # Skip the first row (headers)
         headers = next(fin)
         col_count = len(headers.split())
@@ -192,23 +354,15 @@ def import_sp500_records():
                 log.info('Record type \'{}\' will be ignored', _type)
                 continue
 
-            with Transaction.create() as t:
-                # NOTE: The actual deposit date and the buying date generally
-                # differ by a few days. Need to figure out how to parse this
-                # properly from the raw data.
-                try:
+            with uow.savepoint():
+                with Transaction.create() as t:
+                    # NOTE: The actual deposit date and the buying date
+                    # generally differ by a few days. Need to figure out how to
+                    # parse this properly from the raw data.
                     deposit(account_checking, asset_krw, -quantity_krw, date,
                             t)
-                except IntegrityError:
-                    log.warn('Identical record exists')
-                    db.session.rollback()
-
-                try:
-                    deposit(account_sp500, asset_sp500, quantity_sp500,
-                            date, t)
-                except IntegrityError:
-                    log.warn('Identical record exists')
-                    db.session.rollback()
+                    deposit(account_sp500, asset_sp500, quantity_sp500, date,
+                            t)
 
 
 def _parse_miraeasset_data(filename, parse_func):
@@ -223,6 +377,7 @@ def _parse_miraeasset_data(filename, parse_func):
 @click.argument('filename')
 def parse_miraeasset_foreign_data(filename):
     """Parses a CSV file exported in 해외거래내역 (9465)."""
+    from finance.providers import Miraeasset
     provider = Miraeasset()
     _parse_miraeasset_data(filename, provider.parse_foreign_transactions)
 
@@ -232,6 +387,7 @@ def parse_miraeasset_foreign_data(filename):
 @click.argument('filename')
 def parse_miraeasset_local_data(filename):
     """Parses CSV file exported in 거래내역조회 (0650)."""
+    from finance.providers import Miraeasset
     provider = Miraeasset()
     _parse_miraeasset_data(filename, provider.parse_local_transactions)
 
@@ -241,18 +397,26 @@ def parse_miraeasset_local_data(filename):
 @click.argument('filename')
 @click.argument('account_institution')
 @click.argument('account_number')
+@click.option('--restart', is_flag=True,
+              help='Start over rather than resuming from the checkpoint')
 def import_miraeasset_foreign_data(
-    filename, account_institution, account_number
+    filename, account_institution, account_number, restart
 ):
     """Imports a CSV file exported in 해외거래내역 (9465)."""
+    from finance.checkpoints import make_checkpoint_store
     from finance.importers import import_miraeasset_foreign_records
+    from finance.models import Account
 
-    app = create_app(__name__)
+    app = create_worker_app(__name__)
     with app.app_context():
         account = Account.get_by_number(account_institution, account_number)
+        checkpoint = make_checkpoint_store(app.config).checkpoint(
+            'import_miraeasset_foreign_data:{}:{}:{}'.format(
+                account_institution, account_number,
+                os.path.abspath(filename)), restart)
 
         with open(filename) as fin:
-            import_miraeasset_foreign_records(fin, account)
+            import_miraeasset_foreign_records(fin, account, checkpoint)
 
 
 @cli.command()
@@ -263,6 +427,8 @@ def import_miraeasset_foreign_data(
               help='End date (e.g., 2017-12-31)')
 def fetch_stock_values(stock_code, start_date, end_date):
     """Fetches daily stock values from Yahoo Finance."""
+    from finance.models import Granularity
+    from finance.providers import Yahoo
 
     start_date = date_to_datetime(
         parse_date(start_date if start_date is not None else -30 * 3600 * 24))
@@ -294,79 +460,246 @@ def fetch_stock_values(stock_code, start_date, end_date):
 @click.argument('code')
 @click.argument('from-date')
 @click.argument('to-date')
-def import_fund(code, from_date, to_date):
+@click.option('--restart', is_flag=True,
+              help='Start over rather than resuming from the checkpoint')
+def import_fund(code, from_date, to_date, restart):
     """Imports fund data from KOFIA.
 
     :param code: e.g., KR5223941018
     :param from_date: e.g., 2016-01-01
     :param to_date: e.g., 2016-02-28
     """
+    from finance.checkpoints import make_checkpoint_store
+    from finance.importers import CHECKPOINT_INTERVAL
+    from finance.models import (Asset, AssetValue, Granularity, UnitOfWork,
+                                get_asset_by_fund_code)
+    from finance.providers import Kofia
+
     provider = Kofia()
 
-    app = create_app(__name__)
+    app = create_worker_app(__name__)
     with app.app_context():
         asset = get_asset_by_fund_code(code)
+        checkpoint = make_checkpoint_store(app.config).checkpoint(
+            'import_fund:{}:{}:{}'.format(code, from_date, to_date), restart)
 
         # FIXME: Target asset should also be determined by asset.data.code
         base_asset = Asset.query.filter_by(name='KRW').first()
 
-        data = provider.fetch_data(
-            code, parse_date(from_date), parse_date(to_date))
-        for date, unit_price, quantity in data:
-            log.info('Import data on {}', date)
-            unit_price /= 1000.0
-            try:
-                AssetValue.create(
-                    asset=asset, base_asset=base_asset,
-                    evaluated_at=date, close=unit_price,
-                    granularity=Granularity.day,
-                    source='kofia')
-            except IntegrityError:
-                log.warn('Identical record has been found for {}. Skipping.',
-                         date)
-                db.session.rollback()
+        data = checkpoint.resume(provider.fetch_data(
+            code, parse_date(from_date), parse_date(to_date)))
+        with UnitOfWork() as uow:
+            for i, (date, unit_price, quantity) in enumerate(data, 1):
+                log.info('Import data on {}', date)
+                unit_price /= 1000.0
+                with uow.savepoint():
+                    AssetValue.create(
+                        asset=asset, base_asset=base_asset,
+                        evaluated_at=date, close=unit_price,
+                        granularity=Granularity.day,
+                        source='kofia')
+                if i % CHECKPOINT_INTERVAL == 0:
+                    uow.commit()
+                    checkpoint.save()
+        checkpoint.save()
 
 
 @cli.command()
 @click.argument('code')
-def import_stock_values(code):
+@click.option('--restart', is_flag=True,
+              help='Start over rather than resuming from the checkpoint')
+def import_stock_values(code, restart):
     """Import stock price information."""
-    app = create_app(__name__)
+    from finance.checkpoints import make_checkpoint_store
+    from finance.importers import \
+        import_stock_values as import_stock_values_  # Avoid name clashes
+
+    app = create_worker_app(__name__)
     with app.app_context():
         # NOTE: We assume all Asset records are already in the database, but
         # this is a temporary workaround. We should implement some mechanism to
         # automatically insert an Asset record when it is not found.
 
+        checkpoint = make_checkpoint_store(app.config).checkpoint(
+            'import_stock_values:{}'.format(code), restart)
         stdin = click.get_text_stream('stdin')
-        for _ in import_stock_values_(stdin, code):
+        for _ in import_stock_values_(stdin, code, checkpoint=checkpoint):
             pass
 
 
-# TODO: Load data from stdin
+#: Accounts that Shinhan HTS exports are imported into, by their roles
+SHINHAN_ACCOUNT_NAMES = [('bank', '신한 입출금'), ('stock', '신한 주식')]
+
+
+def get_shinhan_accounts():
+    """Returns a {role: account} dictionary of `SHINHAN_ACCOUNT_NAMES`."""
+    from finance.models import Account
+
+    accounts = {}
+    for role, name in SHINHAN_ACCOUNT_NAMES:
+        accounts[role] = Account.query.filter(Account.name == name).first()
+        if accounts[role] is None:
+            raise click.UsageError("Account '{}' does not exist".format(name))
+    return accounts
+
+
 @cli.command()
-@click.argument('filename')
-def import_stock_records(filename):
+@click.argument('fin', type=click.File('r'), default='-')
+@click.option('-b', '--batch-size', type=int, default=1000)
+def import_stock_records(fin, batch_size):
     """Parses exported data from the Shinhan HTS."""
-    app = create_app(__name__)
+    from finance.importers import import_stock_records as import_records
+
+    app = create_worker_app(__name__)
     with app.app_context():
-        account_bank = Account.query \
-            .filter(Account.name == '신한 입출금').first()
-        account_stock = Account.query \
-            .filter(Account.name == '신한 주식').first()
-        with open(filename) as fin:
-            for parsed in parse_stock_records(fin):
-                insert_stock_record(parsed, account_stock, account_bank)
+        accounts = get_shinhan_accounts()
+        count = import_records(fin, accounts['stock'], accounts['bank'],
+                               batch_size)
+    log.info('Imported {} records', count)
+
+
+@cli.command()
+@click.argument('kind', type=click.Choice(['miraeasset', 'shinhan']))
+@click.argument('sources', nargs=-1, required=True)
+@click.option('-a', '--account', 'account_number', nargs=2,
+              metavar='INSTITUTION NUMBER',
+              help='Account of Miraeasset exports (e.g., Miraeasset 123-45)')
+@click.option('-j', '--jobs', type=int,
+              help='Number of processes to parse files (CPUs by default)')
+@click.option('-e', '--encoding', default='utf-8')
+@click.option('-b', '--batch-size', type=int, default=1000)
+def import_broker_exports(kind, sources, account_number, jobs, encoding,
+                          batch_size):
+    """Imports many broker exports at once.
+
+    SOURCES are directories or glob patterns of files, which are Miraeasset
+    해외거래내역 (9465) or Shinhan HTS exports, depending on KIND.
+    """
+    from finance.importers import find_export_files
+    from finance.exceptions import AccountNotFoundException
+    from finance.importers import import_broker_exports as import_exports
+    from finance.models import Account
+
+    paths = find_export_files(sources)
+    if not paths:
+        raise click.UsageError('No files are found')
+
+    def report(progress):
+        log.info('[{}/{}] {}: {} entries parsed, {} records inserted '
+                 '({:.0f} entries/s)', progress.files, len(paths),
+                 progress.path, progress.entries, progress.inserted,
+                 progress.entries / max(progress.elapsed, 1e-6))
+
+    app = create_worker_app(__name__)
+    with app.app_context():
+        if kind == 'miraeasset':
+            if not account_number:
+                raise click.UsageError('--account is required for Miraeasset')
+            try:
+                accounts = {'stock': Account.get_by_number(*account_number)}
+            except AccountNotFoundException:
+                raise click.UsageError('Account {} {} does not exist'.format(
+                    *account_number))
+        else:
+            accounts = get_shinhan_accounts()
+        result = import_exports(paths, kind, accounts, jobs, encoding,
+                                batch_size, report)
+    log.info('Imported {} records of {} files in {:.1f} seconds',
+             result.inserted, result.files, result.elapsed)
+
+
+@cli.command()
+@click.option('-s', '--statements', 'sources', nargs=2, multiple=True,
+              required=True, metavar='ACCOUNT GLOB',
+              help='A credit card account name and a glob pattern of its '
+                   'statements. May be given for many cards.')
+@click.option('-e', '--encoding', default='utf-8')
+@click.option('-b', '--batch-size', type=int, default=1000)
+def import_shinhancard(sources, encoding, batch_size):
+    """Imports Shinhan Card monthly statements (CSV)."""
+    import glob
+    from finance.importers import import_shinhancard_statements
+    from finance.models import Account, AccountType
+
+    def statements():
+        for account_name, pattern in sources:
+            account = Account.query.filter_by(name=account_name).first()
+            if account is None:
+                account = Account.create(
+                    type=AccountType.credit_card, institution='Shinhan Card',
+                    name=account_name)
+            for path in sorted(glob.glob(pattern)):
+                log.info('Importing {} into {}', path, account_name)
+                with open(path, encoding=encoding) as fin:
+                    yield account, fin
+
+    app = create_worker_app(__name__)
+    with app.app_context():
+        count = import_shinhancard_statements(statements(), batch_size)
+    log.info('Imported {} records', count)
 
 
 @cli.command()
 @click.argument('code')
 def request_import_stock_values(code):
     """Enqueue a request to import stock values."""
+    from finance.utils import \
+        request_import_stock_values as request_import_stock_values_
+
     start_time = date_to_datetime(parse_date(-3))
     end_time = date_to_datetime(parse_date(0))
 
     request_import_stock_values_(code, start_time, end_time)
 
 
+@cli.command()
+@click.option('-n', '--number', type=int, default=100000,
+              help='Number of values to parse in each case')
+def benchmark_parsing(number):
+    """Compares the parsing fast paths (`finance.parsing`) with what they
+    replaced."""
+    from finance.parsing import benchmark
+
+    for name, before, after in benchmark(number):
+        print('{}: {:.1f} ms -> {:.1f} ms ({:.1f}x)'.format(
+            name, before * 1000, after * 1000, before / after))
+
+
+@cli.command()
+@click.argument('command_lines', nargs=-1)
+@click.option('--lambda', 'lambda_', is_flag=True,
+              help='Measure the cold start of infra/lambda.py instead')
+@click.option('--top', type=int, default=5,
+              help='Number of the heaviest packages to show')
+def import_time(command_lines, lambda_, top):
+    """Reports how long it takes to start up commands, measured with
+    `python -X importtime`.
+
+    Each argument is a command line such as "fetch_dart 삼성전자", which will
+    actually be run. Without arguments, every command is started with
+    `--help`, which measures what it costs before the command does any work.
+    """
+    from finance.importtime import measure, summarize
+
+    if lambda_:
+        targets = [('infra/lambda.py', [
+            '-c', 'import runpy; runpy.run_path({!r})'.format(
+                os.path.join(BASE_PATH, 'infra', 'lambda.py'))])]
+    elif command_lines:
+        targets = [(line, ['-m', 'finance'] + line.split())
+                   for line in command_lines]
+    else:
+        targets = [(name, ['-m', 'finance', name, '--help'])
+                   for name in sorted(cli.commands)]
+
+    for name, args in targets:
+        wall_time, imports = measure(args)
+        total, heaviest = summarize(imports, top)
+        print('{}: {:.1f} ms in total, {:.1f} ms importing {} modules'.format(
+            name, wall_time * 1000, total / 1000, len(imports)))
+        for package, cumulative in heaviest:
+            print('  {:8.1f} ms  {}'.format(cumulative / 1000, package))
+
+
 if __name__ == '__main__':
     cli()
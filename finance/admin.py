@@ -0,0 +1,25 @@
+from flask_admin import Admin
+from flask_admin.contrib.sqla import ModelView
+from flask_login import current_user
+
+from finance.models import (Account, Asset, AssetValue, Portfolio, Record,
+                            Transaction, User, db)
+
+
+# FIXME: This is temporaroy
+ADMINS = ['suminb@gmail.com']
+
+
+class AdminModelView(ModelView):
+    def is_accessible(self):
+        return not current_user.is_anonymous and \
+            current_user.email in ADMINS
+
+
+def init_app(app):
+    admin = Admin(app, name='finance', template_mode='bootstrap3')
+    classes = [Account, Asset, AssetValue, Portfolio, Record, Transaction,
+               User]
+    for cls in classes:
+        admin.add_view(ModelView(cls, db.session,
+                                 endpoint=cls.__name__))
@@ -0,0 +1,337 @@
+"""Caches.
+
+`ValuationCache` keeps net worths that have been calculated for past dates.
+It is disabled unless `VALUATION_CACHE` is set to one of the following:
+
+- `lru`: An in-process LRU cache holding up to `VALUATION_CACHE_SIZE` entries
+- `disk`: A SQLite database at `VALUATION_CACHE_PATH`, which may be shared by
+  multiple processes on the same host
+
+Entries are invalidated whenever a `Record`, an `AssetValue` or the portfolio
+of an `Account` is written, once the transaction commits (see
+`finance.models`). As those events only fire in
+the process that writes, the LRU backend must not be used when other
+processes (e.g., import jobs) write to the same database.
+
+`memoize_in_request` keeps results in `flask.g`, so that identical
+computations within a single request (e.g., a template calling
+`account.balance()` after `account.net_worth()` did the same) run once.
+"""
+import collections
+import contextlib
+import copy
+import decimal
+import functools
+import inspect
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from flask import current_app, g, has_request_context
+from logbook import Logger
+
+from finance.instrumentation import current_profile
+
+log = Logger('finance')
+
+
+class LRUCache(object):
+    """A thread-safe cache that evicts the least recently used entries once it
+    holds more than `maxsize` entries."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def keys(self):
+        with self._lock:
+            return list(self._data.keys())
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+#: `entity` is a string such as 'account:1234' or 'portfolio:5678'
+ValuationKey = collections.namedtuple(
+    'ValuationKey',
+    ['entity', 'date', 'granularity', 'base_asset_id', 'approximation'])
+
+
+class LRUBackend(LRUCache):
+
+    def invalidate(self, since, entities=None, granularity=None,
+                   base_asset_id=None):
+        for key in self.keys():
+            if matches(key, since, entities, granularity, base_asset_id):
+                self.delete(key)
+
+
+class SQLiteBackend(object):
+    """Stores valuations in a local SQLite database. Integers are stored as
+    integers and decimals are stored as strings, so values come back with the
+    same type."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS valuation (
+                    entity TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    granularity TEXT NOT NULL,
+                    base_asset_id INTEGER NOT NULL,
+                    approximation INTEGER NOT NULL,
+                    value,
+                    PRIMARY KEY (entity, date, granularity, base_asset_id,
+                                 approximation)
+                )""")
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS valuation_date ON valuation (date)')
+
+    @contextlib.contextmanager
+    def connect(self):
+        """Yields a connection, which commits (or rolls back on errors) and
+        is closed at the end."""
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key, default=None):
+        with self.connect() as conn:
+            row = conn.execute(
+                'SELECT value FROM valuation WHERE entity = ? AND date = ? '
+                'AND granularity = ? AND base_asset_id = ? '
+                'AND approximation = ?', serialize_key(key)).fetchone()
+        if row is None:
+            return default
+        value, = row
+        return decimal.Decimal(value) if isinstance(value, str) else value
+
+    def set(self, key, value):
+        if isinstance(value, decimal.Decimal):
+            value = str(value)
+        with self.connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO valuation VALUES (?, ?, ?, ?, ?, ?)',
+                serialize_key(key) + (value,))
+
+    def invalidate(self, since, entities=None, granularity=None,
+                   base_asset_id=None):
+        conditions, params = ['date >= ?'], [since.isoformat()]
+        if entities is not None:
+            entities = list(entities)
+            conditions.append(
+                'entity IN ({})'.format(', '.join('?' * len(entities))))
+            params.extend(entities)
+        if granularity is not None:
+            conditions.append('granularity = ?')
+            params.append(granularity)
+        if base_asset_id is not None:
+            conditions.append('base_asset_id = ?')
+            params.append(base_asset_id)
+        with self.connect() as conn:
+            conn.execute('DELETE FROM valuation WHERE {}'.format(
+                ' AND '.join(conditions)), params)
+
+    def clear(self):
+        with self.connect() as conn:
+            conn.execute('DELETE FROM valuation')
+
+
+def serialize_key(key):
+    return (key.entity, key.date.isoformat(), key.granularity,
+            key.base_asset_id, int(key.approximation))
+
+
+def matches(key, since, entities=None, granularity=None, base_asset_id=None):
+    return key.date >= since \
+        and (entities is None or key.entity in entities) \
+        and (granularity is None or key.granularity == granularity) \
+        and (base_asset_id is None or key.base_asset_id == base_asset_id)
+
+
+class ValuationCache(object):
+    """Caches valuations keyed by (entity, date, granularity, base asset)."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    def invalidate(self, since, entities=None, granularity=None,
+                   base_asset_id=None):
+        """Drops entries on or after `since`, optionally only those of the
+        given entities, granularity and base asset."""
+        if isinstance(since, datetime):
+            since = since.date()
+        self.backend.invalidate(since, entities, granularity, base_asset_id)
+
+    def clear(self):
+        self.backend.clear()
+
+
+def make_valuation_cache(config):
+    kind = config.get('VALUATION_CACHE')
+    if not kind:
+        return None
+    elif kind == 'lru':
+        return ValuationCache(
+            LRUBackend(int(config.get('VALUATION_CACHE_SIZE', 100000))))
+    elif kind == 'disk':
+        path = config.get('VALUATION_CACHE_PATH') or os.path.join(
+            os.path.expanduser('~'), '.finance', 'valuation.db')
+        return ValuationCache(SQLiteBackend(path))
+    else:
+        raise ValueError('Unknown valuation cache: {}'.format(kind))
+
+
+def init_app(app):
+    app.extensions['valuation_cache'] = make_valuation_cache(app.config)
+
+    @app.teardown_request
+    def report_request_memo(exc):
+        memo = g.pop('memo', None)
+        if memo is not None and memo.hits:
+            log.debug('{} computations saved by memoization ({} computed)',
+                      memo.hits, memo.misses)
+
+
+def get_valuation_cache():
+    """Returns the valuation cache of the current app, if any."""
+    try:
+        return current_app.extensions.get('valuation_cache')
+    except RuntimeError:  # Working outside of application context
+        return None
+
+
+def cached_valuation(entity, evaluated_from, evaluated_until, granularity,
+                     base_asset, approximation, calculate):
+    """Returns a cached valuation or calculates one with `calculate()`. Only
+    valuations of the past are cached, as records of today may still come in.
+    """
+    cache = get_valuation_cache()
+    if cache is None or base_asset is None \
+            or evaluated_until >= datetime.utcnow():
+        return calculate()
+
+    key = ValuationKey(entity, evaluated_from.date(), granularity,
+                       base_asset.id, bool(approximation))
+    value = cache.get(key)
+    if value is None:
+        value = calculate()
+        cache.set(key, value)
+    return value
+
+
+class RequestMemo(object):
+
+    def __init__(self):
+        self.values = {}
+        self.hits = 0
+        self.misses = 0
+
+
+def request_time():
+    """Returns the time at which the current request started to be evaluated,
+    so that every evaluation of 'now' within a request agrees with each other.
+    Outside of requests, this is simply the current time."""
+    if not has_request_context():
+        return datetime.utcnow()
+    if 'request_time' not in g:
+        g.request_time = datetime.utcnow()
+    return g.request_time
+
+
+def get_request_memo():
+    if not has_request_context():
+        return None
+    if 'memo' not in g:
+        g.memo = RequestMemo()
+    return g.memo
+
+
+def clear_request_memo():
+    """Forgets memoized results, as they may be stale after a write."""
+    memo = get_request_memo()
+    if memo is not None:
+        memo.values.clear()
+
+
+def memoize_in_request(func):
+    """Memoizes a model method (such as `balance` or `net_worth`) within the
+    current request. Arguments are bound to the signature of the method, so
+    positional and keyword arguments yield the same key, and
+    `evaluated_at=None` is taken as the time of the request. A (shallow) copy
+    of the result is returned so that callers may modify it.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        memo = get_request_memo()
+        if memo is None:
+            return func(self, *args, **kwargs)
+
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        if 'evaluated_at' in bound.arguments \
+                and bound.arguments['evaluated_at'] is None:
+            bound.arguments['evaluated_at'] = request_time()
+
+        key = (func.__qualname__, self.id,
+               tuple(bound.arguments.values())[1:])
+        try:
+            value = memo.values[key]
+        except KeyError:
+            memo.misses += 1
+            value = memo.values[key] = func(*bound.args, **bound.kwargs)
+        except TypeError:  # Unhashable arguments
+            return func(*bound.args, **bound.kwargs)
+        else:
+            memo.hits += 1
+            profile = current_profile()
+            if profile is not None:
+                profile.memo_hits += 1
+        return copy.copy(value)
+
+    return wrapper
@@ -0,0 +1,132 @@
+"""Checkpoints of imports, so that an import that failed halfway through a
+large file resumes where it left off rather than starting over.
+
+A checkpoint of an import (identified by a key such as
+'import_stock_values:NVDA') holds the number of rows that have been committed
+and a SHA-1 digest of those rows. When the import runs again, that many rows
+are skipped as long as their digest matches, which also means that rows
+appended to the input later on are the only ones to be imported. Checkpoints
+are kept in a SQLite database at `IMPORT_CHECKPOINT_PATH`
+(`~/.finance/checkpoints.db` by default).
+"""
+import hashlib
+import os
+import sqlite3
+from datetime import datetime
+
+from logbook import Logger
+
+log = Logger('finance')
+
+
+class CheckpointMismatchException(Exception):
+    """Raised when the rows that have been imported differ from the input,
+    which has changed since the checkpoint."""
+
+    def __init__(self, key, rows):
+        self.key = key
+        self.rows = rows
+
+    def __str__(self):
+        return 'The first {} rows of {} differ from the checkpoint'.format(
+            self.rows, self.key)
+
+
+class CheckpointStore(object):
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoint (
+                    key TEXT PRIMARY KEY,
+                    rows INTEGER NOT NULL,
+                    digest TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )""")
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        """Returns (rows, digest) of `key`, or None."""
+        with self.connect() as conn:
+            return conn.execute(
+                'SELECT rows, digest FROM checkpoint WHERE key = ?',
+                (key,)).fetchone()
+
+    def set(self, key, rows, digest):
+        with self.connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO checkpoint VALUES (?, ?, ?, ?)',
+                (key, rows, digest, datetime.utcnow().isoformat()))
+
+    def delete(self, key):
+        with self.connect() as conn:
+            conn.execute('DELETE FROM checkpoint WHERE key = ?', (key,))
+
+    def checkpoint(self, key, restart=False):
+        """Returns a `Checkpoint` of `key`, which starts over from the first
+        row if `restart` is set."""
+        if restart:
+            self.delete(key)
+        return Checkpoint(self, key)
+
+
+class Checkpoint(object):
+    """Tracks rows of a single import. Wrap the input rows with `resume()` and
+    call `save()` whenever the rows taken so far have been committed:
+
+        checkpoint = store.checkpoint('import_stock_values:NVDA')
+        for i, row in enumerate(checkpoint.resume(rows), 1):
+            ...
+            if i % 100 == 0:
+                checkpoint.save()
+        checkpoint.save()
+    """
+
+    def __init__(self, store, key):
+        self.store = store
+        self.key = key
+        self.rows = 0
+        self.hash = hashlib.sha1()
+
+    def resume(self, rows, serialize=repr):
+        """Yields rows that come after the checkpoint.
+
+        :param serialize: Makes a string of a row to be digested
+        :raise CheckpointMismatchException: If the rows before the checkpoint
+                                            have changed
+        """
+        saved = self.store.get(self.key)
+        skip, digest = saved if saved is not None else (0, None)
+        if skip:
+            log.info('Resuming {} after {} rows', self.key, skip)
+
+        for row in rows:
+            self.rows += 1
+            self.hash.update(serialize(row).encode('utf-8'))
+            self.hash.update(b'\n')
+            if self.rows < skip:
+                continue
+            elif self.rows == skip:
+                if self.hash.hexdigest() != digest:
+                    raise CheckpointMismatchException(self.key, skip)
+                continue
+            yield row
+
+        if self.rows < skip:
+            raise CheckpointMismatchException(self.key, skip)
+
+    def save(self):
+        """Records that the rows taken so far have been committed."""
+        self.store.set(self.key, self.rows, self.hash.hexdigest())
+
+
+def make_checkpoint_store(config):
+    path = config.get('IMPORT_CHECKPOINT_PATH') or os.path.join(
+        os.path.expanduser('~'), '.finance', 'checkpoints.db')
+    return CheckpointStore(path)
@@ -0,0 +1,113 @@
+"""An in-memory index of DART (전자공시) corporation codes.
+
+The registry is loaded from `data/dart_codes.csv` once per process. Names may
+be looked up exactly, by prefixes or in a normalized form, which ignores
+whitespaces and letter cases and composes decomposed Hangul (e.g., names copied
+from macOS file names).
+"""
+import bisect
+import collections
+import csv
+import functools
+import unicodedata
+
+DART_CODES_PATH = 'data/dart_codes.csv'
+
+
+def normalize_name(name):
+    """Normalizes an entity name, so that ' 삼성 전자' and '삼성전자' (even when
+    the latter is written in decomposed jamos) are the same."""
+    return ''.join(unicodedata.normalize('NFKC', name).split()).casefold()
+
+
+def load_dart_codes(path=DART_CODES_PATH):
+    """Yields (name, code) pairs of a CSV file."""
+    with open(path, newline='') as fin:
+        for row in csv.reader(fin):
+            if len(row) >= 2:
+                yield row[0].strip(), row[1].strip()
+
+
+class DartCodeRegistry(object):
+    """Looks up DART codes by entity names and vice versa.
+
+    NOTE: Different entities may share a name. Lookups by names return the one
+    that comes first in the file.
+    """
+
+    def __init__(self, entries):
+        self.codes = {}  # {name: code}
+        self.normalized_codes = {}  # {normalized name: code}
+        self.names = {}  # {code: name}
+        for name, code in entries:
+            self.codes.setdefault(name, code)
+            self.normalized_codes.setdefault(normalize_name(name), code)
+            self.names.setdefault(code, name)
+        #: Sorted normalized names for prefix lookups
+        self.sorted_names = sorted(self.normalized_codes)
+
+    @classmethod
+    def load(cls, path=DART_CODES_PATH):
+        return cls(load_dart_codes(path))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def get(self, name, default=None):
+        """Returns the code of `name`, falling back to its normalized form."""
+        try:
+            return self.codes[name]
+        except KeyError:
+            return self.normalized_codes.get(normalize_name(name), default)
+
+    def code(self, name):
+        code = self.get(name)
+        if code is None:
+            raise ValueError('CRP code for {} is not found'.format(name))
+        return code
+
+    def name(self, code):
+        """Returns the entity name of `code`."""
+        try:
+            return self.names[code]
+        except KeyError:
+            raise ValueError('Entity for CRP code {} is not found'.format(
+                code))
+
+    def search_prefix(self, prefix, limit=None):
+        """Returns (name, code) pairs whose normalized names start with the
+        normalized `prefix`, in the order of the normalized names."""
+        prefix = normalize_name(prefix)
+        start = bisect.bisect_left(self.sorted_names, prefix)
+        matches = []
+        for normalized in self.sorted_names[start:]:
+            if not normalized.startswith(prefix) \
+                    or (limit is not None and len(matches) >= limit):
+                break
+            code = self.normalized_codes[normalized]
+            matches.append((self.names[code], code))
+        return matches
+
+    def resolve(self, names):
+        """Resolves many names at once.
+
+        :return: A tuple of an ordered {name: code} dictionary and a list of
+                 names that are not found
+        """
+        resolved, missing = collections.OrderedDict(), []
+        for name in names:
+            code = self.get(name)
+            if code is None:
+                missing.append(name)
+            else:
+                resolved[name] = code
+        return resolved, missing
+
+
+@functools.lru_cache(maxsize=None)
+def get_dart_code_registry(path=DART_CODES_PATH):
+    """Returns the registry of `path`, which is loaded only once."""
+    return DartCodeRegistry.load(path)
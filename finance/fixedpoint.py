@@ -0,0 +1,97 @@
+"""A fixed-point valuation kernel.
+
+Quantities and prices are stored as ``Numeric(20, 4)``, so every one of them
+is a whole number of ten-thousandths. Valuations work on such scaled integers,
+which Python adds and multiplies much faster than `Decimal`s, and convert them
+back to `Decimal`s only when returning results.
+
+A product of two scaled values (e.g., a close times a quantity) is scaled by
+``UNIT ** 2``. It is kept that way rather than rounded, so results are exactly
+the same as those of `Decimal` arithmetic.
+"""
+import decimal
+
+from finance.exceptions import AssetValueUnavailableException
+
+#: Number of decimal places of ``Numeric(20, 4)`` columns
+SCALE = 4
+UNIT = 10 ** SCALE
+
+
+def to_fixed(value, scale=SCALE):
+    """Converts a number into an integer scaled by ``10 ** scale``.
+
+    :raise ValueError: If `value` has more than `scale` decimal places
+    """
+    if value.__class__ is int:
+        return value * 10 ** scale
+    if isinstance(value, float):
+        value = repr(value)
+    scaled = decimal.Decimal(value).scaleb(scale)
+    fixed = int(scaled)
+    if fixed != scaled:
+        raise ValueError('{} has more than {} decimal places'.format(
+            value, scale))
+    return fixed
+
+
+def from_fixed(value, scale=SCALE):
+    """Converts an integer scaled by ``10 ** scale`` back into a `Decimal`."""
+    return decimal.Decimal(value).scaleb(-scale)
+
+
+def from_fixed_product(value):
+    """Converts a product (scaled by ``UNIT ** 2``) back into a `Decimal`,
+    which has `SCALE` decimal places unless it needs more. Zero (e.g., the
+    net worth of an account without records) stays as an `int`."""
+    if value == 0:
+        return 0
+    if value % UNIT == 0:
+        return from_fixed(value // UNIT)
+    return from_fixed(value, 2 * SCALE)
+
+
+def accumulate_balance(balance, key, quantity, adjustment=False):
+    """Adds a (scaled) quantity of a record to `balance`. A balance adjustment
+    replaces whatever has been added up so far."""
+    if adjustment:
+        balance[key] = quantity
+    else:
+        balance[key] = balance.get(key, 0) + quantity
+
+
+def merge_balances(balances):
+    """Sums up (scaled) balances of many accounts.
+
+    NOTE: This is the same as adding up `collections.Counter`s, which drops
+    non-positive quantities after each addition.
+    """
+    merged = {}
+    for i, balance in enumerate(balances):
+        if i == 0:
+            merged = dict(balance)
+            continue
+        for key, quantity in balance.items():
+            merged[key] = merged.get(key, 0) + quantity
+        merged = {k: v for k, v in merged.items() if v > 0}
+    return merged
+
+
+def net_worth(balance, closes, base_asset_id):
+    """Values (scaled) quantities of assets at their (scaled) closes.
+
+    :param balance: An iterable of (asset_id, quantity) pairs
+    :param closes: {asset_id: close}
+    :return: The net worth, scaled by ``UNIT ** 2``
+    :raise AssetValueUnavailableException: If an asset has no close
+    """
+    total = 0
+    for asset_id, quantity in balance:
+        if asset_id == base_asset_id:
+            total += quantity * UNIT
+            continue
+        try:
+            total += quantity * closes[asset_id]
+        except KeyError:
+            raise AssetValueUnavailableException()
+    return total
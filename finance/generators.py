@@ -0,0 +1,331 @@
+"""A collection of synthetic data generators. These are meant to produce
+production-scale datasets for load testing, not to model any real market.
+
+Every random decision is drawn from a `random.Random` instance seeded by the
+given seed (and a label per concern), so the same seed, date range and sizes
+always produce the same dataset (except for the row IDs).
+"""
+import math
+import random
+from datetime import datetime, time, timedelta
+
+from sqlalchemy.dialects.postgresql import insert
+
+from finance import log
+from finance.models import (
+    Account, AccountType, Asset, AssetType, AssetValue, Granularity,
+    IDAllocator, Portfolio, Record, RecordType, Transaction, TransactionState,
+    db)
+from finance.utils import load_stock_codes
+
+
+#: KRX regular session (09:00-15:30 KST) in UTC, as we always store UTC
+MARKET_OPEN = time(0, 0)
+MARKET_MINUTES = 390
+
+#: (code, description, initial value in KRW)
+CURRENCIES = [
+    ('KRW', 'Korean Won', None),
+    ('USD', 'United States Dollar', 1100.0),
+    ('EUR', 'Euro', 1300.0),
+    ('JPY', 'Japanese Yen', 10.0),
+    ('CNY', 'Chinese Yuan', 170.0),
+]
+
+#: Ratio of records that are balance adjustments rather than trades
+BALANCE_ADJUSTMENT_RATIO = 0.01
+
+SYNTHETIC_INSTITUTION = 'Synthetic'
+
+
+class BatchWriter(object):
+    """Buffers rows per table and writes them with `executemany()`, which is
+    turned into multi-row INSERT statements on PostgreSQL (see
+    `SQLALCHEMY_ENGINE_OPTIONS` in `create_worker_app`). Buffers are always
+    flushed in the order of `tables` so that foreign keys are satisfied.
+    """
+
+    def __init__(self, tables, batch_size=10000):
+        self.tables = tables
+        self.batch_size = batch_size
+        self.buffers = {table.name: [] for table in tables}
+        self.counts = {table.name: 0 for table in tables}
+
+    def add(self, table, row):
+        buffer = self.buffers[table.name]
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for table in self.tables:
+            rows = self.buffers[table.name]
+            if rows:
+                db.session.execute(table.insert(), rows)
+                self.counts[table.name] += len(rows)
+                self.buffers[table.name] = []
+        db.session.commit()
+
+
+def seeded_random(seed, label):
+    """Makes an independent random number generator for each concern, so that
+    changing the size of one part of the dataset does not shuffle the
+    others."""
+    return random.Random('{}:{}'.format(seed, label))
+
+
+def trading_days(start_date, end_date):
+    """Generates weekdays within [start_date, end_date)."""
+    date = start_date
+    while date < end_date:
+        if date.weekday() < 5:
+            yield date
+        date += timedelta(days=1)
+
+
+def market_minute(rng):
+    """Picks a minute offset from the market open. Trades are clustered around
+    the open and the close, which roughly gives the U-shaped intraday volume
+    curve we see in practice."""
+    p = rng.random()
+    if p < 0.35:
+        minute = abs(rng.gauss(0, 30))
+    elif p < 0.6:
+        minute = MARKET_MINUTES - 1 - abs(rng.gauss(0, 30))
+    else:
+        minute = rng.uniform(0, MARKET_MINUTES)
+    return min(max(int(minute), 0), MARKET_MINUTES - 1)
+
+
+def market_datetime(rng, date):
+    minute = market_minute(rng)
+    return datetime.combine(date, MARKET_OPEN) + timedelta(
+        minutes=minute, seconds=rng.randrange(60),
+        microseconds=rng.randrange(1000000))
+
+
+def load_stock_universe(fin, count, seed):
+    """Samples `count` stocks out of a `stock_codes.csv` document."""
+    codes = sorted(load_stock_codes(fin))
+    rng = seeded_random(seed, 'stocks')
+    return rng.sample(codes, min(count, len(codes)))
+
+
+def simulate_minute_bars(rng, initial_price, days, volatility=0.0008):
+    """Simulates minute bars with a geometric random walk.
+
+    :return: A generator of (date, [(minute, open, high, low, close,
+             volume), ...]) tuples, one per trading day.
+    """
+    price = initial_price
+    for date in days:
+        bars = []
+        for minute in range(MARKET_MINUTES):
+            open_ = price
+            close_ = open_ * math.exp(rng.gauss(0, volatility))
+            high = max(open_, close_) * (1 + abs(rng.gauss(0, volatility / 2)))
+            low = min(open_, close_) * (1 - abs(rng.gauss(0, volatility / 2)))
+            volume = int(rng.paretovariate(1.5) * 100)
+            bars.append((minute, open_, high, low, close_, volume))
+            price = close_
+        yield date, bars
+
+
+def daily_bar(bars):
+    """Aggregates minute bars into a daily bar."""
+    return (bars[0][1], max(b[2] for b in bars), min(b[3] for b in bars),
+            bars[-1][4], sum(b[5] for b in bars))
+
+
+def price_row(allocator, asset_id, base_asset_id, evaluated_at, granularity,
+              open_, high, low, close_, volume):
+    return {
+        'id': allocator.issue_one(),
+        'asset_id': asset_id,
+        'base_asset_id': base_asset_id,
+        'evaluated_at': evaluated_at,
+        'granularity': granularity,
+        'source': 'test',
+        'open': round(open_, 4),
+        'high': round(high, 4),
+        'low': round(low, 4),
+        'close': round(close_, 4),
+        'volume': volume,
+    }
+
+
+def record_row(allocator, account_id, asset_id, created_at, quantity,
+               transaction_id=None, type_=None):
+    if type_ is None:
+        type_ = RecordType.withdraw if quantity < 0 else RecordType.deposit
+    return {
+        'id': allocator.issue_one(),
+        'account_id': account_id,
+        'asset_id': asset_id,
+        'transaction_id': transaction_id,
+        'type': type_,
+        'created_at': created_at,
+        'category': None,
+        'quantity': round(quantity, 4),
+    }
+
+
+def insert_assets(allocator, rows):
+    """Inserts assets unless an asset with the same code already exists.
+
+    :param rows: A list of (type, code, name) tuples
+    :return: A {code: id} dictionary
+    """
+    table = Asset.__table__
+    values = [{'id': allocator.issue_one(), 'type': type_, 'code': code,
+               'name': name, 'description': name}
+              for type_, code, name in rows]
+    db.session.execute(
+        insert(table).values(values).on_conflict_do_nothing(
+            index_elements=['code']))
+    codes = [code for _, code, _ in rows]
+    query = db.session.query(Asset.code, Asset.id).filter(Asset.code.in_(codes))
+    return dict(query)
+
+
+def generate_dataset(stock_codes, seed=0, account_count=1000,
+                     record_count=1000000, stock_count=50, start_date=None,
+                     end_date=None, minute_bars=True, batch_size=10000):
+    """Generates a synthetic dataset straight into the database.
+
+    :param stock_codes: A stream to read `stock_codes.csv` from
+    :param record_count: Approximate number of records, including the two
+                         legs of each trade
+    :param start_date: Defaults to two years before `end_date`
+    :param end_date: Exclusive. Defaults to today.
+    :return: A {table_name: row_count} dictionary
+    """
+    if end_date is None:
+        end_date = datetime.utcnow().date()
+    if start_date is None:
+        start_date = end_date - timedelta(days=730)
+    if start_date >= end_date:
+        raise ValueError('start_date must be less than end_date')
+
+    institution = '{}-{}'.format(SYNTHETIC_INSTITUTION, seed)
+    if Account.query.filter(Account.institution == institution).first():
+        raise ValueError(
+            'A synthetic dataset for seed {} already exists'.format(seed))
+
+    allocator = IDAllocator()
+    writer = BatchWriter([
+        AssetValue.__table__, Portfolio.__table__, Account.__table__,
+        Transaction.__table__, Record.__table__], batch_size=batch_size)
+    days = list(trading_days(start_date, end_date))
+
+    # Assets
+    stocks = load_stock_universe(stock_codes, stock_count, seed)
+    asset_ids = insert_assets(
+        allocator,
+        [(AssetType.currency, code, name) for code, name, _ in CURRENCIES] +
+        [(AssetType.stock, code, name) for code, name in stocks])
+    db.session.commit()
+    krw_id = asset_ids['KRW']
+    log.info('Generating prices for {} assets over {} trading days',
+             len(asset_ids) - 1, len(days))
+
+    # Asset values. We only keep daily closes in memory, as we need them to
+    # price the trades.
+    price_rng = seeded_random(seed, 'prices')
+    initial_prices = [(code, value) for code, _, value in CURRENCIES[1:]] + \
+        [(code, price_rng.uniform(1000, 500000)) for code, _ in stocks]
+    daily_closes = {}
+    for code, initial_price in initial_prices:
+        asset_id = asset_ids[code]
+        closes = daily_closes[asset_id] = []
+        bars_by_day = simulate_minute_bars(price_rng, initial_price, days)
+        for date, bars in bars_by_day:
+            market_open = datetime.combine(date, MARKET_OPEN)
+            if minute_bars:
+                for minute, open_, high, low, close_, volume in bars:
+                    writer.add(AssetValue.__table__, price_row(
+                        allocator, asset_id, krw_id,
+                        market_open + timedelta(minutes=minute),
+                        Granularity.min, open_, high, low, close_, volume))
+            open_, high, low, close_, volume = daily_bar(bars)
+            writer.add(AssetValue.__table__, price_row(
+                allocator, asset_id, krw_id,
+                datetime.combine(date, time(0)), Granularity.day,
+                open_, high, low, close_, volume))
+            closes.append(close_)
+
+    # Portfolios and accounts
+    account_rng = seeded_random(seed, 'accounts')
+    portfolio_ids = []
+    for i in range(max(account_count // 10, 1)):
+        portfolio_id = allocator.issue_one()
+        portfolio_ids.append(portfolio_id)
+        writer.add(Portfolio.__table__, {
+            'id': portfolio_id, 'name': 'Synthetic portfolio {}'.format(i),
+            'description': None, 'base_asset_id': krw_id})
+
+    tradable_ids = [asset_ids[code] for code, _ in stocks] + \
+        [asset_ids[code] for code, _, _ in CURRENCIES[1:]]
+    account_ids = []
+    for i in range(account_count):
+        account_id = allocator.issue_one()
+        account_ids.append(account_id)
+        writer.add(Account.__table__, {
+            'id': account_id, 'user_id': None,
+            'portfolio_id': account_rng.choice(portfolio_ids),
+            'type': AccountType.investment,
+            'name': 'Synthetic account {}'.format(i),
+            'institution': institution, 'number': '{:08d}'.format(i),
+            'description': None, 'data': None})
+
+    # Records
+    record_rng = seeded_random(seed, 'records')
+    per_account = max(record_count // max(account_count, 1), 1)
+    for account_id in account_ids:
+        universe = record_rng.sample(
+            tradable_ids, min(len(tradable_ids), record_rng.randint(1, 10)))
+        holdings = dict.fromkeys(universe, 0)
+        cash = record_rng.randint(10, 1000) * 100000
+        writer.add(Record.__table__, record_row(
+            allocator, account_id, krw_id,
+            datetime.combine(days[0], MARKET_OPEN), cash))
+
+        # Sorted, strictly increasing timestamps keep the unique constraint
+        # on (account_id, asset_id, created_at, quantity) satisfied
+        day_indices = sorted(
+            record_rng.randrange(len(days)) for _ in range(per_account // 2))
+        timestamps = sorted(
+            market_datetime(record_rng, days[i]) for i in day_indices)
+        for index, created_at in zip(day_indices, timestamps):
+            if record_rng.random() < BALANCE_ADJUSTMENT_RATIO:
+                cash = record_rng.randint(10, 1000) * 100000
+                writer.add(Record.__table__, record_row(
+                    allocator, account_id, krw_id, created_at, cash,
+                    type_=RecordType.balance_adjustment))
+                continue
+
+            asset_id = record_rng.choice(universe)
+            unit_price = daily_closes[asset_id][index]
+            if holdings[asset_id] > 0 and record_rng.random() < 0.4:
+                quantity = -record_rng.randint(1, holdings[asset_id])
+            else:
+                quantity = record_rng.randint(1, 100)
+            amount = -quantity * unit_price
+            holdings[asset_id] += quantity
+            cash += amount
+
+            transaction_id = allocator.issue_one()
+            writer.add(Transaction.__table__, {
+                'id': transaction_id, 'initiated_at': created_at,
+                'closed_at': created_at, 'state': TransactionState.closed})
+            writer.add(Record.__table__, record_row(
+                allocator, account_id, krw_id, created_at, amount,
+                transaction_id))
+            writer.add(Record.__table__, record_row(
+                allocator, account_id, asset_id, created_at, quantity,
+                transaction_id))
+
+    writer.flush()
+    counts = dict(writer.counts)
+    counts['asset'] = len(asset_ids)
+    return counts
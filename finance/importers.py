@@ -1,36 +1,383 @@
 """A collection of data import functions."""
+import collections
+from concurrent.futures import ProcessPoolExecutor
 import csv
+import functools
+import glob
 import io
-
-from sqlalchemy.exc import IntegrityError
+import os
+import time
+from datetime import datetime, timedelta
 
 from finance import log
+from finance.exceptions import (AccountNotFoundException,
+                                AssetNotFoundException)
 from finance.models import (
-    Account, Asset, AssetValue, Granularity, Record, Transaction, db, deposit)
-from finance.providers import Miraeasset
+    Account, Asset, AssetType, AssetValue, Granularity, Record, Transaction,
+    UnitOfWork, current_unit_of_work, db, deposit)
+from finance.providers import Miraeasset, ShinhanCard
+from finance.utils import (
+    STOCK_TRADING_CATEGORIES, STOCK_TRANSFER_CATEGORIES, parse_stock_records,
+    stock_trading_code, stock_transfer_amount)
 
 
 # NOTE: A verb 'import' means local structured data -> database
-def import_stock_values(fin: io.TextIOWrapper, code: str, base_asset=None):
-    """Import stock values."""
+#: Number of rows between checkpoints of importers that commit every row
+CHECKPOINT_INTERVAL = 100
+
+
+def import_stock_values(fin: io.TextIOWrapper, code: str, base_asset=None,
+                        checkpoint=None):
+    """Import stock values.
+
+    :param checkpoint: A `finance.checkpoints.Checkpoint` to skip rows that
+                       have been imported already
+    """
     asset = Asset.get_by_symbol(code)
     reader = csv.reader(
         fin, delimiter=',', quotechar='"', skipinitialspace=True)
-    for date, open_, high, low, close_, volume, source in reader:
-        try:
-            yield AssetValue.create(
-                evaluated_at=date, granularity=Granularity.day, asset=asset,
-                base_asset=base_asset, open=open_, high=high, low=low,
-                close=close_, volume=volume, source=source)
-        except IntegrityError:
-            log.warn('AssetValue for {0} on {1} already exist', code, date)
-            db.session.rollback()
+    if checkpoint is not None:
+        reader = checkpoint.resume(reader)
+    with UnitOfWork() as uow:
+        for i, (date, open_, high, low, close_, volume, source) in \
+                enumerate(reader, 1):
+            failures = len(uow.failures)
+            with uow.savepoint():
+                asset_value = AssetValue.create(
+                    evaluated_at=date, granularity=Granularity.day,
+                    asset=asset, base_asset=base_asset, open=open_,
+                    high=high, low=low, close=close_, volume=volume,
+                    source=source)
+            if len(uow.failures) > failures:
+                log.warn('AssetValue for {0} on {1} already exist', code, date)
+            else:
+                yield asset_value
+            if i % CHECKPOINT_INTERVAL == 0:
+                uow.commit()
+                if checkpoint is not None:
+                    checkpoint.save()
+    if checkpoint is not None:
+        checkpoint.save()
+
+
+def import_stock_records(fin: io.TextIOWrapper, stock_account: Account,
+                         bank_account: Account, batch_size=1000):
+    """Imports records exported from the Shinhan HTS (see
+    `parse_stock_records()`) in bulk. Asset codes of the whole file are
+    resolved with a single query before anything is written, and records
+    that already exist are skipped.
+
+    :return: Number of records inserted
+    :raise AccountNotFoundException: If an account that records go into is
+                                     None
+    """
+    accounts = {'stock': stock_account, 'bank': bank_account}
+    return write_export_entries(
+        list(parse_shinhan_hts_entries(fin)), accounts, {}, batch_size)
+
+
+def import_shinhancard_statements(statements, batch_size=1000):
+    """Imports Shinhan Card statements into credit card accounts in bulk.
+    Charges are recorded as withdrawals of KRW (and cancellations as
+    deposits), with merchant names as their categories.
+
+    As statements only tell dates, the n-th charge of a day is recorded at
+    n microseconds past midnight, so that identical charges of a day (e.g.,
+    two cups of coffee) do not violate the unique constraint of records.
+    Therefore, statements of the same account must be given in the same order
+    to skip records that already exist.
+
+    :param statements: An iterable of (account, file) pairs
+    :return: Number of records inserted
+    """
+    provider = ShinhanCard()
+    asset_krw = Asset.get_by_symbol('KRW')
+    sequences = collections.Counter()  # {(account_id, date): count}
+
+    def records():
+        for account, fin in statements:
+            for record in provider.parse_statement(fin):
+                key = (account.id, record.date)
+                sequences[key] += 1
+                yield {
+                    'account_id': account.id,
+                    'asset_id': asset_krw.id,
+                    'created_at':
+                        record.date + timedelta(microseconds=sequences[key]),
+                    'quantity': -record.amount,
+                    'category': record.description,
+                }
+
+    return Record.bulk_insert(records(), batch_size=batch_size)
+
+
+#: Suffixes of KRX stock codes, which are what `stock_codes.csv` lists
+KRX_CODE_SUFFIXES = ('.KS', '.KQ')
+
+StockAssetChanges = collections.namedtuple(
+    'StockAssetChanges', ['inserted', 'updated', 'delisted'])
+
+
+def sync_stock_assets(codes, now=None, commit=True):
+    """Makes KRX stock assets match `codes` (e.g., of `stock_codes.csv`).
+    Assets of new codes are inserted, names that have changed are updated,
+    and those no longer listed get `delisted_at`. All of this takes a single
+    query to read the current assets and at most one statement for each kind
+    of change.
+
+    :param codes: (code, name) pairs, such as what `load_stock_codes()` yields
+    :return: A `StockAssetChanges` of lists of codes
+    """
+    names = dict(codes)
+    if not names:
+        # Otherwise, every single stock would be delisted
+        raise ValueError('No stock codes are given')
+    if now is None:
+        now = datetime.utcnow()
+
+    table = Asset.__table__
+    is_krx_stock = db.and_(
+        table.c.type == AssetType.stock,
+        db.or_(*[table.c.code.like('%' + suffix)
+                 for suffix in KRX_CODE_SUFFIXES]))
+    rows = db.session.execute(
+        db.select([table.c.id, table.c.code, table.c.name,
+                   table.c.delisted_at])
+        .where(db.or_(table.c.code.in_(list(names)), is_krx_stock))) \
+        .fetchall()
+
+    existing = {row.code for row in rows}
+    inserts = [{'type': AssetType.stock, 'code': code, 'name': names[code]}
+               for code in names if code not in existing]
+    updates = [{'asset_id': row.id, 'asset_name': names[row.code]}
+               for row in rows if row.code in names
+               and (row.name != names[row.code]
+                    or row.delisted_at is not None)]
+    delisted = [row for row in rows
+                if row.code not in names and row.delisted_at is None]
+
+    if inserts:
+        Asset.bulk_create(inserts, commit=False)
+    if updates:
+        db.session.execute(
+            table.update()
+            .where(table.c.id == db.bindparam('asset_id'))
+            .values(name=db.bindparam('asset_name'), delisted_at=None),
+            updates)
+    if delisted:
+        db.session.execute(
+            table.update()
+            .where(table.c.id.in_([row.id for row in delisted]))
+            .values(delisted_at=now))
+    if commit:
+        db.session.commit()
+
+    id_codes = {row.id: row.code for row in rows}
+    return StockAssetChanges(
+        sorted(row['code'] for row in inserts),
+        sorted(id_codes[row['asset_id']] for row in updates),
+        sorted(row.code for row in delisted))
+
+
+# NOTE: Broker exports are turned into entries of (account role, asset key,
+# quantity, created_at), where an account role is either 'stock' or 'bank' and
+# an asset key is either ('code', code) or ('isin', ISIN). Entries consist of
+# plain values only, so that exports can be parsed in other processes.
+
+def parse_shinhan_hts_entries(fin):
+    """Yields entries of records exported from the Shinhan HTS."""
+    for data in parse_stock_records(fin):
+        if data['category2'] in STOCK_TRADING_CATEGORIES:
+            yield ('stock', ('code', stock_trading_code(data)),
+                   data['quantity'], data['date'])
+        elif data['category2'] in STOCK_TRANSFER_CATEGORIES:
+            # FIXME: Not a good idea to use a hard coded value
+            yield ('bank', ('code', 'KRW'), stock_transfer_amount(data),
+                   data['date'])
+        else:
+            log.info('Skipping {} record...', data['category2'])
+
+
+def parse_miraeasset_foreign_entries(fin):
+    """Yields entries of foreign transactions (해외거래내역, 9465) exported
+    from Miraeasset, the same ones as `import_miraeasset_foreign_records()`
+    would make (but not grouped into transactions)."""
+    for r in Miraeasset().parse_foreign_transactions(fin):
+        assert r.currency != 'KRW'
+        created_at = r.synthesized_created_at
+        currency, stock = ('code', r.currency), ('isin', r.code)
+
+        if r.category == '해외주매수':
+            yield 'stock', currency, -r.amount, created_at
+            yield 'stock', stock, r.quantity, created_at
+        elif r.category == '해외주매도':
+            yield 'stock', stock, -r.quantity, created_at
+            yield 'stock', currency, r.amount, created_at
+        elif r.category == '해외주배당금':
+            yield 'stock', currency, r.amount, created_at
+        elif r.category == '환전매수':
+            local_amount = int(r.raw_columns[6])  # amount in KRW
+            yield 'stock', ('code', 'KRW'), -local_amount, created_at
+            yield 'stock', currency, r.amount, created_at
+        elif r.category == '환전매도':
+            raise NotImplementedError
+        elif r.category == '외화인지세':
+            yield 'stock', currency, -r.amount, created_at
+        else:
+            raise ValueError('Unknown record category: {0}'.format(r.category))
+
+
+#: {kind: a function to parse an export into entries}
+BROKER_EXPORT_PARSERS = {
+    'miraeasset': parse_miraeasset_foreign_entries,
+    'shinhan': parse_shinhan_hts_entries,
+}
+
+
+def parse_export_file(kind, encoding, path):
+    """Parses an export file into a list of entries. This runs in worker
+    processes of `import_broker_exports()`."""
+    with open(path, encoding=encoding) as fin:
+        return list(BROKER_EXPORT_PARSERS[kind](fin))
+
+
+def find_export_files(sources):
+    """Expands directories (into the files in them) and glob patterns into a
+    sorted list of files, without duplicates."""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            matches = [os.path.join(source, name)
+                       for name in os.listdir(source)
+                       if not name.startswith('.')]
+        else:
+            matches = glob.glob(source)
+        paths.extend(sorted(path for path in matches if os.path.isfile(path)))
+    return list(collections.OrderedDict.fromkeys(paths))
+
+
+def resolve_asset_keys(keys, asset_ids):
+    """Looks up asset IDs of asset keys that are not in `asset_ids` yet, with
+    a single query, and adds them to `asset_ids`.
+
+    :param asset_ids: A {asset key: asset ID} dictionary to be updated
+    """
+    keys = set(keys) - set(asset_ids)
+    if not keys:
+        return asset_ids
+    codes = [value for by, value in keys if by == 'code']
+    isins = [value for by, value in keys if by == 'isin']
+
+    rows = db.session.query(Asset.id, Asset.code, Asset.isin).filter(
+        db.or_(Asset.code.in_(codes), Asset.isin.in_(isins)))
+    for id_, code, isin in rows:
+        for key in (('code', code), ('isin', isin)):
+            if key in keys:
+                asset_ids.setdefault(key, id_)
+
+    missing = keys - set(asset_ids)
+    if missing:
+        raise AssetNotFoundException(
+            ', '.join(sorted(value for _, value in missing)))
+    return asset_ids
+
+
+def check_accounts(roles, accounts):
+    """Makes sure that there is an account for each of `roles`, as records
+    without accounts would never conflict with existing ones and be inserted
+    over and over again.
+
+    :raise AccountNotFoundException: With the missing role
+    """
+    for role in sorted(roles):
+        if accounts.get(role) is None:
+            raise AccountNotFoundException(role)
+
+
+def write_export_entries(entries, accounts, asset_ids, batch_size=1000):
+    """Inserts records of entries in bulk, skipping those that already exist.
+
+    :param accounts: A {account role: account} dictionary
+    :param asset_ids: A {asset key: asset ID} dictionary, which is reused (and
+                      filled up) across calls
+    :return: Number of records inserted
+    """
+    check_accounts({role for role, _, _, _ in entries}, accounts)
+    resolve_asset_keys((key for _, key, _, _ in entries), asset_ids)
+    account_ids = {role: account.id for role, account in accounts.items()
+                   if account is not None}
+    return Record.bulk_insert(
+        ({'account_id': account_ids[role], 'asset_id': asset_ids[key],
+          'quantity': quantity, 'created_at': created_at}
+         for role, key, quantity, created_at in entries),
+        batch_size=batch_size)
+
+
+ImportProgress = collections.namedtuple(
+    'ImportProgress', ['path', 'files', 'entries', 'inserted', 'elapsed'])
+
+
+def import_broker_exports(paths, kind, accounts, jobs=None, encoding='utf-8',
+                          batch_size=1000, progress=None):
+    """Imports many broker exports of a kind (see `BROKER_EXPORT_PARSERS`).
+
+    Files are parsed in a pool of `jobs` processes (as many as CPUs by
+    default, or none if `jobs` is 1), while the current process is the only
+    one that writes. Records of each file are inserted in bulk and committed
+    in the order of `paths`, so the records of an account are written in
+    order. Records that already exist are skipped, and asset codes are looked
+    up once for all files.
+
+    :param accounts: A {account role: account} dictionary
+    :param progress: A function called with an `ImportProgress` (of the
+                     whole import so far) whenever a file has been imported
+    :return: An `ImportProgress` of the whole import
+    :raise AccountNotFoundException: If any of `accounts` is None
+    """
+    # Fails before parsing anything
+    check_accounts(accounts.keys(), accounts)
+
+    parse = functools.partial(parse_export_file, kind, encoding)
+    started_at = time.time()
+    asset_ids = {}
+    files = entry_count = inserted = 0
+    path = None
+
+    def write(results):
+        nonlocal files, entry_count, inserted, path
+        for path, entries in zip(paths, results):
+            inserted += write_export_entries(
+                entries, accounts, asset_ids, batch_size)
+            files += 1
+            entry_count += len(entries)
+            if progress is not None:
+                progress(ImportProgress(path, files, entry_count, inserted,
+                                        time.time() - started_at))
+
+    if jobs == 1:
+        write(map(parse, paths))
+    else:
+        with ProcessPoolExecutor(jobs) as executor:
+            # NOTE: Results come in the order of `paths`, while workers keep
+            # parsing the following files
+            write(executor.map(parse, paths))
+
+    return ImportProgress(path, files, entry_count, inserted,
+                          time.time() - started_at)
 
 
 def make_double_record_transaction(
     created_at, account, asset_from, quantity_from, asset_to, quantity_to
 ):
-    """Creates a double record transaction (e.g., a buy order of stocks)"""
+    """Creates a double record transaction (e.g., a buy order of stocks). It
+    is committed along with the current `UnitOfWork`, if any, or with a single
+    commit of its own."""
+    if current_unit_of_work() is None:
+        with UnitOfWork():
+            return make_double_record_transaction(
+                created_at, account, asset_from, quantity_from, asset_to,
+                quantity_to)
+
     with Transaction.create() as t:
         record1 = deposit(account, asset_from, quantity_from, created_at, t)
         record2 = deposit(account, asset_to, quantity_to, created_at, t)
@@ -40,41 +387,64 @@ def make_double_record_transaction(
 def import_miraeasset_foreign_records(
     fin: io.TextIOWrapper,
     account: Account,
+    checkpoint=None,
 ):
+    """
+    :param checkpoint: A `finance.checkpoints.Checkpoint` to skip records
+                       that have been imported already
+    """
     provider = Miraeasset()
     asset_krw = Asset.get_by_symbol('KRW')
 
-    for r in provider.parse_foreign_transactions(fin):
-        assert r.currency != 'KRW'
-        # FIXME: Handle a case where asset cannot be found
-        target_asset = Asset.get_by_symbol(r.currency)
+    records = provider.parse_foreign_transactions(fin)
+    if checkpoint is not None:
+        records = checkpoint.resume(
+            records, serialize=lambda r: ','.join(r.raw_columns))
+    # NOTE: A record that fails (e.g., the one that has been imported already)
+    # is rolled back alone
+    with UnitOfWork() as uow:
+        for i, r in enumerate(records, 1):
+            with uow.savepoint():
+                import_miraeasset_foreign_record(r, account, asset_krw)
+            if i % CHECKPOINT_INTERVAL == 0:
+                uow.commit()
+                if checkpoint is not None:
+                    checkpoint.save()
+    if checkpoint is not None:
+        checkpoint.save()
 
-        if r.category == '해외주매수':
-            asset_stock = Asset.get_by_isin(r.code)
-            make_double_record_transaction(
-                r.synthesized_created_at,
-                account,
-                target_asset, -r.amount,
-                asset_stock, r.quantity)
-        elif r.category == '해외주매도':
-            asset_stock = Asset.get_by_isin(r.code)
-            make_double_record_transaction(
-                r.synthesized_created_at,
-                account,
-                asset_stock, -r.quantity,
-                target_asset, r.amount)
-        elif r.category == '해외주배당금':
-            deposit(account, target_asset, r.amount, r.synthesized_created_at)
-        elif r.category == '환전매수':
-            local_amount = int(r.raw_columns[6])  # amount in KRW
-            make_double_record_transaction(
-                r.synthesized_created_at,
-                account,
-                asset_krw, -local_amount,
-                target_asset, r.amount)
-        elif r.category == '환전매도':
-            raise NotImplementedError
-        elif r.category == '외화인지세':
-            deposit(account, target_asset, -r.amount, r.synthesized_created_at)
-        else:
-            raise ValueError('Unknown record category: {0}'.format(r.category))
+
+def import_miraeasset_foreign_record(r, account, asset_krw):
+    assert r.currency != 'KRW'
+    # FIXME: Handle a case where asset cannot be found
+    target_asset = Asset.get_by_symbol(r.currency)
+
+    if r.category == '해외주매수':
+        asset_stock = Asset.get_by_isin(r.code)
+        make_double_record_transaction(
+            r.synthesized_created_at,
+            account,
+            target_asset, -r.amount,
+            asset_stock, r.quantity)
+    elif r.category == '해외주매도':
+        asset_stock = Asset.get_by_isin(r.code)
+        make_double_record_transaction(
+            r.synthesized_created_at,
+            account,
+            asset_stock, -r.quantity,
+            target_asset, r.amount)
+    elif r.category == '해외주배당금':
+        deposit(account, target_asset, r.amount, r.synthesized_created_at)
+    elif r.category == '환전매수':
+        local_amount = int(r.raw_columns[6])  # amount in KRW
+        make_double_record_transaction(
+            r.synthesized_created_at,
+            account,
+            asset_krw, -local_amount,
+            target_asset, r.amount)
+    elif r.category == '환전매도':
+        raise NotImplementedError
+    elif r.category == '외화인지세':
+        deposit(account, target_asset, -r.amount, r.synthesized_created_at)
+    else:
+        raise ValueError('Unknown record category: {0}'.format(r.category))
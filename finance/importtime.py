@@ -0,0 +1,56 @@
+"""Measures how long it takes to import modules, based on the output of
+`python -X importtime` (available since Python 3.7)."""
+import collections
+import subprocess
+import sys
+import time
+
+ImportTime = collections.namedtuple(
+    'ImportTime', ['module', 'self_us', 'cumulative_us', 'depth'])
+
+
+def parse_importtime(lines):
+    """Parses lines such as the following:
+
+        import time: self [us] | cumulative | imported package
+        import time:       410 |      37403 |         requests
+
+    :return: A generator of `ImportTime`, in the order of completion
+    """
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+        if not self_us.strip().isdigit():
+            continue  # Header
+        # Nested imports are indented by two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        yield ImportTime(name.strip(), int(self_us), int(cumulative_us),
+                         depth)
+
+
+def measure(args):
+    """Runs `python -X importtime <args>` in a subprocess.
+
+    :return: (wall time in seconds, a list of `ImportTime`)
+    """
+    started_at = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + list(args),
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True)
+    wall_time = time.perf_counter() - started_at
+    return wall_time, list(parse_importtime(proc.stderr.splitlines()))
+
+
+def summarize(imports, top=5):
+    """Sums up the time spent on imports and finds the heaviest packages.
+
+    :return: (total import time in microseconds, a list of (package,
+             cumulative import time in microseconds), heaviest first)
+    """
+    total = sum(i.cumulative_us for i in imports if i.depth == 0)
+    packages = [(i.module, i.cumulative_us) for i in imports
+                if '.' not in i.module and not i.module.startswith('_')]
+    heaviest = sorted(packages, key=lambda p: p[1], reverse=True)[:top]
+    return total, heaviest
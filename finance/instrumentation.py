@@ -0,0 +1,166 @@
+"""Counts SQL statements and measures database and wall time, either for a
+single HTTP request or for a single CLI command.
+
+Instrumentation is disabled unless `INSTRUMENTATION` is set (either in the
+Flask config or as an environment variable for CLI commands). When enabled,
+each profile is emitted as a logbook record whose `extra` dictionary holds the
+numbers, and HTTP responses carry them in a `Server-Timing` header.
+"""
+import heapq
+import threading
+import time
+
+from flask import g, request
+from logbook import Logger
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = Logger('finance')
+
+#: Number of slowest statements to keep for each profile
+SLOWEST_STATEMENT_COUNT = 5
+
+#: Statements longer than this will be truncated in the logs
+STATEMENT_DISPLAY_LENGTH = 200
+
+_local = threading.local()
+
+
+class Profile(object):
+    """Collects timings of a single unit of work (a request or a command)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self.statement_count = 0
+        self.db_time = 0.0
+        #: Computations saved by `finance.cache.memoize_in_request`
+        self.memo_hits = 0
+        #: A min-heap of (duration, sequence, statement)
+        self.slowest = []
+
+    def record(self, statement, duration):
+        self.statement_count += 1
+        self.db_time += duration
+
+        item = (duration, self.statement_count, statement)
+        if len(self.slowest) < SLOWEST_STATEMENT_COUNT:
+            heapq.heappush(self.slowest, item)
+        else:
+            heapq.heappushpop(self.slowest, item)
+
+    def finish(self):
+        if self.finished_at is None:
+            self.finished_at = time.perf_counter()
+        return self
+
+    @property
+    def wall_time(self):
+        finished_at = self.finished_at or time.perf_counter()
+        return finished_at - self.started_at
+
+    def slowest_statements(self):
+        """Returns (duration, statement) tuples, slowest first."""
+        return [(duration, statement) for duration, _, statement
+                in sorted(self.slowest, reverse=True)]
+
+    def server_timing(self):
+        """Formats the profile as a `Server-Timing` header value."""
+        return 'db;dur={:.2f};desc="{} SQL statements", ' \
+               'total;dur={:.2f}, memo;desc="{} computations saved"'.format(
+                   self.db_time * 1000, self.statement_count,
+                   self.wall_time * 1000, self.memo_hits)
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'statement_count': self.statement_count,
+            'db_time_ms': round(self.db_time * 1000, 2),
+            'wall_time_ms': round(self.wall_time * 1000, 2),
+            'memo_hits': self.memo_hits,
+            'slowest_statements': [
+                {'duration_ms': round(duration * 1000, 2),
+                 'statement': statement[:STATEMENT_DISPLAY_LENGTH]}
+                for duration, statement in self.slowest_statements()],
+        }
+
+    def report(self):
+        data = self.as_dict()
+        log.info('{name}: {statement_count} SQL statements, '
+                 '{db_time_ms} ms in DB, {wall_time_ms} ms in total, '
+                 '{memo_hits} computations saved',
+                 extra=data, **data)
+        for item in data['slowest_statements']:
+            log.debug('  {duration_ms} ms: {statement}', **item)
+
+
+def current_profile():
+    """Returns the innermost active profile of this thread, if any."""
+    stack = getattr(_local, 'profiles', None)
+    return stack[-1] if stack else None
+
+
+def start_profile(name):
+    profile = Profile(name)
+    if not hasattr(_local, 'profiles'):
+        _local.profiles = []
+    _local.profiles.append(profile)
+    return profile
+
+
+def finish_profile(profile):
+    stack = getattr(_local, 'profiles', [])
+    if profile in stack:
+        stack.remove(profile)
+    return profile.finish()
+
+
+# NOTE: Listeners are attached to all engines when this module is imported,
+# because connections opened before a listener is attached never fire it. They
+# are no-ops while no profile is active.
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    if current_profile() is not None:
+        conn.info.setdefault('query_started_at', []).append(
+            time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(conn, cursor, statement, parameters, context,
+                         executemany):
+    profile = current_profile()
+    if profile is None:
+        return
+    started_at = conn.info.get('query_started_at')
+    if started_at:
+        profile.record(statement, time.perf_counter() - started_at.pop())
+
+
+def init_app(app):
+    """Profiles every request of the app if `INSTRUMENTATION` is set."""
+    if not app.config.get('INSTRUMENTATION'):
+        return
+
+    @app.before_request
+    def start_request_profile():
+        g.profile = start_profile(
+            '{} {}'.format(request.method, request.path))
+
+    @app.after_request
+    def finish_request_profile(response):
+        profile = g.pop('profile', None)
+        if profile is not None:
+            finish_profile(profile)
+            response.headers.add('Server-Timing', profile.server_timing())
+            profile.report()
+        return response
+
+    @app.teardown_request
+    def report_unfinished_profile(exc):
+        # If `after_request` did not run (e.g., an unhandled exception), we
+        # still report what we have got so far
+        profile = g.pop('profile', None)
+        if profile is not None:
+            finish_profile(profile).report()
@@ -1,11 +1,23 @@
-from flask import Blueprint, jsonify, render_template, request
+import csv
+import hashlib
+import io
+
+from flask import (Blueprint, Response, abort, jsonify, render_template,
+                   request)
 from logbook import Logger
 
+from finance.cache import LRUCache
+from finance.exceptions import AssetValueUnavailableException
 from finance.models import Account, Asset, DartReport, Portfolio
+from finance.replica import read_only
+from finance.utils import parse_date
 
 main_module = Blueprint('main', __name__, template_folder='templates')
 log = Logger()
 
+#: {(portfolio_id, start, end, format): (etag, response body)}
+nav_cache = LRUCache(maxsize=256)
+
 
 ENTITY_MAPPINGS = {
     'account': {
@@ -52,18 +64,128 @@ def index():
     return render_template('index.html', **context)
 
 
-@main_module.route('/portfolios/<int:portfolio_id>/nav')
-def nav(portfolio_id):
-    """Returns the net asset values (NAVs) for a given period of time."""
-    portfolio = Portfolio.query.get(portfolio_id)
-    start, end = map(request.args.get, ['start', 'end'])
+def parse_date_arg(value, default):
+    """Parses a date (e.g., 2018-01-31) or a relative number of days (e.g.,
+    -30) from a query string argument."""
+    if value is None:
+        return parse_date(default)
+    try:
+        return parse_date(int(value))
+    except ValueError:
+        pass
+    try:
+        return parse_date(value).date()
+    except ValueError:
+        abort(400)
+
+
+def nav_format():
+    """Determines the output format either by the `format` argument or by the
+    Accept header."""
+    format_ = request.args.get('format')
+    if format_ is None:
+        best = request.accept_mimetypes.best_match(
+            ['application/json', 'text/csv'])
+        format_ = 'csv' if best == 'text/csv' else 'json'
+    if format_ not in ('json', 'csv'):
+        abort(400)
+    return format_
+
+
+def render_nav(portfolio, start, end, format_):
+    rows = list(portfolio.daily_net_worth(start, end))
+    if format_ == 'csv':
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(['date', 'nav'])
+        for date, net_worth in rows:
+            writer.writerow([date.isoformat(), net_worth])
+        return buf.getvalue()
+    else:
+        return jsonify(
+            portfolio_id=portfolio.id,
+            base_asset_id=portfolio.base_asset_id,
+            nav=[{'date': date.isoformat(), 'nav': float(net_worth)}
+                 for date, net_worth in rows]).get_data()
 
-    portfolio.daily_net_worth(start, end)
 
-    return ''
+@main_module.route('/portfolios/<int:portfolio_id>/nav')
+@read_only
+def nav(portfolio_id):
+    """Returns the net asset values (NAVs) for a given period of time.
+
+    The response carries an ETag derived from the latest changes of the
+    records and the asset values the NAVs depend on, so that an unchanged
+    series is answered with 304 Not Modified. Rendered series are cached per
+    (portfolio, start, end).
+    """
+    from finance.valuation import portfolio_version
+
+    portfolio = Portfolio.query.get_or_404(portfolio_id)
+    start = parse_date_arg(request.args.get('start'), -30)
+    end = parse_date_arg(request.args.get('end'), 0)
+    if start > end:
+        abort(400)
+    format_ = nav_format()
+
+    key = (portfolio.id, start, end, format_)
+    version = repr((key, portfolio_version(portfolio)))
+    etag = hashlib.sha1(version.encode('utf-8')).hexdigest()
+
+    mimetype = 'text/csv' if format_ == 'csv' else 'application/json'
+    if etag in request.if_none_match:
+        resp = Response(status=304, mimetype=mimetype)
+    else:
+        cached = nav_cache.get(key)
+        if cached is not None and cached[0] == etag:
+            body = cached[1]
+        else:
+            try:
+                body = render_nav(portfolio, start, end, format_)
+            except AssetValueUnavailableException:
+                return jsonify(error='Asset values are unavailable'), 404
+            nav_cache.set(key, (etag, body))
+        resp = Response(body, mimetype=mimetype)
+
+    resp.set_etag(etag)
+    resp.cache_control.no_cache = True
+    return resp
+
+
+#: Maximum number of search hits per page
+MAX_SEARCH_PER_PAGE = 100
+
+
+def parse_int_arg(name, default, minimum=1, maximum=None):
+    try:
+        value = int(request.args.get(name, default))
+    except ValueError:
+        abort(400)
+    if value < minimum or (maximum is not None and value > maximum):
+        abort(400)
+    return value
+
+
+@main_module.route('/dart_reports/search')
+@read_only
+def search_dart_reports():
+    """Searches DART reports, e.g., /dart_reports/search?q=유상증자&page=2"""
+    text = request.args.get('q', '').strip()
+    if not text:
+        return jsonify(error='A search query (q) is required'), 400
+    page = parse_int_arg('page', 1)
+    per_page = parse_int_arg('per_page', 20, maximum=MAX_SEARCH_PER_PAGE)
+
+    result = DartReport.search(text, page, per_page)
+    hits = [dict(hit, registered_at=hit['registered_at'].isoformat()
+                 if hit['registered_at'] else None)
+            for hit in result.hits]
+    return jsonify(query=result.query, total=result.total, page=result.page,
+                   per_page=result.per_page, hits=hits)
 
 
 @main_module.route('/entities/<entity_type>')
+@read_only
 def list_entities(entity_type):
     entity_class = get_entity_class(entity_type)
     entities = entity_class.query.all()
@@ -75,6 +197,7 @@ def list_entities(entity_type):
 
 
 @main_module.route('/entities/<entity_type>:<int:entity_id>')
+@read_only
 def view_entity(entity_type, entity_id):
     entity_class = get_entity_class(entity_type)
     entity = entity_class.query.get(entity_id)
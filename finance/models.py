@@ -1,24 +1,56 @@
 import collections
-import functools
-import operator
+import contextlib
+import html
+import re
+import threading
+import zlib
 from datetime import datetime, timedelta
 
 import uuid64
 from flask_login import UserMixin
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import JSON, TSVECTOR
 from sqlalchemy.exc import IntegrityError, InvalidRequestError
 from sqlalchemy.ext.indexable import index_property
 
+from finance import log
+from finance.cache import (cached_valuation, clear_request_memo,
+                           get_valuation_cache, memoize_in_request)
 from finance.exceptions import (AccountNotFoundException,
                                 AssetNotFoundException,
                                 AssetValueUnavailableException,
                                 InvalidTargetAssetException)
-from finance.utils import date_range
+from finance.fixedpoint import (accumulate_balance, from_fixed,
+                                from_fixed_product, merge_balances, to_fixed)
+from finance.fixedpoint import net_worth as fixed_net_worth
+from finance.replica import (RoutingSession, RoutingSQLAlchemy, in_savepoint,
+                             read_only)
 from typing import Any  # noqa
 
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
 JsonType = db.String().with_variant(JSON(), 'postgresql')
+TsVectorType = db.Text().with_variant(TSVECTOR(), 'postgresql')
+
+
+class CompressedText(db.TypeDecorator):
+    """Stores text as zlib-compressed UTF-8. Values are decompressed when
+    they are loaded, so columns of this type had better be deferred."""
+
+    impl = db.LargeBinary
+
+    def __init__(self, level=6, *args, **kwargs):
+        super(CompressedText, self).__init__(*args, **kwargs)
+        self.level = level
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return zlib.compress(value.encode('utf-8'), self.level)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return zlib.decompress(value).decode('utf-8')
 
 
 def balance_adjustment(account, asset, quantity, date=None, transaction=None):
@@ -34,6 +66,51 @@ def deposit(account, asset, quantity, date=None, transaction=None):
         transaction=transaction)
 
 
+class IDAllocator(object):
+    """Issues strictly increasing uuid64 identifiers in batches.
+
+    `uuid64.issue()` resolves the host name on every call and only has a
+    resolution of 100 microseconds, so issuing one ID per row is both slow and
+    prone to collisions when we insert many rows at once.
+    """
+
+    #: The lower 16 bits of a uuid64 are the node ID
+    step = 1 << 16
+
+    def __init__(self):
+        node_id = uuid64.issue() & 0xFFFF
+        self.uuid = uuid64.UUID64(node_id)
+        self.last = 0
+        self.lock = threading.Lock()
+
+    def issue(self, count=1):
+        if count < 1:
+            return []
+        with self.lock:
+            first = max(self.last + self.step, self.uuid.issue())
+            ids = [first + i * self.step for i in range(count)]
+            self.last = ids[-1]
+        return ids
+
+    def issue_one(self):
+        return self.issue(1)[0]
+
+
+_id_allocator = None
+_id_allocator_lock = threading.Lock()
+
+
+def allocate_ids(count=1):
+    """Issues IDs for rows that are inserted in bulk, from an allocator shared
+    within the process (which is created on the first call, as it resolves the
+    host name)."""
+    global _id_allocator
+    with _id_allocator_lock:
+        if _id_allocator is None:
+            _id_allocator = IDAllocator()
+    return _id_allocator.issue(count)
+
+
 def get_asset_by_fund_code(code: str):
     """Gets an Asset instance mapped to the given fund code.
 
@@ -52,33 +129,147 @@ def get_asset_by_fund_code(code: str):
     return Asset.query.get(asset_id)
 
 
+def deduplicate_rows(rows, columns):
+    """Keeps only the last of the rows that have the same values of
+    `columns`. Rows with NULL in any of them never conflict, so they are all
+    kept."""
+    deduplicated = collections.OrderedDict()
+    for row in rows:
+        key = tuple(row.get(c) for c in columns)
+        if None in key:
+            key = object()
+        deduplicated.pop(key, None)
+        deduplicated[key] = row
+    return list(deduplicated.values())
+
+
 class CRUDMixin(object):
     """Copied from https://realpython.com/blog/python/python-web-applications-with-flask-part-ii/
     """  # noqa
 
     __table_args__ = {'extend_existing': True}  # type: Any
 
+    # NOTE: The default must be a callable, which is called for every row
+    # rather than once when this module is loaded
     id = db.Column(db.BigInteger, primary_key=True, autoincrement=False,
-                   default=uuid64.issue())
+                   default=lambda: allocate_ids()[0])
 
     @classmethod
     def create(cls, commit=True, ignore_if_exists=False, **kwargs):
         if 'id' not in kwargs:
-            kwargs.update(dict(id=uuid64.issue()))
+            kwargs.update(dict(id=allocate_ids()[0]))
         instance = cls(**kwargs)
 
         if hasattr(instance, 'created_at') \
                 and getattr(instance, 'created_at') is None:
             instance.created_at  = datetime.utcnow()
 
-        try:
-            return instance.save(commit=commit)
-        except (IntegrityError, InvalidRequestError):
-            if ignore_if_exists:
-                db.session.rollback()
+        if ignore_if_exists:
+            # Only the insert of this instance is rolled back, rather than the
+            # whole session
+            try:
+                with db.session.begin_nested():
+                    db.session.add(instance)
+            except (IntegrityError, InvalidRequestError):
                 return cls.find(**kwargs)
+        return instance.save(commit=commit)
+
+    @classmethod
+    def bulk_create(cls, rows, conflict_columns=None, batch_size=1000,
+                    commit=True):
+        """Inserts rows with a single multi-row INSERT statement for each
+        batch (PostgreSQL only), bypassing the ORM. IDs of rows that do not
+        have one are allocated in batches.
+
+        :param rows: An iterable of dictionaries of column values, which is
+                     consumed a batch at a time. Rows of a batch are expected
+                     to have the same keys, as missing ones become NULL.
+        :param conflict_columns: Columns of a unique constraint, if rows that
+                                 violate it are to be skipped
+        :param commit: Commits after each batch, so that a large import does
+                       not end up in a single huge transaction (unless within
+                       a `UnitOfWork`)
+        :return: A list of IDs of the rows inserted
+        """
+        return cls._bulk_write(rows, conflict_columns, (), batch_size, commit)
+
+    @classmethod
+    def bulk_upsert(cls, rows, conflict_columns=('id',), update_columns=None,
+                    batch_size=1000, commit=True):
+        """Same as `bulk_create()`, but rows that violate the unique
+        constraint of `conflict_columns` update the existing ones instead.
+
+        Rows of the same `conflict_columns` within a batch, which PostgreSQL
+        refuses to update twice in a single statement, are deduplicated (the
+        last one wins).
+
+        :param update_columns: Columns to be updated, which are every column
+                               given (but `conflict_columns` and `id`) by
+                               default
+        :return: A list of IDs of the rows inserted or updated
+        """
+        return cls._bulk_write(
+            rows, conflict_columns, update_columns, batch_size, commit)
+
+    @classmethod
+    def _bulk_write(cls, rows, conflict_columns, update_columns, batch_size,
+                    commit):
+        table = cls.__table__
+        ids = []
+
+        def write(batch):
+            without_ids = [row for row in batch if row.get('id') is None]
+            for row, id_ in zip(without_ids, allocate_ids(len(without_ids))):
+                row['id'] = id_
+            if conflict_columns is not None and update_columns != ():
+                batch = deduplicate_rows(batch, conflict_columns)
+            columns = [c.name for c in table.columns
+                       if any(c.name in row for row in batch)]
+            statement = postgresql.insert(table).values(
+                [{c: row.get(c) for c in columns} for row in batch])
+
+            if conflict_columns is None:
+                pass
+            elif update_columns == ():
+                statement = statement.on_conflict_do_nothing(
+                    index_elements=list(conflict_columns))
             else:
-                raise
+                updates = update_columns
+                if updates is None:
+                    updates = [c for c in columns if c != 'id'
+                               and c not in conflict_columns]
+                statement = statement.on_conflict_do_update(
+                    index_elements=list(conflict_columns),
+                    set_={c: statement.excluded[c] for c in updates})
+
+            ids.extend(id_ for id_, in db.session.execute(
+                statement.returning(table.c.id), mapper=cls.__mapper__))
+            clear_request_memo()
+            cls.after_bulk_write(batch)
+            if commit and current_unit_of_work() is None:
+                db.session.commit()
+
+        batch = []
+        for row in rows:
+            batch.append(cls.prepare_bulk_row(dict(row)))
+            if len(batch) >= batch_size:
+                write(batch)
+                batch = []
+        if batch:
+            write(batch)
+        return ids
+
+    @classmethod
+    def prepare_bulk_row(cls, row):
+        """Fills in what the ORM would, for `bulk_create()` and
+        `bulk_upsert()`."""
+        return row
+
+    @classmethod
+    def after_bulk_write(cls, rows):
+        """Called after each batch of `bulk_create()` and `bulk_upsert()` has
+        been written (but not committed), which bypasses ORM events."""
+        pass
 
     @classmethod
     def get(cls, id):
@@ -105,14 +296,22 @@ class CRUDMixin(object):
         return commit and self.save() or self
 
     def save(self, commit=True):
+        """NOTE: Within a `UnitOfWork`, nothing is committed until the unit of
+        work is."""
         db.session.add(self)
-        if commit:
-            db.session.commit()
+        if commit and current_unit_of_work() is None:
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Otherwise, the session is unusable until rolled back
+                db.session.rollback()
+                raise
         return self
 
     def delete(self, commit=True):
         db.session.delete(self)
-        return commit and db.session.commit()
+        return commit and current_unit_of_work() is None \
+            and db.session.commit()
 
     def __iter__(self):
         for column in self.__table__.columns:
@@ -165,15 +364,21 @@ class AssetValue(CRUDMixin, db.Model):  # type: ignore
     """Represents a unit price of an asset at a particular point of time. The
     granularity of the 'particular point of time' may range from one second
     to a year. See `Granularity` for more details.
+
+    Asset values live in a bind of their own (`timeseries`), which may be a
+    separate database. Hence there are no foreign keys to `asset`, and asset
+    values must not be joined with other tables within a single query.
     """
 
+    __bind_key__ = 'timeseries'
     __table_args__ = (db.UniqueConstraint(
         'asset_id', 'evaluated_at', 'granularity'), {})  # type: Any
 
-    asset_id = db.Column(db.BigInteger, db.ForeignKey('asset.id'))
-    base_asset_id = db.Column(db.BigInteger, db.ForeignKey('asset.id'))
+    asset_id = db.Column(db.BigInteger)
+    base_asset_id = db.Column(db.BigInteger)
     base_asset = db.relationship(
-        'Asset', uselist=False, foreign_keys=[base_asset_id])
+        'Asset', uselist=False,
+        primaryjoin='foreign(AssetValue.base_asset_id) == Asset.id')
     evaluated_at = db.Column(db.DateTime(timezone=False))
     source = db.Column(db.Enum(
         'yahoo', 'google', 'kofia', 'test', name='asset_value_source'))
@@ -193,6 +398,16 @@ class AssetValue(CRUDMixin, db.Model):  # type: ignore
                 self.evaluated_at, self.open, self.high, self.low, self.close,
                 self.volume)
 
+    @classmethod
+    def after_bulk_write(cls, rows):
+        """Invalidates cached valuations (once the session commits)."""
+        if get_valuation_cache() is None:
+            return
+        since = min(row.get('evaluated_at') or datetime.min for row in rows)
+        invalidate_asset_valuations(
+            db.session(), since, {row.get('granularity') for row in rows},
+            {row.get('base_asset_id') for row in rows})
+
 
 class AssetType(object):
     currency = 'currency'
@@ -223,15 +438,19 @@ class Asset(CRUDMixin, db.Model):  # type: ignore
     code = db.Column(db.String, unique=True)
     isin = db.Column(db.String)
     description = db.Column(db.Text)
+    #: When the asset has disappeared from its market (e.g., delisted stocks)
+    delisted_at = db.Column(db.DateTime(timezone=False))
 
     #: Arbitrary data
     data = db.Column(JsonType)
 
     asset_values = db.relationship(
-        'AssetValue', backref='asset', foreign_keys=[AssetValue.asset_id],
+        'AssetValue', backref='asset',
+        primaryjoin='Asset.id == foreign(AssetValue.asset_id)',
         lazy='dynamic', cascade='all,delete-orphan')
     base_asset_values = db.relationship(
-        'AssetValue', foreign_keys=[AssetValue.base_asset_id],
+        'AssetValue',
+        primaryjoin='Asset.id == foreign(AssetValue.base_asset_id)',
         lazy='dynamic', cascade='all,delete-orphan')
     records = db.relationship('Record', backref='asset',
                               lazy='dynamic', cascade='all,delete-orphan')
@@ -417,6 +636,14 @@ class Account(CRUDMixin, db.Model):  # type: ignore
 
     def balance(self, evaluated_at=None):
         """Calculates the account balance on a given date."""
+        return {asset: from_fixed(quantity) for asset, quantity
+                in self.fixed_balance(evaluated_at).items()}
+
+    @memoize_in_request
+    @read_only
+    def fixed_balance(self, evaluated_at=None):
+        """Same as `balance()`, but quantities are scaled integers (see
+        `finance.fixedpoint`)."""
         if evaluated_at is None:
             evaluated_at = datetime.utcnow()
 
@@ -432,15 +659,14 @@ class Account(CRUDMixin, db.Model):  # type: ignore
         bs = {}
         rs = [(r.asset, r.quantity, r.type) for r in records]
         for asset, quantity, type_ in rs:
-            bs.setdefault(asset, 0)
-            if type_ == RecordType.balance_adjustment:
-                # Previous records will be ignored when 'balance_adjustment'
-                # is seen.
-                bs[asset] = quantity
-            else:
-                bs[asset] += quantity
+            # Previous records will be ignored when 'balance_adjustment' is
+            # seen.
+            accumulate_balance(bs, asset, to_fixed(quantity),
+                               type_ == RecordType.balance_adjustment)
         return bs
 
+    @memoize_in_request
+    @read_only
     def net_worth(self, evaluated_at=None, granularity=Granularity.day,
                   approximation=False, base_asset=None):
         """Calculates the net worth of the account on a particular datetime.
@@ -456,10 +682,18 @@ class Account(CRUDMixin, db.Model):  # type: ignore
         evaluated_from, evaluated_until = \
             self.get_bounds(evaluated_at, granularity)
 
-        net_asset_value = 0
-        for asset, quantity in self.balance(evaluated_until).items():
+        return cached_valuation(
+            'account:{}'.format(self.id), evaluated_from, evaluated_until,
+            granularity, base_asset, approximation,
+            lambda: self._net_worth(evaluated_from, evaluated_until,
+                                    granularity, approximation, base_asset))
+
+    def _net_worth(self, evaluated_from, evaluated_until, granularity,
+                   approximation, base_asset):
+        balance = self.fixed_balance(evaluated_until)
+        closes = {}
+        for asset in balance:
             if asset == base_asset:
-                net_asset_value += quantity
                 continue
 
             asset_value = AssetValue.query \
@@ -478,12 +712,12 @@ class Account(CRUDMixin, db.Model):  # type: ignore
             asset_value = asset_value.first()
 
             if asset_value:
-                worth = asset_value.close * quantity
+                closes[asset] = to_fixed(asset_value.close)
             else:
                 raise AssetValueUnavailableException()
-            net_asset_value += worth
 
-        return net_asset_value
+        return from_fixed_product(
+            fixed_net_worth(balance.items(), closes, base_asset))
 
     # FIXME: We probably want to move this function elsewhere
     # FIXME: Think of a better name
@@ -537,26 +771,42 @@ class Portfolio(CRUDMixin, db.Model):  # type: ignore
             evaluated_at = datetime.utcnow()
 
         # Balances of all accounts under this portfolio
-        bs = [account.balance(evaluated_at) for account in self.accounts]
+        bs = [account.fixed_balance(evaluated_at) for account in self.accounts]
 
-        return functools.reduce(operator.add, map(collections.Counter, bs))
+        return collections.Counter({
+            asset: from_fixed(quantity)
+            for asset, quantity in merge_balances(bs).items()})
 
+    @memoize_in_request
+    @read_only
     def net_worth(self, evaluated_at=None, granularity=Granularity.day):
         """Calculates the net worth of the portfolio on a particular datetime.
         """
-        net = 0
-        for account in self.accounts:
-            net += account.net_worth(evaluated_at, granularity, True,
-                                     self.base_asset)
-        return net
+        if evaluated_at is None:
+            evaluated_at = datetime.utcnow()
+
+        def calculate():
+            net = 0
+            for account in self.accounts:
+                net += account.net_worth(evaluated_at, granularity, True,
+                                         self.base_asset)
+            return net
+
+        evaluated_from, evaluated_until = \
+            Account.get_bounds(evaluated_at, granularity)
+        return cached_valuation(
+            'portfolio:{}'.format(self.id), evaluated_from, evaluated_until,
+            granularity, self.base_asset, True, calculate)
 
     def daily_net_worth(self, date_from, date_to, granularity=Granularity.day):
-        """NOTE: This probably shouldn't be here, but we'll leave it here for
-        demonstration purposes.
+        """Calculates the net worth of the portfolio for each day within
+        [date_from, date_to). See `finance.valuation.daily_net_worth`.
+
+        :return: A generator of (date, net_worth) tuples
         """
-        # FIXME: Calculate the daily net worth incrementally
-        for date in date_range(date_from, date_to):
-            yield date, self.net_worth(date)
+        from finance.valuation import daily_net_worth
+        return daily_net_worth(self.accounts, self.base_asset, date_from,
+                               date_to, granularity)
 
     def __iter__(self):
         merged = super(Portfolio, self).__iter__()
@@ -617,10 +867,73 @@ class Transaction(CRUDMixin, db.Model):  # type: ignore
             self.closed_at = datetime.utcnow()
         self.state = TransactionState.closed
 
-        if commit:
+        if commit and current_unit_of_work() is None:
             db.session.commit()
 
 
+def current_unit_of_work():
+    """Returns the `UnitOfWork` of the current session, if any."""
+    return db.session.info.get('unit_of_work')
+
+
+class UnitOfWork(object):
+    """Collects records, transactions and whatever else is written with
+    `create()`, `save()` or `Transaction.close()`, which would otherwise
+    commit one by one, and commits them at once:
+
+        with UnitOfWork() as uow:
+            for trade in trades:
+                with uow.savepoint():
+                    make_double_record_transaction(...)
+
+    Each savepoint is flushed on its own, so a failure in one of them (e.g.,
+    a trade that has been imported already) rolls back that one only. Every
+    savepoint that succeeded is committed when the block ends, or whenever
+    `commit()` is called in between (e.g., to checkpoint a long import). Any
+    other error rolls back what has not been committed yet.
+    """
+
+    def __init__(self):
+        self.session = db.session
+        #: Errors of savepoints that have been rolled back
+        self.failures = []
+
+    def __enter__(self):
+        if current_unit_of_work() is not None:
+            raise RuntimeError('A unit of work is already in progress')
+        self.session.info['unit_of_work'] = self
+        return self
+
+    def __exit__(self, type, value, traceback):
+        del self.session.info['unit_of_work']
+        if type is None:
+            self.commit()
+        else:
+            self.session.rollback()
+
+    def commit(self):
+        self.session.commit()
+
+    @contextlib.contextmanager
+    def savepoint(self, ignore=(IntegrityError,)):
+        """Flushes what is written in the block within a savepoint, which is
+        rolled back on errors. Errors of `ignore` are logged and kept in
+        `failures`, while others are raised."""
+        savepoint = self.session.begin_nested()
+        try:
+            yield
+            self.session.flush()
+        except ignore as e:
+            savepoint.rollback()
+            log.warning('Rolled back a savepoint: {}', e)
+            self.failures.append(e)
+        except BaseException:
+            savepoint.rollback()
+            raise
+        else:
+            savepoint.commit()
+
+
 class RecordType(object):
     deposit = 'deposit'
     withdraw = 'withdraw'
@@ -657,13 +970,423 @@ class Record(CRUDMixin, db.Model):  # type: ignore
                 kwargs['type'] = RecordType.deposit
         super(self.__class__, self).__init__(*args, **kwargs)
 
+    @classmethod
+    def bulk_insert(cls, records, batch_size=1000, commit=True):
+        """Inserts records in bulk, skipping those that already exist under
+        the unique constraint of (account_id, asset_id, created_at, quantity)
+        without failing the transaction (PostgreSQL only).
+
+        :param records: An iterable of dictionaries with `account_id`,
+                        `asset_id`, `created_at`, `quantity` and optionally
+                        `type`, `category` and `transaction_id`
+        :return: Number of records actually inserted
+        """
+        columns = ['id', 'account_id', 'asset_id', 'transaction_id', 'type',
+                   'created_at', 'category', 'quantity']
+        return len(cls.bulk_create(
+            ({c: record.get(c) for c in columns} for record in records),
+            conflict_columns=['account_id', 'asset_id', 'created_at',
+                              'quantity'],
+            batch_size=batch_size, commit=commit))
+
+    @classmethod
+    def prepare_bulk_row(cls, row):
+        if row.get('type') is None:
+            row['type'] = RecordType.withdraw if row['quantity'] < 0 \
+                else RecordType.deposit
+        return row
+
+    @classmethod
+    def after_bulk_write(cls, rows):
+        """Invalidates cached valuations of the accounts (once the session
+        commits)."""
+        if get_valuation_cache() is None:
+            return
+        # A record without a date affects every valuation
+        since = min(row.get('created_at') or datetime.min for row in rows)
+        invalidate_account_valuations(
+            db.session(), db.session.connection(),
+            {row.get('account_id') for row in rows}, since)
+
+
+#: Number of rows fetched from a server-side cursor at a time
+STREAM_BATCH_SIZE = 10000
+
+
+def stream_rows(statement, model, batch_size=STREAM_BATCH_SIZE,
+                as_float=False):
+    """Runs a Core select with a server-side cursor, which fetches
+    `batch_size` rows at a time, and yields rows as plain tuples. Unlike ORM
+    queries, rows are neither turned into model instances nor kept in the
+    identity map, so scanning the whole history takes constant memory.
+
+    :param model: Decides which database (bind) to run the statement on, as
+                  asset values may live in a separate one
+    :param as_float: Numeric columns are cast to double precision by the
+                     database, so that they come as floats rather than
+                     `Decimal`s
+    """
+    if as_float:
+        statement = statement.with_only_columns([
+            db.cast(c, db.Float).label(c.name)
+            if isinstance(c.type, db.Numeric) else c
+            for c in statement.inner_columns])
+
+    connection = db.session.connection(mapper=model.__mapper__) \
+        .execution_options(stream_results=True)
+    result = connection.execute(statement)
+    try:
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield tuple(row)
+    finally:
+        result.close()
+
+
+def stream_records(account_ids, until=None, as_float=False,
+                   batch_size=STREAM_BATCH_SIZE):
+    """Streams records of accounts (created on or before `until`) in the order
+    of `created_at`, with `stream_rows()`.
+
+    :return: A generator of (account_id, asset_id, quantity, type, created_at)
+             tuples
+    """
+    table = Record.__table__
+    statement = db.select([table.c.account_id, table.c.asset_id,
+                           table.c.quantity, table.c.type,
+                           table.c.created_at]) \
+        .where(table.c.account_id.in_(list(account_ids))) \
+        .order_by(table.c.created_at)
+    if until is not None:
+        statement = statement.where(table.c.created_at <= until)
+    return stream_rows(statement, Record, batch_size, as_float)
+
+
+def stream_asset_values(asset_ids, granularity, base_asset_id, since=None,
+                        until=None, as_float=False,
+                        batch_size=STREAM_BATCH_SIZE):
+    """Streams asset values evaluated within (since, until] in the order of
+    `evaluated_at`, with `stream_rows()`.
+
+    :return: A generator of (asset_id, evaluated_at, open, high, low, close,
+             volume) tuples
+    """
+    table = AssetValue.__table__
+    statement = db.select([table.c.asset_id, table.c.evaluated_at,
+                           table.c.open, table.c.high, table.c.low,
+                           table.c.close, table.c.volume]) \
+        .where(db.and_(table.c.asset_id.in_(list(asset_ids)),
+                       table.c.granularity == granularity,
+                       table.c.base_asset_id == base_asset_id)) \
+        .order_by(table.c.evaluated_at)
+    if since is not None:
+        statement = statement.where(table.c.evaluated_at > since)
+    if until is not None:
+        statement = statement.where(table.c.evaluated_at <= until)
+    return stream_rows(statement, AssetValue, batch_size, as_float)
+
+
+SearchResult = collections.namedtuple(
+    'SearchResult', ['query', 'total', 'page', 'per_page', 'hits'])
+
 
 class DartReport(CRUDMixin, db.Model):  # type: ignore
     """NOTE: We need a more generic name for this..."""
 
+    __table_args__ = (db.Index(
+        'ix_dart_report_search_vector', 'search_vector',
+        postgresql_using='gin'), {})  # type: Any
+
     registered_at = db.Column(db.DateTime(timezone=False))
     title = db.Column(db.String)
     entity_id = db.Column(db.Integer)
     entity = db.Column(db.String)
     reporter = db.Column(db.String)
-    content = db.Column(db.Text)
+    #: The body of a report (HTML), which may be as large as a few megabytes.
+    #: It is loaded only when accessed.
+    content = db.deferred(db.Column(CompressedText))
+    #: Maintained by `update_dart_report_search_vector()` on PostgreSQL, as
+    #: the database cannot read compressed contents
+    search_vector = db.Column(TsVectorType)
+
+    def __iter__(self):
+        for key, value in super(DartReport, self).__iter__():
+            if key not in ('content', 'search_vector'):
+                yield key, value
+
+    @classmethod
+    def search(cls, text, page=1, per_page=20):
+        """Searches reports by their titles, entity names and contents
+        (PostgreSQL only).
+        Each word of `text` matches words starting with it, as Korean words
+        come with postpositions (e.g., '삼성전자' matches '삼성전자는').
+
+        :return: A `SearchResult`, whose hits are dictionaries of report
+                 attributes along with `rank` and `snippet`, best first
+        """
+        words = query_words(text)
+        if not words:
+            return SearchResult(text, 0, page, per_page, [])
+        tsquery = db.func.to_tsquery('simple', make_tsquery(text))
+        matches = cls.search_vector.op('@@')(tsquery)
+
+        total = db.session.query(db.func.count(cls.id)).filter(matches) \
+            .scalar()
+
+        # Ranks and paginates first, so that contents are loaded (and
+        # decompressed) only for a single page
+        rank = db.func.ts_rank_cd(cls.search_vector, tsquery)
+        ranked = db.session.query(cls.id, rank.label('rank')) \
+            .filter(matches) \
+            .order_by(rank.desc(), cls.registered_at.desc(), cls.id) \
+            .limit(per_page) \
+            .offset((page - 1) * per_page) \
+            .subquery()
+        rows = db.session.query(
+            cls.id, cls.registered_at, cls.title, cls.entity_id, cls.entity,
+            cls.reporter, ranked.c.rank, cls.content) \
+            .join(ranked, cls.id == ranked.c.id) \
+            .order_by(ranked.c.rank.desc(), cls.registered_at.desc(), cls.id)
+
+        hits = []
+        for row in rows:
+            hit = row._asdict()
+            hit['snippet'] = make_snippet(hit.pop('content'), words)
+            hits.append(hit)
+        return SearchResult(text, total, page, per_page, hits)
+
+    @classmethod
+    def latest_reports(cls, entity_ids):
+        """Returns the ID (i.e., `rcp_no`) and the registration time of the
+        latest report stored for each entity.
+
+        :return: A dictionary of {entity_id: (id, registered_at)}
+        """
+        rows = db.session.query(
+            cls.entity_id, db.func.max(cls.id), db.func.max(cls.registered_at)) \
+            .filter(cls.entity_id.in_(list(entity_ids))) \
+            .group_by(cls.entity_id)
+        return {entity_id: (id_, registered_at)
+                for entity_id, id_, registered_at in rows}
+
+    @classmethod
+    def prepare_bulk_row(cls, row):
+        """Makes the search vector of a report, which
+        `update_dart_report_search_vector()` would make otherwise."""
+        row['search_vector'] = make_search_vector(*search_document(
+            row.get('title'), row.get('entity'), row.get('content')))
+        return row
+
+
+def query_words(text):
+    """Splits a search query into words. Characters that have special
+    meanings in `tsquery` are removed."""
+    return ''.join(' ' if c in "&|!():*'\\<>" else c for c in text).split()
+
+
+def make_tsquery(text):
+    """Makes a prefix-matching `tsquery` that requires all words of `text`."""
+    return ' & '.join("'{}':*".format(w) for w in query_words(text))
+
+
+#: A tsvector may not exceed 1MB, so contents are truncated when indexed
+SEARCH_CONTENT_LENGTH = 200000
+
+#: Number of characters of a snippet
+SNIPPET_LENGTH = 200
+
+
+def search_document(title, entity, content):
+    """Returns the texts of a report to be indexed, which are its title along
+    with its entity name, and its (truncated) content."""
+    return ' '.join(x for x in (title, entity) if x), \
+        (content or '')[:SEARCH_CONTENT_LENGTH]
+
+
+def make_search_vector(head, body):
+    """Makes an SQL expression of the search vector of a report. Titles and
+    entity names (`head`) weigh more than contents (`body`)."""
+    return db.func.setweight(db.func.to_tsvector('simple', head), 'A') \
+        .op('||')(db.func.setweight(db.func.to_tsvector('simple', body), 'B'))
+
+
+def make_snippet(content, words, length=SNIPPET_LENGTH):
+    """Cuts out the text around the first word of `content` that starts with
+    any of `words`. Matching words are highlighted with <b> tags, as
+    `ts_headline()` would do, and everything else is escaped so that the
+    snippet can be rendered as HTML."""
+    text = ' '.join(html.unescape(re.sub(r'<[^>]*>', ' ', content or ''))
+                    .split())
+    pattern = re.compile(r'(?<!\w)(?:{})\w*'.format(
+        '|'.join(re.escape(w) for w in words)), re.IGNORECASE)
+
+    match = pattern.search(text)
+    start = max(0, match.start() - length // 4) if match else 0
+    if start > 0:
+        # Does not begin in the middle of a word
+        start = text.find(' ', start) + 1 or start
+    snippet = text[start:start + length]
+
+    parts, end = [], 0
+    for match in pattern.finditer(snippet):
+        parts.append(html.escape(snippet[end:match.start()]))
+        parts.append('<b>{}</b>'.format(html.escape(match.group())))
+        end = match.end()
+    parts.append(html.escape(snippet[end:]))
+    return ''.join(parts)
+
+
+@db.event.listens_for(DartReport, 'before_insert')
+@db.event.listens_for(DartReport, 'before_update')
+def update_dart_report_search_vector(mapper, connection, target):
+    if connection.dialect.name != 'postgresql':
+        return
+    state = db.inspect(target)
+    if state.persistent and not any(
+            state.attrs[key].history.has_changes()
+            for key in ('title', 'entity', 'content')):
+        return
+
+    if 'content' in state.dict or not state.persistent:
+        content = state.dict.get('content')
+    else:
+        # The title has changed, but the (deferred) content is not loaded
+        table = DartReport.__table__
+        content = connection.execute(
+            db.select([table.c.content]).where(table.c.id == target.id)) \
+            .scalar()
+    target.search_vector = make_search_vector(
+        *search_document(target.title, target.entity, content))
+
+
+def changed_values(target, key):
+    """Returns both the old and the new values of an attribute that is being
+    flushed."""
+    history = db.inspect(target).attrs[key].history
+    return {v for v in history.sum() if v is not None}
+
+
+def defer_invalidation(session, since, entities=None, granularity=None,
+                       base_asset_id=None):
+    """Queues an invalidation of cached valuations until `session` commits.
+
+    Invalidating as soon as rows are flushed would leave a window (as wide as
+    a `UnitOfWork`) in which another request could calculate a valuation out
+    of the rows committed so far and cache it for good. Invalidations of the
+    same entities are merged, keeping the earliest date.
+    """
+    since = since.date() if isinstance(since, datetime) else since
+    pending = session.info.setdefault('pending_invalidations', {})
+    key = (frozenset(entities) if entities is not None else None,
+           granularity, base_asset_id)
+    pending[key] = min(pending.get(key, since), since)
+
+
+@db.event.listens_for(RoutingSession, 'after_commit')
+def invalidate_committed_valuations(session):
+    if in_savepoint(session):
+        return
+    pending = session.info.pop('pending_invalidations', None)
+    cache = get_valuation_cache()
+    if not pending or cache is None:
+        return
+    for (entities, granularity, base_asset_id), since in pending.items():
+        cache.invalidate(since, entities, granularity, base_asset_id)
+
+
+@db.event.listens_for(RoutingSession, 'after_rollback')
+def discard_invalidations(session):
+    # NOTE: Invalidations queued within a savepoint that has been rolled back
+    # are kept, as dropping a few more entries than necessary is harmless
+    if not in_savepoint(session):
+        session.info.pop('pending_invalidations', None)
+
+
+@db.event.listens_for(Record, 'after_insert')
+@db.event.listens_for(Record, 'after_update')
+@db.event.listens_for(Record, 'after_delete')
+def invalidate_record_valuations(mapper, connection, target):
+    """Drops cached valuations of the account (and its portfolio) on or after
+    the date of the record once the session commits. Results memoized in this
+    request are dropped right away."""
+    clear_request_memo()
+    if get_valuation_cache() is None:
+        return
+
+    dates = changed_values(target, 'created_at')
+    # A record without a date affects every valuation
+    since = min(dates) if dates else datetime.min
+    invalidate_account_valuations(
+        db.object_session(target), connection,
+        changed_values(target, 'account_id'), since)
+
+
+def invalidate_account_valuations(session, connection, account_ids, since):
+    """Drops cached valuations of accounts and their portfolios on or after
+    `since`, once `session` commits."""
+    account_ids = [i for i in account_ids if i is not None]
+    if not account_ids:
+        return
+    portfolio_ids = connection.execute(
+        db.select([Account.portfolio_id])
+        .where(Account.id.in_(account_ids))).fetchall()
+
+    entities = ['account:{}'.format(i) for i in account_ids] + \
+        ['portfolio:{}'.format(i) for i, in portfolio_ids if i is not None]
+    defer_invalidation(session, since, entities=entities)
+
+
+@db.event.listens_for(Account, 'after_insert')
+@db.event.listens_for(Account, 'after_update')
+def invalidate_portfolio_valuations(mapper, connection, target):
+    """Drops cached valuations of portfolios that an account has been added
+    to (e.g., by `Portfolio.add_accounts()`) or moved away from, once the
+    session commits."""
+    history = db.inspect(target).attrs['portfolio_id'].history
+    portfolio_ids = (set(history.added or ()) |
+                     set(history.deleted or ())) - {None}
+    if not portfolio_ids:
+        return
+    clear_request_memo()
+    if get_valuation_cache() is None:
+        return
+    defer_invalidation(
+        db.object_session(target), datetime.min,
+        entities=['portfolio:{}'.format(i) for i in portfolio_ids])
+
+
+@db.event.listens_for(AssetValue, 'after_insert')
+@db.event.listens_for(AssetValue, 'after_update')
+@db.event.listens_for(AssetValue, 'after_delete')
+def invalidate_asset_value_valuations(mapper, connection, target):
+    """Drops cached valuations on or after the date of the asset value once
+    the session commits. As an approximated valuation may rely on any older
+    asset value, valuations of all accounts and portfolios are dropped.
+    Results memoized in this request are dropped right away."""
+    clear_request_memo()
+    if get_valuation_cache() is None:
+        return
+
+    dates = changed_values(target, 'evaluated_at')
+    since = min(dates) if dates else datetime.min
+    invalidate_asset_valuations(
+        db.object_session(target), since,
+        changed_values(target, 'granularity'),
+        changed_values(target, 'base_asset_id'))
+
+
+def invalidate_asset_valuations(session, since, granularities,
+                                base_asset_ids):
+    """Drops cached valuations on or after `since` once `session` commits,
+    which are narrowed down to a granularity and a base asset if asset values
+    of only one of each have been written."""
+    granularities = {g for g in granularities if g is not None}
+    base_asset_ids = {i for i in base_asset_ids if i is not None}
+    if len(granularities) == 1 and len(base_asset_ids) == 1:
+        defer_invalidation(session, since, granularity=granularities.pop(),
+                           base_asset_id=base_asset_ids.pop())
+    else:
+        defer_invalidation(session, since)
@@ -0,0 +1,196 @@
+"""Parsing helpers shared by providers and importers.
+
+These are called for every single cell of broker exports and provider
+responses, so the formats that we actually see take precompiled fast paths
+rather than `strptime()` or exception handling:
+
+- Dates such as '20160222', '2016-02-22', '2016/02/22', '2016.02.22' and
+  '16.02.22' (`parse_date`), which are memoized as the same dates repeat over
+  and over in a file
+- Comma-grouped amounts such as '1,234,567' or '-12,000' (`parse_amount`)
+
+Any other format falls back to `strptime()`, so the results (and errors) are
+the same as before. Run `finance benchmark_parsing` to see how much faster
+the fast paths are.
+"""
+import decimal
+import functools
+import re
+import timeit
+from datetime import datetime, timedelta
+
+#: Number of distinct (date string, format) pairs to be memoized
+DATE_CACHE_SIZE = 4096
+
+
+def _ymd(match):
+    return datetime(*[int(x) for x in match.groups()])
+
+
+def _short_ymd(match):
+    year, month, day = [int(x) for x in match.groups()]
+    # Same as strptime('%y'): 69-99 are 1969-1999, and 00-68 are 2000-2068
+    return datetime(year + (1900 if year >= 69 else 2000), month, day)
+
+
+def _ymd_microseconds(match):
+    year, month, day, fraction = match.groups()
+    return datetime(int(year), int(month), int(day),
+                    microsecond=int(fraction.ljust(6, '0')))
+
+
+#: {format: (pattern, builder)}
+FAST_DATE_FORMATS = {
+    '%Y-%m-%d': (re.compile(r'([0-9]{4})-([0-9]{2})-([0-9]{2})$'), _ymd),
+    '%Y%m%d': (re.compile(r'([0-9]{4})([0-9]{2})([0-9]{2})$'), _ymd),
+    '%Y/%m/%d': (re.compile(r'([0-9]{4})/([0-9]{2})/([0-9]{2})$'), _ymd),
+    '%Y.%m.%d': (re.compile(r'([0-9]{4})\.([0-9]{2})\.([0-9]{2})$'), _ymd),
+    '%y.%m.%d': (re.compile(r'([0-9]{2})\.([0-9]{2})\.([0-9]{2})$'),
+                 _short_ymd),
+    '%Y%m%d.%f': (re.compile(r'([0-9]{4})([0-9]{2})([0-9]{2})\.([0-9]{1,6})$'),
+                  _ymd_microseconds),
+    '%Y-%m-%d %H:%M:%S': (re.compile(
+        r'([0-9]{4})-([0-9]{2})-([0-9]{2}) '
+        r'([0-9]{2}):([0-9]{2}):([0-9]{2})$'), _ymd),
+}
+
+INT_PATTERN = re.compile(r'\s*[+-]?[0-9]+\s*$')
+DECIMAL_PATTERN = re.compile(r'\s*[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)\s*$')
+AMOUNT_PATTERN = re.compile(
+    r'[+-]?(?:[0-9]{1,3}(?:,[0-9]{3})+|[0-9]+)(?:\.[0-9]+)?$')
+NON_NUMERIC_PATTERN = re.compile(r'[^0-9.]+')
+
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_datetime_string(value, format):
+    """Parses a datetime string, taking a fast path for known formats."""
+    try:
+        pattern, build = FAST_DATE_FORMATS[format]
+    except KeyError:
+        pass
+    else:
+        match = pattern.match(value)
+        if match is not None:
+            try:
+                return build(match)
+            except ValueError:  # e.g., 2016-02-30
+                pass
+    return datetime.strptime(value, format)
+
+
+def try_parse_date(value, format='%Y-%m-%d'):
+    """Same as `parse_date`, but returns None if `value` does not look like a
+    date of a fast format rather than raising an error."""
+    pattern, _ = FAST_DATE_FORMATS[format]
+    if pattern.match(value) is None:
+        return None
+    try:
+        return parse_datetime_string(value, format)
+    except ValueError:
+        return None
+
+
+def parse_date(date, format='%Y-%m-%d'):
+    """Makes a date object from a string.
+
+    :type date: str or int
+    :rtype: datetime.date
+    """
+    if isinstance(date, int):
+        return datetime.now().date() + timedelta(days=date)
+    else:
+        return parse_datetime_string(date, format)
+
+
+def parse_datetime(dt, at=None, format='%Y-%m-%d %H:%M:%S'):
+    """Makes a datetime object from a string.
+
+    :param dt: Datetime
+    :param at: Time at which the relative time is evaluated (now by default)
+    :param format: Datetime string format
+    """
+    if isinstance(dt, int):
+        return (at if at is not None else datetime.now()) + \
+            timedelta(seconds=dt)
+    else:
+        return parse_datetime_string(dt, format)
+
+
+def extract_numbers(value, type=str):
+    """Extracts numbers only from a string."""
+    return type(NON_NUMERIC_PATTERN.sub('', value))
+
+
+def parse_int(v, fallback_to=0):
+    """Parses a string as an integer value. Falls back to zero when failed to
+    parse."""
+    if v.__class__ is int:
+        return v
+    if isinstance(v, str):
+        if INT_PATTERN.match(v):
+            return int(v)
+        elif not v or v.isspace():
+            return fallback_to
+    try:
+        return int(v)
+    except ValueError:
+        return fallback_to
+
+
+def parse_decimal(v, type_=float, fallback_to=0):
+    if isinstance(v, str):
+        if DECIMAL_PATTERN.match(v):
+            return type_(v)
+        elif not v or v.isspace():
+            return fallback_to
+    try:
+        return type_(v)
+    except ValueError:
+        return fallback_to
+
+
+def parse_amount(value, type_=decimal.Decimal, fallback_to=None):
+    """Parses a (possibly comma-grouped) amount such as '-1,234,567'."""
+    value = value.strip()
+    if AMOUNT_PATTERN.match(value) is None:
+        return fallback_to
+    return type_(value.replace(',', ''))
+
+
+def benchmark(number=100000):
+    """Compares the fast paths with what they replaced, on typical cells of
+    broker exports.
+
+    :return: A list of (name, seconds taken before, seconds taken now)
+    """
+    dates = ['201602{:02d}'.format(d % 28 + 1) for d in range(number)]
+    amounts = ['{:,}'.format(i * 37) for i in range(number)]
+    cells = ['', '0', '1200', '', '-3', 'N/A'] * (number // 6 + 1)
+
+    def extract_numbers_before(value, type=str):
+        def extract(vs):
+            for v in vs:
+                if v in '01234567890.':
+                    yield v
+        return type(''.join(extract(value)))
+
+    def parse_int_before(v, fallback_to=0):
+        try:
+            return int(v)
+        except ValueError:
+            return fallback_to
+
+    cases = [
+        ('parse_date',
+         lambda: [datetime.strptime(d, '%Y%m%d') for d in dates],
+         lambda: [parse_date(d, '%Y%m%d') for d in dates]),
+        ('extract_numbers',
+         lambda: [extract_numbers_before(a, int) for a in amounts],
+         lambda: [extract_numbers(a, int) for a in amounts]),
+        ('parse_int',
+         lambda: [parse_int_before(c) for c in cells[:number]],
+         lambda: [parse_int(c) for c in cells[:number]]),
+    ]
+    return [(name, min(timeit.repeat(before, number=1, repeat=3)),
+             min(timeit.repeat(after, number=1, repeat=3)))
+            for name, before, after in cases]
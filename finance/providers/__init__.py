@@ -3,11 +3,12 @@ from finance.providers.kofia import Kofia
 from finance.providers.miraeasset import Miraeasset
 from finance.providers.provider import AssetValueProvider, Provider, \
     RecordProvider
+from finance.providers.shinhancard import ShinhanCard
 from finance.providers.yahoo import Yahoo
 
 
 __all__ = ['AssetValueProvider', 'Dart', 'Kofia', 'Miraeasset', 'Provider',
-           'RecordProvider', 'Yahoo']
+           'RecordProvider', 'ShinhanCard', 'Yahoo']
 
 
 # NOTE: Abstract classes such as Provider, AssetValueProvider, and
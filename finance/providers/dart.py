@@ -20,6 +20,11 @@ curl 'http://m.dart.fss.or.kr/md3002/search.st?currentPage=2&maxResultCnt=15
 
 class Dart(Provider):
 
+    def __init__(self):
+        # Keeps connections alive, as a report comes with a request for its
+        # body
+        self.session = requests.Session()
+
     def fetch_reports(self, entity_name, entity_code, start_date=None,
                       end_date=None):
         """Fetches all DART reports for a single financial entity.
@@ -27,15 +32,47 @@ class Dart(Provider):
         :param entity_name: Financial entity name (e.g., 삼성전자)
         :param entity_code: Financial entity code (e.g., 00254045)
         """
+        listings = self.fetch_listings(
+            entity_name, entity_code, start_date, end_date)
+        for listing in listings:
+            yield self.make_report(listing)
+
+    def fetch_new_reports(self, entity_name, entity_code, last_id=None,
+                          start_date=None, end_date=None):
+        """Fetches reports filed after the one of `last_id` (i.e., `rcp_no`).
+        As listings come in the reverse chronological order, this stops
+        paging as soon as it sees a report that is already known, and it
+        yields nothing (rather than raising `ValueError`) if there is none.
+        """
+        listings = self.fetch_listings(
+            entity_name, entity_code, start_date, end_date, strict=False)
+        for listing in listings:
+            if last_id is not None and int(listing['rcp_no']) <= last_id:
+                break
+            yield self.make_report(listing)
+
+    def fetch_listings(self, entity_name, entity_code, start_date=None,
+                       end_date=None, strict=True):
+        """Fetches report listings (without their bodies) page by page.
+
+        :param strict: Raises `ValueError` if there is no report at all
+        """
         page = 1
         while True:
-            reports, page_count, record_count = \
-                self.fetch_reports_by_page(
+            listings, page_count, record_count = \
+                self.fetch_listings_by_page(
                     entity_name, entity_code, page, start_date=start_date,
                     end_date=end_date)
 
-            for report in reports:
-                yield report
+            if not listings:
+                if strict and page == 1:
+                    # NOTE: Should we raise an exception or show a warning?
+                    raise ValueError(
+                        'No report was found for {}'.format(entity_name))
+                break
+
+            for listing in listings:
+                yield listing
 
             page += 1
             if page > page_count:
@@ -45,6 +82,24 @@ class Dart(Provider):
                               reports_per_page=15, start_date=None,
                               end_date=None):
         """Fetches DART reports for a single page."""
+        listings, page_count, record_count = self.fetch_listings_by_page(
+            entity_name, entity_code, page, reports_per_page, start_date,
+            end_date)
+
+        if not listings:
+            # NOTE: Should we raise an exception or show a warning?
+            raise ValueError('No report was found for {}'.format(entity_name))
+
+        return (self.make_report(listing) for listing in listings), \
+            page_count, record_count
+
+    def fetch_listings_by_page(self, entity_name, entity_code, page=1,
+                               reports_per_page=15, start_date=None,
+                               end_date=None):
+        """Fetches report listings of a single page.
+
+        :return: A tuple of (listings, page_count, record_count)
+        """
         if end_date is None:
             end_date = datetime.now()
 
@@ -68,33 +123,35 @@ class Dart(Provider):
             'textPresenterNm': None,
             # and more...
         }
-        resp = requests.get(url, params=params)
+        resp = self.session.get(url, params=params)
         report_listings = json.loads(resp.text)
 
         page_count = report_listings['totalPage']
         record_count = report_listings['totCount']
 
-        if not report_listings['rlist'] or record_count == 0:
-            # NOTE: Should we raise an exception or show a warning?
-            raise ValueError('No report was found for {}'.format(entity_name))
-
-        return self.process_data(report_listings), page_count, record_count
+        if record_count == 0:
+            return [], page_count, record_count
+        return report_listings['rlist'] or [], page_count, record_count
 
     def fetch_report(self, id):
         """Fetches a full report."""
 
         url = 'http://{}/viewer/main.st'.format(DART_HOST)
         params = {'rcpNo': id}
-        resp = requests.get(url, params=params)
+        resp = self.session.get(url, params=params)
         parsed = json.loads(resp.text)
         return parsed
 
+    def make_report(self, listing):
+        """Fetches the body of a listed report."""
+        report = self.fetch_report(listing['rcp_no'])
+        report['self_'] = report.pop('self')
+        merged = {**listing, **report}  # noqa, new syntax in Python 3.5
+        return Report(**merged)
+
     def process_data(self, json_data):
         for listing in json_data['rlist']:
-            report = self.fetch_report(listing['rcp_no'])
-            report['self_'] = report.pop('self')
-            merged = {**listing, **report}  # noqa, new syntax in Python 3.5
-            yield Report(**merged)
+            yield self.make_report(listing)
 
 
 class Report(object):
@@ -1,9 +1,8 @@
-from datetime import datetime
-
 from logbook import Logger
 import requests
 import xmltodict
 
+from finance.parsing import parse_date
 from finance.providers.provider import AssetValueProvider
 
 
@@ -89,7 +88,7 @@ class Kofia(AssetValueProvider):
         price_records = message['COMFundPriceModListDTO']['priceModList']
         for pr in price_records:
             date_str = pr['standardDt']
-            date = datetime.strptime(date_str, '%Y%m%d')
+            date = parse_date(date_str, DATE_FORMAT)
             unit_price = float(pr['standardCot'])
             original_quantity = float(pr['uOriginalAmt'])
 
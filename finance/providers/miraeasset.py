@@ -1,7 +1,8 @@
 from datetime import timedelta
+from decimal import Decimal
 
+from finance.parsing import parse_date
 from finance.providers.provider import Provider
-from finance.providers.record import DateTime, Decimal, Integer, List, String
 
 DATE_INPUT_FORMAT = '%Y/%m/%d'
 DATE_OUTPUT_FORMAT = '%Y-%m-%d'
@@ -61,35 +62,33 @@ class Miraeasset(Provider):
 
 
 class Record(object):
-    """Represents a single transaction record."""
-
-    created_at = DateTime(date_format=DATE_INPUT_FORMAT)
-    seq = Integer()
-    category = String()
-    amount = Decimal()
-    currency = String()
-    #: ISIN (International Securities Identification Numbers)
-    code = String()
-    name = String()
-    unit_price = Decimal()
-    quantity = Integer()
-    fees = Decimal()
-    tax = Decimal()
-    raw_columns = List()
+    """Represents a single transaction record.
+
+    NOTE: Values are parsed once in the constructor rather than by field
+    descriptors (`finance.providers.record`), as exports may have hundreds of
+    thousands of rows.
+    """
+
+    #: NOTE: `code` is an ISIN (International Securities Identification
+    #: Numbers)
+    __slots__ = ('created_at', 'seq', 'category', 'amount', 'currency',
+                 'code', 'name', 'unit_price', 'quantity', 'fees', 'tax',
+                 'raw_columns')
 
     def __init__(self, created_at, seq, category, amount, currency, code,
                  name, unit_price, quantity, fees, tax, raw_columns):
-        self.created_at = created_at
-        self.seq = seq
-        self.category = category
-        self.amount = amount
-        self.currency = currency
-        self.code = code
-        self.name = name
-        self.unit_price = unit_price
-        self.quantity = quantity
-        self.fees = fees
-        self.tax = tax
+        assert isinstance(raw_columns, list)
+        self.created_at = parse_date(created_at, DATE_INPUT_FORMAT)
+        self.seq = int(seq)
+        self.category = category.strip()
+        self.amount = Decimal(amount)
+        self.currency = currency.strip()
+        self.code = code.strip()
+        self.name = name.strip()
+        self.unit_price = Decimal(unit_price)
+        self.quantity = int(quantity)
+        self.fees = Decimal(fees)
+        self.tax = Decimal(tax)
         self.raw_columns = raw_columns
 
     def __repr__(self):
@@ -102,10 +101,7 @@ class Record(object):
 
             dict(record)
         """
-        attrs = ['created_at', 'seq', 'category', 'amount', 'currency',
-                 'code', 'name', 'unit_price', 'quantity', 'fees', 'tax',
-                 'raw_columns']
-        for attr in attrs:
+        for attr in self.__slots__:
             yield attr, getattr(self, attr)
 
     def values(self):
@@ -1,6 +1,6 @@
 import decimal
 
-from finance.utils import parse_date
+from finance.parsing import parse_date
 
 
 class AbstractField(object):
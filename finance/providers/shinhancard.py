@@ -0,0 +1,38 @@
+"""Parses Shinhan Card monthly statements (the emailed ones) saved as CSV."""
+import collections
+import csv
+
+from finance.parsing import parse_amount, try_parse_date
+from finance.providers.provider import Provider
+
+DATE_COLUMN = 0
+DESCRIPTION_COLUMN = 2
+AMOUNT_COLUMN = 6
+
+#: e.g., 18.01.23
+DATE_FORMAT = '%y.%m.%d'
+
+CardRecord = collections.namedtuple(
+    'CardRecord', ['date', 'description', 'amount'])
+
+
+class ShinhanCard(Provider):
+
+    def parse_statement(self, fin):
+        """Yields a `CardRecord` for each row of charges. Other rows (e.g.,
+        headers, subtotals or blank lines) are skipped."""
+        for row in csv.reader(fin):
+            record = self.parse_row(row)
+            if record is not None:
+                yield record
+
+    def parse_row(self, row):
+        if len(row) <= AMOUNT_COLUMN:
+            return None
+
+        date = try_parse_date(row[DATE_COLUMN].strip(), DATE_FORMAT)
+        amount = parse_amount(row[AMOUNT_COLUMN])
+        if date is None or amount is None:
+            return None
+
+        return CardRecord(date, row[DESCRIPTION_COLUMN].strip(), amount)
@@ -0,0 +1,244 @@
+"""Routes read-only queries to a replica database.
+
+A replica is configured as the `replica` bind (`SQLALCHEMY_BINDS`), which
+`create_worker_app` sets up from `DB_REPLICA_URL`. Models with a bind of their
+own (`__bind_key__`) are routed to `<bind key>_replica`. Queries made within
+`read_only()` (a context manager, or a decorator for functions and generator
+functions) go to the replica, unless
+
+- the session has written anything (by flushing or by executing Core
+  INSERT, UPDATE and DELETE statements) within the current transaction, in
+  which case it stays on the primary until the transaction ends, so that it
+  can see its own writes
+- the replica lags behind the primary by more than `DB_REPLICA_MAX_LAG`
+  seconds (checked every `DB_REPLICA_LAG_CHECK_INTERVAL` seconds) or cannot
+  be reached
+
+For local testing, the replica may simply be another URL of the primary
+database. Replicas of PostgreSQL 9.x and later are supported.
+"""
+import collections
+import contextlib
+import functools
+import inspect
+import time
+
+from flask import current_app
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from logbook import Logger
+from sqlalchemy import event, orm
+from sqlalchemy.sql.expression import UpdateBase
+
+log = Logger('finance')
+
+
+LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_{0}_receive_{1}() = pg_last_{0}_replay_{1}() THEN 0
+    ELSE COALESCE(
+        EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def make_lag_query(server_version):
+    """Functions that are named pg_last_wal_*_lsn() since PostgreSQL 10 used
+    to be pg_last_xlog_*_location(). As functions are resolved when a query is
+    parsed, the right ones have to be chosen up front."""
+    if server_version is not None and server_version < (10,):
+        return LAG_QUERY.format('xlog', 'location')
+    return LAG_QUERY.format('wal', 'lsn')
+
+
+class LagMonitor(object):
+    """Keeps track of how far behind the replica is, querying it no more
+    often than every `check_interval` seconds."""
+
+    def __init__(self, max_lag, check_interval):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag = None
+        self.checked_at = None
+
+    def is_acceptable(self, engine):
+        now = time.monotonic()
+        if self.checked_at is None \
+                or now - self.checked_at >= self.check_interval:
+            self.lag = self.measure(engine)
+            self.checked_at = now
+        return self.lag is not None and self.lag <= self.max_lag
+
+    def measure(self, engine):
+        if engine.dialect.name != 'postgresql':
+            return 0
+        try:
+            with engine.connect() as conn:
+                query = make_lag_query(conn.dialect.server_version_info)
+                return float(conn.execute(query).scalar())
+        except Exception as e:
+            log.warn('Replica is unavailable: {}', e)
+            return None
+
+
+def get_lag_monitor(app, replica_bind='replica'):
+    monitors = app.extensions.setdefault('replica_lag_monitors', {})
+    try:
+        return monitors[replica_bind]
+    except KeyError:
+        monitor = monitors[replica_bind] = LagMonitor(
+            float(app.config.get('DB_REPLICA_MAX_LAG', 10)),
+            float(app.config.get('DB_REPLICA_LAG_CHECK_INTERVAL', 5)))
+        return monitor
+
+
+def get_replica_bind(mapper):
+    bind_key = None
+    if mapper is not None:
+        bind_key = mapper.persist_selectable.info.get('bind_key')
+    return 'replica' if bind_key is None else '{}_replica'.format(bind_key)
+
+
+def is_replica_bind(bind):
+    return bind == 'replica' or (bind or '').endswith('_replica')
+
+
+def get_replica_engine(app, replica_bind='replica'):
+    """Returns the engine of a replica, if it is configured and is not
+    lagging behind too much."""
+    if replica_bind not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return None
+    engine = get_state(app).db.get_engine(app, bind=replica_bind)
+    if get_lag_monitor(app, replica_bind).is_acceptable(engine):
+        return engine
+    return None
+
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None):
+        if self.info.get('read_only') and not self.info.get('written') \
+                and not self._flushing:
+            engine = get_replica_engine(self.app, get_replica_bind(mapper))
+            if engine is not None:
+                return engine
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+    def execute(self, clause, params=None, mapper=None, bind=None, **kw):
+        # Core writes (e.g., `bulk_create()`) bypass flushes, so they are
+        # marked here, before the statement is routed to a database
+        if isinstance(clause, UpdateBase):
+            self.info['written'] = True
+        return super(RoutingSession, self).execute(
+            clause, params, mapper, bind, **kw)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def mark_written(session, flush_context):
+    session.info['written'] = True
+
+
+@event.listens_for(RoutingSession, 'after_bulk_update')
+@event.listens_for(RoutingSession, 'after_bulk_delete')
+def mark_bulk_written(update_context):
+    update_context.session.info['written'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+@event.listens_for(RoutingSession, 'after_rollback')
+def unmark_written(session):
+    # Writes made before a savepoint are still there after it ends
+    if not in_savepoint(session):
+        session.info.pop('written', None)
+
+
+def in_savepoint(session):
+    """Tells whether the transaction of `session` that is being committed or
+    rolled back is a savepoint (`begin_nested()`) rather than the outermost
+    one."""
+    transaction = session.transaction
+    while transaction is not None:
+        if transaction.nested:
+            return True
+        transaction = transaction.parent
+    return False
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """`SQLAlchemy` whose sessions route read-only queries to the replica."""
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def _execute_for_all_tables(self, app, bind, operation,
+                                skip_tables=False):
+        """Unlike the original, this leaves replicas alone and handles binds
+        that point at the same database with a single operation. Otherwise,
+        PostgreSQL enum types, which are created and dropped along with the
+        whole metadata, would be dropped while another bind still uses them.
+        """
+        if skip_tables:
+            return super(RoutingSQLAlchemy, self)._execute_for_all_tables(
+                app, bind, operation, skip_tables)
+
+        app = self.get_app(app)
+        if bind == '__all__':
+            binds = [None] + [
+                b for b in (app.config.get('SQLALCHEMY_BINDS') or ())
+                if not is_replica_bind(b)]
+        elif isinstance(bind, str) or bind is None:
+            binds = [bind]
+        else:
+            binds = bind
+
+        operations = collections.OrderedDict()  # {url: (engine, tables)}
+        for bind in binds:
+            engine = self.get_engine(app, bind)
+            _, tables = operations.setdefault(str(engine.url), (engine, []))
+            tables.extend(self.get_tables_for_bind(bind))
+
+        for engine, tables in operations.values():
+            getattr(self.Model.metadata, operation)(bind=engine, tables=tables)
+
+
+@contextlib.contextmanager
+def read_only_session():
+    try:
+        session = get_state(current_app).db.session()
+    except (AssertionError, KeyError, RuntimeError):
+        # No app (context) or the app is not bound to any database
+        yield
+        return
+
+    session.info['read_only'] = session.info.get('read_only', 0) + 1
+    try:
+        yield
+    finally:
+        session.info['read_only'] -= 1
+
+
+def read_only(func=None):
+    """Marks queries as read-only, so that they may be served by the replica.
+
+        with read_only():
+            ...
+
+        @read_only
+        def balance(self, evaluated_at=None):
+            ...
+    """
+    if func is None:
+        return read_only_session()
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator(*args, **kwargs):
+            with read_only_session():
+                yield from func(*args, **kwargs)
+        return generator
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with read_only_session():
+            return func(*args, **kwargs)
+    return wrapper
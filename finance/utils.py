@@ -3,13 +3,21 @@ from datetime import datetime, time, timedelta
 import json
 import os
 
-import boto3
-from flask import request
 from logbook import Logger
 
+from finance.dartcodes import get_dart_code_registry, load_dart_codes
+# NOTE: Parsing helpers live in `finance.parsing`, and they are imported here
+# as most callers have been importing them from this module
+from finance.parsing import (  # noqa
+    extract_numbers, parse_date, parse_datetime, parse_decimal, parse_int)
+
 # NOTE: finance.models should not be imported here in order to avoid circular
 # depencencies
 
+# NOTE: Heavy dependencies (boto3, flask) are imported within the functions
+# that need them, as this module is loaded by every CLI command and Lambda
+# function
+
 log = Logger('finance')
 
 
@@ -48,27 +56,15 @@ def date_to_datetime(date, end_of_day=False):
         date, time(23, 59, 59) if end_of_day else time(0, 0, 0))
 
 
-def extract_numbers(value, type=str):
-    """Extracts numbers only from a string."""
-    def extract(vs):
-        for v in vs:
-            if v in '01234567890.':
-                yield v
-    return type(''.join(extract(value)))
-
-
 def get_dart_codes():
     """Returns all DART codes."""
-    with open('data/dart_codes.csv') as fin:
-        for line in fin.readlines():
-            yield [x.strip() for x in line.split(',')]
+    for name, code in load_dart_codes():
+        yield [name, code]
 
 
 def get_dart_code(entity_name):
-    for name, code in get_dart_codes():
-        if name == entity_name:
-            return code
-    raise ValueError('CRP code for {} is not found'.format(entity_name))
+    """Looks up the DART code of an entity (see `finance.dartcodes`)."""
+    return get_dart_code_registry().code(entity_name)
 
 
 def load_stock_codes(fin):
@@ -88,47 +84,6 @@ def make_request_import_stock_values_message(code, start_time, end_time):
     }
 
 
-def parse_date(date, format='%Y-%m-%d'):
-    """Makes a date object from a string.
-
-    :type date: str or int
-    :rtype: datetime.date
-    """
-    if isinstance(date, int):
-        return datetime.now().date() + timedelta(days=date)
-    else:
-        return datetime.strptime(date, format)
-
-
-def parse_datetime(dt, at=datetime.now(), format='%Y-%m-%d %H:%M:%S'):
-    """Makes a datetime object from a string.
-
-    :param dt: Datetime
-    :param at: Time at which the relative time is evaluated
-    :param format: Datetime string format
-    """
-    if isinstance(dt, int):
-        return at + timedelta(seconds=dt)
-    else:
-        return datetime.strptime(dt, format)
-
-
-def parse_decimal(v, type_=float, fallback_to=0):
-    try:
-        return type_(v)
-    except ValueError:
-        return fallback_to
-
-
-def parse_int(v, fallback_to=0):
-    """Parses a string as an integer value. Falls back to zero when failed to
-    parse."""
-    try:
-        return int(v)
-    except ValueError:
-        return fallback_to
-
-
 def parse_stock_code(code: str):
     """Parses a stock code. NOTE: Only works for the Shinhan HTS"""
     if code.startswith('A'):
@@ -202,6 +157,7 @@ def parse_stock_records(stream):
 
 
 def poll_import_stock_values_requests(sqs_region, queue_url):
+    import boto3
     client = boto3.client('sqs', region_name=sqs_region)
     resp = client.receive_message(**{
         'QueueUrl': queue_url, 'VisibilityTimeout': 180})
@@ -213,11 +169,21 @@ def poll_import_stock_values_requests(sqs_region, queue_url):
             'QueueUrl': queue_url, 'ReceiptHandle': message['ReceiptHandle']})
 
 
-def request_import_stock_values(
-    code, start_time, end_time,
-    sqs_region=os.environ['SQS_REGION'],
-    queue_url=os.environ['REQUEST_IMPORT_STOCK_VALUES_QUEUE_URL']
-):
+def request_import_stock_values(code, start_time, end_time, sqs_region=None,
+                                queue_url=None):
+    """Enqueues a request to import stock values.
+
+    :param sqs_region: Defaults to the environment variable `SQS_REGION`
+    :param queue_url: Defaults to the environment variable
+                      `REQUEST_IMPORT_STOCK_VALUES_QUEUE_URL`
+    """
+    import boto3
+
+    if sqs_region is None:
+        sqs_region = os.environ['SQS_REGION']
+    if queue_url is None:
+        queue_url = os.environ['REQUEST_IMPORT_STOCK_VALUES_QUEUE_URL']
+
     message = make_request_import_stock_values_message(
         code, start_time, end_time)
 
@@ -231,6 +197,12 @@ def request_import_stock_values(
         log.error('Something went wrong: {0}', resp)
 
 
+#: Categories of Shinhan HTS records that are stock tradings and transfers
+#: between accounts. Records of other categories are skipped.
+STOCK_TRADING_CATEGORIES = ('매도', '매수')
+STOCK_TRANSFER_CATEGORIES = ('제휴입금', '매매대금출금')
+
+
 def insert_stock_record(data: dict, stock_account: object,
                         bank_account: object):
     """
@@ -244,9 +216,9 @@ def insert_stock_record(data: dict, stock_account: object,
     category = db.Column(db.String)
     quantity = db.Column(db.Numeric(precision=20, scale=4))
     """
-    if data['category2'] in ['매도', '매수']:
+    if data['category2'] in STOCK_TRADING_CATEGORIES:
         return insert_stock_trading_record(data, stock_account)
-    elif data['category2'] in ['제휴입금', '매매대금출금']:
+    elif data['category2'] in STOCK_TRANSFER_CATEGORIES:
         return insert_stock_transfer_record(data, bank_account)
     else:
         log.info('Skipping {} record...', data['category2'])
@@ -256,18 +228,8 @@ def insert_stock_record(data: dict, stock_account: object,
 def insert_stock_trading_record(data: dict, stock_account: object):
     """Inserts a stock trading (i.e., buying or selling stocks) records."""
     from finance.models import Asset, deposit
-    if data['category1'].startswith('장내'):
-        code_suffix = '.KS'
-    elif data['category1'].startswith('코스닥'):
-        code_suffix = '.KQ'
-    else:
-        code_suffix = ''
-        raise ValueError(
-            "code_suffix could not be determined with the category '{}'"
-            ''.format(data['category1']))
-
-    code = data['code'] + code_suffix
 
+    code = stock_trading_code(data)
     asset = Asset.get_by_symbol(code)
     if asset is None:
         raise ValueError(
@@ -284,12 +246,33 @@ def insert_stock_transfer_record(data: dict, bank_account: object):
     # FIXME: Not a good idea to use a hard coded value
     asset_krw = Asset.query.filter(Asset.name == 'KRW').first()
 
+    return deposit(bank_account, asset_krw, stock_transfer_amount(data),
+                   data['date'])
+
+
+def stock_trading_code(data: dict):
+    """Returns the asset code of a stock trading record (e.g., 005380.KS)."""
+    if data['category1'].startswith('장내'):
+        code_suffix = '.KS'
+    elif data['category1'].startswith('코스닥'):
+        code_suffix = '.KQ'
+    else:
+        raise ValueError(
+            "code_suffix could not be determined with the category '{}'"
+            ''.format(data['category1']))
+
+    return data['code'] + code_suffix
+
+
+def stock_transfer_amount(data: dict):
+    """Returns the amount of KRW that a transfer record brings into the bank
+    account."""
     if data['name'] == '증거금이체':
         # Transfer from a bank account to a stock account
-        return deposit(bank_account, asset_krw, -data['subtotal'], data['date'])
+        return -data['subtotal']
     elif data['name'] == '매매대금정산':
         # Transfer from a stock account to a bank account
-        return deposit(bank_account, asset_krw, data['subtotal'], data['date'])
+        return data['subtotal']
     else:
         raise ValueError(
             "Unrecognized transfer type '{}'".format(data['name']))
@@ -297,6 +280,7 @@ def insert_stock_transfer_record(data: dict, bank_account: object):
 
 def json_requested():
     """Determines whether the requested content type is application/json."""
+    from flask import request
     best = request.accept_mimetypes \
         .best_match(['application/json', 'text/plain'])
     return best == 'application/json' and \
@@ -304,6 +288,29 @@ def json_requested():
         request.accept_mimetypes['text/plain']
 
 
+def read_json_lines(fin):
+    """Parses newline-delimited JSON one line at a time. For backward
+    compatibility, a file of a single JSON array is also accepted, although it
+    is loaded into memory at once.
+
+    :raises ValueError: When a line is not valid JSON
+    """
+    first = True
+    for number, line in enumerate(fin, 1):
+        if not line.strip():
+            continue
+        if first and line.lstrip().startswith('['):
+            log.warning('Loading a JSON array as a whole')
+            for row in json.loads(line + fin.read()):
+                yield row
+            return
+        first = False
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise ValueError('Line {}: {}'.format(number, e))
+
+
 def serialize_datetime(obj):
     """JSON serializer for objects not serializable by default json code. This
     may be used as follows:
@@ -0,0 +1,150 @@
+"""Valuation engines that evaluate many points of time at once, rather than
+calling `Account.net_worth()` for every single day."""
+import itertools
+from datetime import datetime
+
+from sqlalchemy import func
+
+from finance.exceptions import InvalidTargetAssetException
+from finance.fixedpoint import accumulate_balance, from_fixed_product
+from finance.fixedpoint import net_worth as fixed_net_worth
+from finance.fixedpoint import to_fixed
+from finance.models import (Account, AssetValue, Granularity, Record,
+                            RecordType, db, stream_asset_values,
+                            stream_records)
+from finance.replica import read_only
+from finance.utils import date_range, date_to_datetime
+
+
+@read_only
+def daily_net_worth(accounts, base_asset, date_from, date_to,
+                    granularity=Granularity.day):
+    """Calculates the combined net worth of `accounts` for each day within
+    [date_from, date_to).
+
+    This yields the same values as summing up
+    `account.net_worth(date, granularity, True, base_asset)` for every account
+    and date, but it only issues four queries and sweeps through the records
+    and the asset values once.
+
+    :return: A generator of (date, net_worth) tuples
+    """
+    if base_asset is None:
+        raise InvalidTargetAssetException('Base asset cannot be null')
+
+    dates = list(date_range(date_from, date_to))
+    if not dates:
+        return
+
+    upper_bounds = [
+        Account.get_bounds(
+            d if isinstance(d, datetime) else date_to_datetime(d),
+            granularity)[1]
+        for d in dates]
+    account_ids = [account.id for account in accounts]
+
+    # NOTE: Records and asset values are streamed (see
+    # `finance.models.stream_rows()`), so that long periods take constant
+    # memory
+    asset_ids = {asset_id for asset_id, in db.session.query(Record.asset_id)
+                 .filter(Record.account_id.in_(account_ids),
+                         Record.created_at <= upper_bounds[-1])
+                 .distinct()} - {base_asset.id}
+    records = stream_records(account_ids, upper_bounds[-1])
+    asset_values = fetch_closes(
+        asset_ids, base_asset, granularity, upper_bounds[0],
+        upper_bounds[-1])
+
+    # NOTE: Quantities and closes are kept as scaled integers (see
+    # `finance.fixedpoint`) and only net worths are converted into `Decimal`s
+    balances = {}  # {(account_id, asset_id): quantity}
+    closes = {}  # {asset_id: the most recent close}
+    record, asset_value = next(records, None), next(asset_values, None)
+    for date, upper_bound in zip(dates, upper_bounds):
+        while record is not None and record[4] <= upper_bound:
+            account_id, asset_id, quantity, type_, _ = record
+            # Previous records will be ignored when 'balance_adjustment' is
+            # seen.
+            accumulate_balance(balances, (account_id, asset_id),
+                               to_fixed(quantity),
+                               type_ == RecordType.balance_adjustment)
+            record = next(records, None)
+
+        while asset_value is not None and asset_value[1] <= upper_bound:
+            asset_id, _, close = asset_value
+            closes[asset_id] = to_fixed(close)
+            asset_value = next(asset_values, None)
+
+        net_worth = fixed_net_worth(
+            ((asset_id, quantity)
+             for (_, asset_id), quantity in balances.items()),
+            closes, base_asset.id)
+        yield date, from_fixed_product(net_worth)
+
+
+def fetch_closes(asset_ids, base_asset, granularity, since, until):
+    """Fetches the most recent close of each asset as of `since`, followed by
+    all closes within (since, until] (which are streamed), ordered by
+    `evaluated_at`.
+
+    :return: An iterator of (asset_id, evaluated_at, close) tuples
+    """
+    if not asset_ids:
+        return iter([])
+
+    def query(*columns):
+        return db.session.query(*columns).filter(
+            AssetValue.asset_id.in_(asset_ids),
+            AssetValue.granularity == granularity,
+            AssetValue.base_asset_id == base_asset.id)
+
+    latest = query(AssetValue.asset_id,
+                   func.max(AssetValue.evaluated_at).label('evaluated_at')) \
+        .filter(AssetValue.evaluated_at <= since) \
+        .group_by(AssetValue.asset_id) \
+        .subquery()
+    initial = query(AssetValue.asset_id, AssetValue.evaluated_at,
+                    AssetValue.close) \
+        .join(latest, db.and_(
+            AssetValue.asset_id == latest.c.asset_id,
+            AssetValue.evaluated_at == latest.c.evaluated_at)) \
+        .all()
+    subsequent = ((asset_id, evaluated_at, close)
+                  for asset_id, evaluated_at, _, _, _, close, _
+                  in stream_asset_values(asset_ids, granularity,
+                                         base_asset.id, since, until))
+
+    return itertools.chain(
+        (tuple(v) for v in sorted(initial, key=lambda v: v.evaluated_at)),
+        subsequent)
+
+
+@read_only
+def portfolio_version(portfolio, granularity=Granularity.day):
+    """Summarizes everything the net worth of a portfolio depends on: its
+    accounts, base asset, records and asset values.
+
+    As uuid64 identifiers are time-ordered, the maximum ID of a table tells us
+    about the latest insertion and the row count tells us about deletions.
+    Updates to existing rows are not detected.
+    """
+    account_ids = sorted(a.id for a in portfolio.accounts)
+    # NOTE: Asset values may live in a separate database, so this cannot be a
+    # subquery
+    asset_ids = [asset_id for asset_id, in db.session.query(Record.asset_id)
+                 .filter(Record.account_id.in_(account_ids))
+                 .distinct()]
+
+    record_stats = db.session.query(
+        func.count(Record.id), func.max(Record.id)) \
+        .filter(Record.account_id.in_(account_ids)) \
+        .one()
+    asset_value_stats = db.session.query(
+        func.count(AssetValue.id), func.max(AssetValue.id)) \
+        .filter(AssetValue.asset_id.in_(asset_ids),
+                AssetValue.granularity == granularity,
+                AssetValue.base_asset_id == portfolio.base_asset_id) \
+        .one()
+
+    return (portfolio.base_asset_id, tuple(account_ids),
+            tuple(record_stats), tuple(asset_value_stats))
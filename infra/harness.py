@@ -0,0 +1,82 @@
+"""Invokes a Lambda handler locally and repeatedly, in order to see how long
+cold and warm invocations take.
+
+    DB_URL=postgresql://... python infra/harness.py -n 20
+    DB_URL=postgresql://... python infra/harness.py -n 5 \\
+        --event '{"requests": [{"code": "NVDA", "start_time": 1514764800,
+                                "end_time": 1514851200}]}'
+
+Without `--event`, each invocation only checks out a database connection and
+runs `SELECT 1` within the app context, which is what the handlers pay for
+before doing any actual work. With `--cold`, the app and the engine are
+thrown away after every invocation, which is how the handler used to work.
+"""
+import importlib.util
+import json
+import os
+import statistics
+import time
+
+import click
+
+BASE_PATH = os.path.abspath(os.path.dirname(__file__))
+
+
+def load_lambda_module():
+    # NOTE: `lambda` is a reserved word, so `import lambda` is not an option
+    spec = importlib.util.spec_from_file_location(
+        'lambda_function', os.path.join(BASE_PATH, 'lambda.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def probe(module):
+    from finance.models import db
+    with module.get_app().app_context():
+        db.session.execute('SELECT 1')
+
+
+def discard_app(module):
+    from finance.models import db
+    if module._app is not None:
+        db.get_engine(module._app).dispose()
+        module._app = None
+
+
+@click.command()
+@click.option('-n', '--invocations', type=int, default=10)
+@click.option('--event', help='Event (JSON) to invoke the handler with')
+@click.option('--handler', default='fetch_asset_values_handler')
+@click.option('--cold', is_flag=True,
+              help='Discard the app after every invocation')
+def main(invocations, event, handler, cold):
+    module = load_lambda_module()
+    if event is not None:
+        event = json.loads(event)
+        handler = getattr(module, handler)
+
+        def invoke():
+            handler(event, None)
+    else:
+        def invoke():
+            probe(module)
+
+    durations = []
+    for _ in range(invocations):
+        started_at = time.perf_counter()
+        invoke()
+        durations.append((time.perf_counter() - started_at) * 1000)
+        if cold:
+            discard_app(module)
+
+    print('first: {:.2f} ms'.format(durations[0]))
+    if len(durations) > 1:
+        rest = durations[1:]
+        print('subsequent: mean {:.2f} ms, median {:.2f} ms, '
+              'max {:.2f} ms'.format(
+                  statistics.mean(rest), statistics.median(rest), max(rest)))
+
+
+if __name__ == '__main__':
+    main()
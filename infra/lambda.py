@@ -2,24 +2,51 @@ from datetime import datetime
 import os
 
 from logbook import Logger
-from sqlalchemy.exc import IntegrityError, InvalidRequestError
 
-from finance import create_app
-from finance.exceptions import AssetNotFoundException
-from finance.fetchers import fetch_stock_values
-from finance.models import Asset, AssetType, AssetValue, db, Granularity
-from finance.providers import Yahoo
+from finance import create_worker_app
 from finance.utils import (
     date_to_datetime, parse_date, poll_import_stock_values_requests,
     request_import_stock_values)
 
 
+# NOTE: SQLAlchemy, the models and the providers are imported within the
+# functions that need them, so that a cold start of
+# `request_import_stock_values_handler` does not pay for them
 log = Logger('finance')
 
+#: The app (and thus the engine and its connection pool) is kept between
+#: invocations of a warm Lambda container
+_app = None
+
 
 # TODO: Write logs to CloudWatch
 
 
+def make_config():
+    return {
+        'SQLALCHEMY_DATABASE_URI': os.environ['DB_URL'],
+        # A container handles one invocation at a time, so a single
+        # connection is enough. As the connection may have been dropped
+        # while the container was frozen, it is validated before reuse
+        # (pre-ping) and replaced every once in a while (recycle).
+        'SQLALCHEMY_ENGINE_OPTIONS': {
+            'pool_size': 1,
+            'max_overflow': 0,
+            'pool_pre_ping': True,
+            'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 300)),
+        },
+    }
+
+
+def get_app():
+    """Returns the app of this container, which is created on the first (cold)
+    invocation."""
+    global _app
+    if _app is None:
+        _app = create_worker_app(__name__, config=make_config())
+    return _app
+
+
 def request_import_stock_values_handler(event, context):
     codes = ['AMD', 'AMZN', 'BRK-A', 'BRK-B', 'ESRT', 'NVDA', 'SBUX', 'SPY']
     start_time = date_to_datetime(parse_date(-3))
@@ -32,15 +59,18 @@ def request_import_stock_values_handler(event, context):
 
 
 def fetch_asset_values_handler(event, context):
-    config = {
-        'SQLALCHEMY_DATABASE_URI': os.environ['DB_URL']
-    }
-    sqs_region = os.environ['SQS_REGION']
-    queue_url = os.environ['REQUEST_IMPORT_STOCK_VALUES_QUEUE_URL']
-
-    app = create_app(__name__, config=config)
+    """Fetches asset values as requested via SQS. Requests may also be given
+    as `event['requests']` (e.g., when invoked manually)."""
+    app = get_app()
+    # NOTE: The session is removed when the app context is torn down, which
+    # returns the connection to the pool for the next invocation
     with app.app_context():
-        requests = poll_import_stock_values_requests(sqs_region, queue_url)
+        if event and 'requests' in event:
+            requests = event['requests']
+        else:
+            requests = poll_import_stock_values_requests(
+                os.environ['SQS_REGION'],
+                os.environ['REQUEST_IMPORT_STOCK_VALUES_QUEUE_URL'])
         for request in requests:
             code = request['code']
             start_time = datetime.fromtimestamp(request['start_time'])
@@ -49,6 +79,11 @@ def fetch_asset_values_handler(event, context):
 
 
 def fetch_asset_values(code, start_time, end_time):
+    from sqlalchemy.exc import IntegrityError, InvalidRequestError
+    from finance.exceptions import AssetNotFoundException
+    from finance.fetchers import fetch_stock_values
+    from finance.models import Asset, AssetType, Granularity, db
+
     try:
         asset = Asset.get_by_symbol(code)
     except AssetNotFoundException:
@@ -74,6 +109,8 @@ def fetch_asset_values(code, start_time, end_time):
 
 def insert_asset_value(asset, date, granularity, open_, high, low, close_,
                        volume, source):
+    from finance.models import AssetValue, Granularity
+
     # FIXME: This kind of approach may not be safe in multithreading
     # environments
     if AssetValue.exists(
@@ -8,8 +8,9 @@ from finance import create_app
 from finance.importers import import_stock_values
 from finance.models import db as _db
 from finance.models import (Account, AccountType, Asset, AssetType,
-                            CurrencyAsset, FundAsset, P2PBondAsset, Portfolio,
-                            StockAsset)
+                            CurrencyAsset, DartReport, FundAsset,
+                            P2PBondAsset, Portfolio, StockAsset)
+from finance.utils import parse_date
 
 
 @pytest.fixture(scope='session')
@@ -241,6 +242,32 @@ def portfolio(request, db, asset_krw, account_checking, account_sp500):
     return p
 
 
+@pytest.fixture(scope='function')
+def dart_reports(request, db):
+    rows = [
+        ('2018-01-02', '주요사항보고서(유상증자결정)', 126380, '삼성전자',
+         '삼성전자는 이사회에서 유상증자를 결정하였습니다. ' * 10),
+        ('2018-02-01', '분기보고서 (2017.12)', 126380, '삼성전자',
+         '당사의 매출은 전년 대비 증가하였으며, 유상증자 계획은 없습니다.'),
+        ('2018-03-05', '주요사항보고서(자기주식취득결정)', 164779, 'SK하이닉스',
+         'SK하이닉스는 자기주식을 취득하기로 결정하였습니다.'),
+    ]
+    reports = [
+        DartReport.create(
+            registered_at=parse_date(registered_at), title=title,
+            entity_id=entity_id, entity=entity, reporter=entity,
+            content=content)
+        for registered_at, title, entity_id, entity, content in rows]
+
+    def teardown():
+        for report in reports:
+            db.session.delete(report)
+        db.session.commit()
+
+    request.addfinalizer(teardown)
+    return reports
+
+
 def teardown(db, record):
     db.session.delete(record)
     db.session.commit()
@@ -0,0 +1,58 @@
+import os
+
+from finance import create_app, create_worker_app, make_binds
+from finance.models import Account
+
+
+def test_create_app():
+    app = create_app(__name__, config={
+        'SQLALCHEMY_DATABASE_URI': os.environ['TEST_DB_URL'],
+    })
+    assert 'main' in app.blueprints
+    assert 'admin' in app.blueprints
+
+
+def test_create_worker_app():
+    app = create_worker_app(__name__, config={
+        'SQLALCHEMY_DATABASE_URI': os.environ['TEST_DB_URL'],
+    })
+    assert app.blueprints == {}
+    assert 'sqlalchemy' in app.extensions
+    assert 'valuation_cache' in app.extensions
+
+    with app.app_context():
+        assert Account.query.count() >= 0
+
+
+def test_create_worker_app_engine_options():
+    app = create_worker_app(__name__, config={
+        'SQLALCHEMY_DATABASE_URI': os.environ['TEST_DB_URL'],
+        'SQLALCHEMY_ENGINE_OPTIONS': {'pool_pre_ping': True},
+    })
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS'] == {
+        'pool_pre_ping': True,
+        'executemany_mode': 'values',
+    }
+
+
+def test_make_binds():
+    config = {
+        'SQLALCHEMY_DATABASE_URI': 'postgresql:///primary',
+        'DB_REPLICA_URL': None,
+        'TIMESERIES_DB_URL': None,
+        'TIMESERIES_DB_REPLICA_URL': None,
+    }
+    assert make_binds(config) == {'timeseries': 'postgresql:///primary'}
+
+    config['DB_REPLICA_URL'] = 'postgresql:///replica'
+    assert make_binds(config) == {
+        'timeseries': 'postgresql:///primary',
+        'replica': 'postgresql:///replica',
+        'timeseries_replica': 'postgresql:///replica',
+    }
+
+    config['TIMESERIES_DB_URL'] = 'postgresql:///timeseries'
+    assert make_binds(config) == {
+        'timeseries': 'postgresql:///timeseries',
+        'replica': 'postgresql:///replica',
+    }
@@ -1,17 +1,23 @@
+import json
 import os
 import random
 
 import pytest
 from click.testing import CliRunner
 
-from finance.__main__ import (create_all, drop_all, fetch_stock_values,
+from finance.__main__ import (create_all, drop_all, fetch_dart,
+                              fetch_stock_values, import_broker_exports,
                               import_fund, import_miraeasset_foreign_data,
                               import_sp500_records, import_stock_records,
                               import_stock_values, insert_stock_assets,
-                              insert_test_data)
+                              import_dart, insert_test_data, search_dart,
+                              sync_dart, sync_stock_codes)
+from finance.checkpoints import CheckpointMismatchException
 from finance.exceptions import AssetNotFoundException
-from finance.models import StockAsset, deposit
-from finance.utils import load_stock_codes
+from finance.models import (Account, Asset, AssetValue, DartReport, Record,
+                            StockAsset, deposit)
+from finance.providers import Dart
+from finance.utils import load_stock_codes, parse_date
 
 
 @pytest.fixture(autouse=True)
@@ -19,6 +25,12 @@ def monkeypatch_db_url(monkeypatch):
     monkeypatch.setitem(os.environ, 'DB_URL', os.environ['TEST_DB_URL'])
 
 
+@pytest.fixture(autouse=True)
+def monkeypatch_checkpoint_path(monkeypatch, tmpdir):
+    monkeypatch.setitem(os.environ, 'IMPORT_CHECKPOINT_PATH',
+                        str(tmpdir.join('checkpoints.db')))
+
+
 def test_drop_all():
     runner = CliRunner()
     result = runner.invoke(drop_all)
@@ -92,16 +104,65 @@ def test_import_stock_values():
     assert asset_value.volume == 856210
 
 
-def test_import_stock_records(asset_krw, account_stock, account_checking):
-    for _ in insert_stock_assets():
-        pass
+def test_import_stock_values_resumes(db):
+    asset = StockAsset.create(code='STOCK.TEST')
+    asset_id = asset.id
+    rows = ['2017-08-{}, 100, 110, 90, 105, 1000, test'.format(day)
+            for day in range(21, 26)]
 
     runner = CliRunner()
-    result = runner.invoke(
-        import_stock_records, ['tests/samples/shinhan_stock_records.csv'],
-        catch_exceptions=False)
+    result = runner.invoke(import_stock_values, ['STOCK.TEST'],
+                           input='\n'.join(rows[:3]), catch_exceptions=False)
+    assert result.exit_code == 0
+
+    # Rows that have been imported are skipped
+    result = runner.invoke(import_stock_values, ['STOCK.TEST'],
+                           input='\n'.join(rows), catch_exceptions=False)
+    assert result.exit_code == 0
+    assert AssetValue.query.filter_by(asset_id=asset_id).count() == 5
+
+    # The input has changed
+    result = runner.invoke(import_stock_values, ['STOCK.TEST'],
+                           input='\n'.join(rows[1:]))
+    assert isinstance(result.exception, CheckpointMismatchException)
+
+    result = runner.invoke(import_stock_values, ['STOCK.TEST', '--restart'],
+                           input='\n'.join(rows[1:]), catch_exceptions=False)
     assert result.exit_code == 0
 
+    AssetValue.query.filter_by(asset_id=asset_id).delete()
+    Asset.query.filter_by(id=asset_id).delete()
+    db.session.commit()
+
+
+def test_import_stock_records(db, asset_krw):
+    assets = list(insert_stock_assets())
+    runner = CliRunner()
+    args = ['tests/samples/shinhan_stock_records.csv']
+
+    # Records are not inserted without their accounts
+    result = runner.invoke(import_stock_records, args)
+    assert result.exit_code == 2
+    assert "Account '신한 입출금' does not exist" in result.output
+
+    account_ids = [
+        Account.create(type='checking', name='신한 입출금').id,
+        Account.create(type='investment', name='신한 주식').id]
+    try:
+        result = runner.invoke(import_stock_records, args,
+                               catch_exceptions=False)
+        assert result.exit_code == 0
+        assert Record.query.filter(
+            Record.account_id.in_(account_ids)).count() > 0
+    finally:
+        Record.query.filter(Record.account_id.in_(account_ids)).delete(
+            synchronize_session=False)
+        Account.query.filter(Account.id.in_(account_ids)).delete(
+            synchronize_session=False)
+        for asset in assets:
+            db.session.delete(asset)
+        db.session.commit()
+
 
 def test_import_miraeasset_foreign_data(
     asset_usd, asset_krw, account_stock, stock_asset_spy, stock_asset_amzn,
@@ -113,3 +174,154 @@ def test_import_miraeasset_foreign_data(
         ['tests/samples/miraeasset_foreign.csv', 'Miraeasset', 'ACCOUNT1'],
         catch_exceptions=False)
     assert result.exit_code == 0
+
+
+def test_import_broker_exports(
+    db, asset_usd, asset_krw, account_stock, stock_asset_spy, stock_asset_amzn,
+    stock_asset_nvda, stock_asset_amd, stock_asset_sbux
+):
+    account_id = account_stock.id
+    runner = CliRunner()
+    result = runner.invoke(
+        import_broker_exports,
+        ['miraeasset', 'tests/samples/miraeasset_f*.csv', '-j', '1',
+         '-a', 'Miraeasset', 'ACCOUNT1'],
+        catch_exceptions=False)
+    assert result.exit_code == 0
+    try:
+        assert Record.query.filter_by(account_id=account_id).count() > 0
+    finally:
+        Record.query.filter_by(account_id=account_id).delete()
+        db.session.commit()
+
+    result = runner.invoke(
+        import_broker_exports, ['miraeasset', 'tests/samples/*.xls'])
+    assert result.exit_code == 2
+    assert 'No files are found' in result.output
+
+    result = runner.invoke(
+        import_broker_exports,
+        ['miraeasset', 'tests/samples/miraeasset_f*.csv', '-a', 'Miraeasset',
+         'NONEXISTENT'])
+    assert result.exit_code == 2
+    assert 'Account Miraeasset NONEXISTENT does not exist' in result.output
+
+
+def test_search_dart(dart_reports):
+    runner = CliRunner()
+    result = runner.invoke(search_dart, ['자기주식'])
+    assert result.exit_code == 0
+    assert '1 reports found' in result.output
+    assert 'SK하이닉스' in result.output
+
+
+def make_dart_listing(rcp_no, title):
+    return {'rcp_no': str(rcp_no), 'rcp_dm': '{}.{}.{}'.format(
+                str(rcp_no)[:4], str(rcp_no)[4:6], str(rcp_no)[6:8]),
+            'rptNm': title, 'dsm_crp_cik': '00126380', 'ifm_nm': '삼성전자',
+            'ifm_nm2': '삼성전자'}
+
+
+def test_sync_dart(monkeypatch, db):
+    DartReport.create(
+        id=20180301000002, registered_at=parse_date('2018-03-01'),
+        title='기존 보고서', entity_id=126380, entity='삼성전자',
+        reporter='삼성전자', content='기존 내용')
+    pages = {
+        1: [make_dart_listing(20180305000001, '주요사항보고서(유상증자결정)'),
+            make_dart_listing(20180302000001, '분기보고서')],
+        2: [make_dart_listing(20180301000002, '기존 보고서'),
+            make_dart_listing(20180228000001, '더 오래된 보고서')],
+    }
+    requested_pages, requested_reports = [], []
+
+    def fetch_listings_by_page(self, entity_name, entity_code, page=1,
+                               *args, **kwargs):
+        requested_pages.append(page)
+        return pages.get(page, []), 3, 6
+
+    def fetch_report(self, id):
+        requested_reports.append(id)
+        return {'self': None, 'reportBody': '<p>{} 본문</p>'.format(id)}
+
+    monkeypatch.setattr(Dart, 'fetch_listings_by_page', fetch_listings_by_page)
+    monkeypatch.setattr(Dart, 'fetch_report', fetch_report)
+
+    runner = CliRunner()
+    result = runner.invoke(sync_dart, ['삼성전자', 'Non-exist'])
+    assert result.exit_code == 0
+
+    try:
+        # Stops paging at the known report and fetches only new bodies
+        assert requested_pages == [1, 2]
+        assert requested_reports == ['20180305000001', '20180302000001']
+
+        db.session.expire_all()
+        report = DartReport.get(20180305000001)
+        assert report.content == '<p>20180305000001 본문</p>'
+        assert DartReport.search('유상증자').total == 1
+        assert DartReport.get(20180228000001) is None
+    finally:
+        DartReport.query.filter(DartReport.id.in_(
+            [20180301000002, 20180305000001, 20180302000001])) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+
+def test_fetch_dart(monkeypatch):
+    listings = [make_dart_listing(20180305000001, '분기보고서'),
+                make_dart_listing(20180302000001, '주요사항보고서')]
+    monkeypatch.setattr(
+        Dart, 'fetch_listings_by_page',
+        lambda self, *args, **kwargs: (listings, 1, len(listings)))
+    monkeypatch.setattr(
+        Dart, 'fetch_report',
+        lambda self, id: {'self': None, 'reportBody': '본문'})
+
+    runner = CliRunner()
+    result = runner.invoke(fetch_dart, ['삼성전자'])
+    assert result.exit_code == 0
+
+    lines = result.output.splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])['id'] == 20180305000001
+    assert json.loads(lines[1])['registered_at'] == '2018-03-02T00:00:00'
+
+
+def test_import_dart(db):
+    rows = [{'id': 20180305000000 + i,
+             'registered_at': '2018-03-05T00:00:00', 'title': '보고서',
+             'entity_id': 126380, 'entity': '삼성전자', 'reporter': '삼성전자',
+             'content': '유상증자 {}'.format(i)} for i in range(5)]
+    data = ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+
+    runner = CliRunner()
+    try:
+        result = runner.invoke(import_dart, ['--batch-size', '2'], input=data)
+        assert result.exit_code == 0
+        assert DartReport.query.filter_by(entity_id=126380).count() == 5
+
+        # Existing reports are updated, and the last of the duplicates (e.g.,
+        # of appended outputs of `fetch_dart`) wins
+        data = data.replace('보고서', '정정보고서') + \
+            json.dumps(dict(rows[0], title='재정정보고서')) + '\n'
+        result = runner.invoke(import_dart, input=data)
+        assert result.exit_code == 0
+        assert DartReport.search('정정보고서').total == 4
+        assert DartReport.get(rows[0]['id']).title == '재정정보고서'
+    finally:
+        DartReport.query.filter_by(entity_id=126380).delete()
+        db.session.commit()
+
+    result = runner.invoke(import_dart, input='{"id": \n')
+    assert result.exit_code == 1
+
+
+def test_sync_stock_codes_dry_run(tmpdir):
+    stock_codes = tmpdir.join('stock_codes.csv')
+    stock_codes.write('999990.KS\t신규상장\nN/A\t무시\n')
+
+    runner = CliRunner()
+    result = runner.invoke(sync_stock_codes, [str(stock_codes), '--dry-run'])
+    assert result.exit_code == 0
+    assert Asset.query.filter_by(code='999990.KS').first() is None
@@ -0,0 +1,211 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from finance.cache import (LRUBackend, LRUCache, SQLiteBackend,
+                           ValuationCache, ValuationKey, get_request_memo,
+                           make_valuation_cache, request_time)
+from finance.models import (Account, AssetValue, Granularity, Portfolio,
+                            Record, UnitOfWork, db, deposit)
+from finance.utils import parse_date
+
+
+def make_key(entity, date_, base_asset_id=1):
+    return ValuationKey(entity, date_, Granularity.day, base_asset_id, True)
+
+
+def test_lru_cache():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert 'b' not in cache
+    assert cache.keys() == ['a', 'c']
+    assert cache.get('b', 'missing') == 'missing'
+
+
+@pytest.fixture(params=['lru', 'disk'])
+def backend(request, tmpdir):
+    if request.param == 'lru':
+        return LRUBackend(100)
+    else:
+        return SQLiteBackend(str(tmpdir.join('valuation.db')))
+
+
+def test_backend_invalidate(backend):
+    cache = ValuationCache(backend)
+    for day in (1, 2, 3):
+        cache.set(make_key('account:1', date(2017, 1, day)), Decimal(day))
+        cache.set(make_key('account:2', date(2017, 1, day)), day)
+
+    cache.invalidate(datetime(2017, 1, 2, 12), entities=['account:1'])
+
+    assert cache.get(make_key('account:1', date(2017, 1, 1))) == 1
+    assert cache.get(make_key('account:1', date(2017, 1, 2))) is None
+    assert cache.get(make_key('account:2', date(2017, 1, 3))) == 3
+    assert isinstance(cache.get(make_key('account:2', date(2017, 1, 3))), int)
+
+    cache.invalidate(date(2017, 1, 3), base_asset_id=2)
+    assert cache.get(make_key('account:2', date(2017, 1, 3))) == 3
+    cache.invalidate(date(2017, 1, 3), base_asset_id=1)
+    assert cache.get(make_key('account:2', date(2017, 1, 3))) is None
+
+
+def test_make_valuation_cache(tmpdir):
+    assert make_valuation_cache({}) is None
+    assert isinstance(make_valuation_cache({'VALUATION_CACHE': 'lru'}).backend,
+                      LRUBackend)
+    cache = make_valuation_cache({
+        'VALUATION_CACHE': 'disk',
+        'VALUATION_CACHE_PATH': str(tmpdir.join('cache', 'valuation.db')),
+    })
+    assert isinstance(cache.backend, SQLiteBackend)
+
+    with pytest.raises(ValueError):
+        make_valuation_cache({'VALUATION_CACHE': 'memcached'})
+
+
+@pytest.fixture
+def valuation_cache(app):
+    cache = ValuationCache(LRUBackend(1000))
+    app.extensions['valuation_cache'] = cache
+    yield cache
+    app.extensions['valuation_cache'] = None
+
+
+def test_net_worth_cache(valuation_cache, account_checking, asset_krw,
+                         portfolio):
+    account_key = 'account:{}'.format(account_checking.id)
+
+    deposit(account_checking, asset_krw, 1000, parse_date('2017-01-02'))
+    assert portfolio.net_worth(parse_date('2017-01-03')) == 1000
+    assert portfolio.net_worth(parse_date('2017-01-05')) == 1000
+    # Two portfolio entries and two entries for each of the two accounts
+    assert len(valuation_cache.backend) == 6
+
+    # A record on 2017-01-04 only affects the valuations since then
+    record = deposit(account_checking, asset_krw, 500,
+                     parse_date('2017-01-04'))
+    assert len(valuation_cache.backend) == 4
+    assert valuation_cache.get(make_key(
+        account_key, date(2017, 1, 3), asset_krw.id)) == 1000
+    assert portfolio.net_worth(parse_date('2017-01-05')) == 1500
+
+    # Moving the record back in time affects both the old and the new dates
+    record.created_at = parse_date('2017-01-01')
+    Record.query.session.commit()
+    assert portfolio.net_worth(parse_date('2017-01-03')) == 1500
+
+    Record.query.filter_by(account=account_checking).delete()
+    # Bulk deletions do not fire mapper events
+    valuation_cache.clear()
+    assert portfolio.net_worth(parse_date('2017-01-03')) == 0
+
+
+def test_net_worth_cache_invalidated_on_commit(
+        valuation_cache, account_checking, asset_krw):
+    key = make_key('account:{}'.format(account_checking.id),
+                   date(2017, 1, 3), asset_krw.id)
+
+    def net_worth():
+        return account_checking.net_worth(
+            parse_date('2017-01-03'), approximation=True,
+            base_asset=asset_krw)
+
+    deposit(account_checking, asset_krw, 1000, parse_date('2017-01-02'))
+    assert net_worth() == 1000
+
+    with UnitOfWork() as uow:
+        deposit(account_checking, asset_krw, 500, parse_date('2017-01-01'))
+        db.session.flush()
+        # Other requests still see the committed records only, with which
+        # the cached value agrees
+        assert valuation_cache.get(key) == 1000
+        uow.commit()
+        assert valuation_cache.get(key) is None
+
+    assert net_worth() == 1500
+
+    # Invalidations of what has been rolled back are dropped
+    Record.create(account=account_checking, asset=asset_krw, quantity=100,
+                  created_at=parse_date('2017-01-01'), commit=False)
+    db.session.flush()
+    db.session.rollback()
+    assert valuation_cache.get(key) == 1500
+    assert db.session.info.get('pending_invalidations') is None
+
+
+def test_add_accounts_invalidates_cache(valuation_cache, account_checking,
+                                        account_savings, asset_krw):
+    portfolio = Portfolio.create(base_asset=asset_krw)
+    try:
+        portfolio.add_accounts(account_checking)
+        deposit(account_savings, asset_krw, 1000, parse_date('2017-01-02'))
+        assert portfolio.net_worth(parse_date('2017-01-03')) == 0
+
+        portfolio.add_accounts(account_savings)
+        assert portfolio.net_worth(parse_date('2017-01-03')) == 1000
+    finally:
+        portfolio.base_asset = None
+        db.session.delete(portfolio)
+        db.session.commit()
+
+
+def test_net_worth_cache_excludes_today(valuation_cache, account_checking,
+                                        asset_krw):
+    deposit(account_checking, asset_krw, 1000,
+            datetime.utcnow() - timedelta(days=1))
+    assert account_checking.net_worth(base_asset=asset_krw) == 1000
+    assert len(valuation_cache.backend) == 0
+
+
+def test_asset_value_invalidates_cache(valuation_cache, account_stock,
+                                       asset_krw, asset_sp500):
+    deposit(account_stock, asset_sp500, 2, parse_date('2017-01-01'))
+    AssetValue.create(
+        evaluated_at=parse_date('2017-01-01'), granularity=Granularity.day,
+        asset=asset_sp500, base_asset=asset_krw, close=100)
+    evaluated_at = parse_date('2017-01-03')
+    assert account_stock.net_worth(evaluated_at, approximation=True,
+                                   base_asset=asset_krw) == 200
+
+    AssetValue.create(
+        evaluated_at=parse_date('2017-01-02'), granularity=Granularity.day,
+        asset=asset_sp500, base_asset=asset_krw, close=110)
+    assert account_stock.net_worth(evaluated_at, approximation=True,
+                                   base_asset=asset_krw) == 220
+
+
+def test_request_memo(app, account_checking, asset_krw, portfolio):
+    deposit(account_checking, asset_krw, 1000, parse_date('2017-01-02'))
+
+    with app.test_request_context():
+        memo = get_request_memo()
+        assert portfolio.net_worth() == 1000
+        misses = memo.misses
+
+        # Same computations as `Portfolio.net_worth()` has already done, but
+        # with keyword arguments
+        assert account_checking.net_worth(
+            approximation=True, base_asset=asset_krw) == 1000
+        assert account_checking.balance(
+            Account.get_bounds(request_time())[1]) == {asset_krw: 1000}
+        assert memo.hits == 2
+        assert memo.misses == misses
+
+        # Callers get their own copies
+        account_checking.balance().clear()
+        assert account_checking.balance() == {asset_krw: 1000}
+
+        # Writes drop memoized results
+        deposit(account_checking, asset_krw, 500, parse_date('2017-01-03'))
+        assert portfolio.net_worth() == 1500
+
+
+def test_request_memo_outside_request(account_checking, asset_krw):
+    assert get_request_memo() is None
+    deposit(account_checking, asset_krw, 1000, parse_date('2017-01-02'))
+    assert account_checking.balance() == {asset_krw: 1000}
@@ -0,0 +1,54 @@
+import pytest
+
+from finance.checkpoints import (CheckpointMismatchException, CheckpointStore,
+                                 make_checkpoint_store)
+
+
+@pytest.fixture
+def store(tmpdir):
+    return CheckpointStore(str(tmpdir.join('checkpoints.db')))
+
+
+def import_rows(store, key, rows, fail_at=None, restart=False):
+    """Imports rows, saving the checkpoint every two rows."""
+    imported = []
+    checkpoint = store.checkpoint(key, restart)
+    for i, row in enumerate(checkpoint.resume(rows), 1):
+        if row == fail_at:
+            raise RuntimeError(row)
+        imported.append(row)
+        if i % 2 == 0:
+            checkpoint.save()
+    checkpoint.save()
+    return imported
+
+
+def test_resume(store):
+    rows = ['a', 'b', 'c', 'd', 'e']
+    with pytest.raises(RuntimeError):
+        import_rows(store, 'test', rows, fail_at='d')
+    assert store.get('test')[0] == 2
+
+    # The third row is imported again, as it had not been checkpointed
+    assert import_rows(store, 'test', rows) == ['c', 'd', 'e']
+    assert import_rows(store, 'test', rows + ['f']) == ['f']
+    assert import_rows(store, 'test', rows + ['f']) == []
+    assert import_rows(store, 'other', rows) == rows
+
+
+def test_resume_with_changed_rows(store):
+    import_rows(store, 'test', ['a', 'b', 'c'])
+
+    with pytest.raises(CheckpointMismatchException):
+        import_rows(store, 'test', ['a', 'x', 'c', 'd'])
+    with pytest.raises(CheckpointMismatchException):
+        import_rows(store, 'test', ['a', 'b'])
+
+    assert import_rows(store, 'test', ['x', 'y'], restart=True) == ['x', 'y']
+
+
+def test_make_checkpoint_store(tmpdir):
+    path = str(tmpdir.join('sub', 'checkpoints.db'))
+    store = make_checkpoint_store({'IMPORT_CHECKPOINT_PATH': path})
+    assert store.path == path
+    assert store.get('test') is None
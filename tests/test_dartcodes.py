@@ -0,0 +1,69 @@
+import unicodedata
+
+import pytest
+
+from finance.dartcodes import (DartCodeRegistry, get_dart_code_registry,
+                               normalize_name)
+
+
+@pytest.fixture
+def registry():
+    return DartCodeRegistry([
+        ('삼성전자', '00126380'),
+        ('삼성전기', '00126371'),
+        ('삼성 SDI', '00126362'),
+        ('SK', '00181712'),
+        ('SK하이닉스', '00164779'),
+        ('SK', '00000001'),  # A different entity with the same name
+    ])
+
+
+def test_normalize_name():
+    decomposed = unicodedata.normalize('NFD', '삼성전자')
+    assert decomposed != '삼성전자'
+    assert normalize_name(decomposed) == '삼성전자'
+    assert normalize_name(' 삼성 SDI ') == '삼성sdi'
+
+
+def test_lookups(registry):
+    assert len(registry) == 6
+    assert registry.code('삼성전자') == '00126380'
+    assert registry.code('SK') == '00181712'
+    assert registry.code('삼성sdi') == '00126362'
+    assert registry.code(unicodedata.normalize('NFD', '삼성전기')) == \
+        '00126371'
+    assert 'sk하이닉스' in registry
+    assert registry.get('LG') is None
+
+    with pytest.raises(ValueError):
+        registry.code('LG')
+
+    assert registry.name('00164779') == 'SK하이닉스'
+    with pytest.raises(ValueError):
+        registry.name('99999999')
+
+
+def test_search_prefix(registry):
+    assert registry.search_prefix('삼성') == [
+        ('삼성 SDI', '00126362'),
+        ('삼성전기', '00126371'),
+        ('삼성전자', '00126380'),
+    ]
+    assert registry.search_prefix('삼성 전', limit=1) == \
+        [('삼성전기', '00126371')]
+    assert registry.search_prefix('sk') == \
+        [('SK', '00181712'), ('SK하이닉스', '00164779')]
+    assert registry.search_prefix('LG') == []
+
+
+def test_resolve(registry):
+    resolved, missing = registry.resolve(['SK하이닉스', 'LG', '삼성전자'])
+    assert list(resolved.items()) == \
+        [('SK하이닉스', '00164779'), ('삼성전자', '00126380')]
+    assert missing == ['LG']
+
+
+def test_get_dart_code_registry():
+    registry = get_dart_code_registry()
+    assert registry is get_dart_code_registry()
+    assert registry.code('넷마블게임즈') == '00904672'
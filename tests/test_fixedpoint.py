@@ -0,0 +1,112 @@
+import collections
+import functools
+import operator
+import random
+from decimal import Decimal
+
+import pytest
+
+from finance.exceptions import AssetValueUnavailableException
+from finance.fixedpoint import (accumulate_balance, from_fixed,
+                                from_fixed_product, merge_balances, net_worth,
+                                to_fixed)
+
+SEEDS = range(20)
+
+
+def random_decimal(rng, digits=12):
+    """Makes a number that fits in a ``Numeric(20, 4)`` column."""
+    return Decimal(rng.randint(-10 ** digits, 10 ** digits)).scaleb(-4)
+
+
+def random_balance(rng, asset_ids):
+    return {asset_id: random_decimal(rng)
+            for asset_id in rng.sample(asset_ids, rng.randint(0, 5))}
+
+
+def test_to_fixed():
+    assert to_fixed(Decimal('921.7600')) == 9217600
+    assert to_fixed(Decimal('-0.0001')) == -1
+    assert to_fixed(1000) == 10000000
+    assert to_fixed(921.76) == 9217600
+    assert to_fixed('1.5') == 15000
+
+    with pytest.raises(ValueError):
+        to_fixed(Decimal('0.00001'))
+
+
+def test_from_fixed():
+    assert from_fixed(9217600) == Decimal('921.7600')
+    assert str(from_fixed(-1)) == '-0.0001'
+    assert from_fixed_product(92176000000) == Decimal('921.76')
+    assert str(from_fixed_product(92176000000)) == '921.7600'
+    assert str(from_fixed_product(-1)) == '-1E-8'
+    assert from_fixed_product(0) == 0
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_round_trip(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        value = random_decimal(rng, digits=rng.randint(1, 20))
+        assert from_fixed(to_fixed(value)) == value
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_accumulate_balance(seed):
+    rng = random.Random(seed)
+    records = [(rng.choice('abc'), random_decimal(rng), rng.random() < 0.1)
+               for _ in range(100)]
+
+    expected, balance = {}, {}
+    for key, quantity, adjustment in records:
+        if adjustment:
+            expected[key] = quantity
+        else:
+            expected[key] = expected.get(key, 0) + quantity
+        accumulate_balance(balance, key, to_fixed(quantity), adjustment)
+
+    assert {k: from_fixed(v) for k, v in balance.items()} == expected
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_merge_balances(seed):
+    rng = random.Random(seed)
+    asset_ids = list(range(8))
+    balances = [random_balance(rng, asset_ids)
+                for _ in range(rng.randint(1, 6))]
+
+    # What `Portfolio.balance()` used to do
+    expected = functools.reduce(
+        operator.add, map(collections.Counter, balances))
+    merged = merge_balances(
+        {k: to_fixed(v) for k, v in b.items()} for b in balances)
+
+    assert {k: from_fixed(v) for k, v in merged.items()} == expected
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_net_worth(seed):
+    rng = random.Random(seed)
+    base_asset_id, asset_ids = 0, list(range(1, 8))
+    balance = random_balance(rng, [base_asset_id] + asset_ids)
+    closes = {asset_id: abs(random_decimal(rng, digits=10))
+              for asset_id in asset_ids}
+
+    # What `Account.net_worth()` used to do
+    expected = 0
+    for asset_id, quantity in balance.items():
+        if asset_id == base_asset_id:
+            expected += quantity
+        else:
+            expected += closes[asset_id] * quantity
+
+    actual = from_fixed_product(net_worth(
+        ((k, to_fixed(v)) for k, v in balance.items()),
+        {k: to_fixed(v) for k, v in closes.items()}, base_asset_id))
+    assert actual == expected
+
+
+def test_net_worth_without_close():
+    with pytest.raises(AssetValueUnavailableException):
+        net_worth([(1, 10000)], {}, 0)
@@ -0,0 +1,85 @@
+from datetime import date, timedelta
+
+import pytest
+
+from finance.generators import (
+    IDAllocator, MARKET_MINUTES, generate_dataset, load_stock_universe,
+    market_minute, seeded_random, simulate_minute_bars, trading_days)
+from finance.models import Account, AssetValue, Granularity, Record
+
+
+def test_id_allocator():
+    allocator = IDAllocator()
+    ids = allocator.issue(100) + allocator.issue(100)
+    assert len(set(ids)) == 200
+    assert ids == sorted(ids)
+
+    # The node ID must be preserved
+    assert len(set(i & 0xFFFF for i in ids)) == 1
+
+
+def test_trading_days():
+    days = list(trading_days(date(2018, 9, 1), date(2018, 9, 15)))
+    assert len(days) == 10
+    assert all(d.weekday() < 5 for d in days)
+
+
+def test_market_minute():
+    rng = seeded_random(0, 'test')
+    minutes = [market_minute(rng) for _ in range(1000)]
+    assert all(0 <= m < MARKET_MINUTES for m in minutes)
+
+    # Trades must be clustered around the open and the close
+    edges = [m for m in minutes if m < 60 or m >= MARKET_MINUTES - 60]
+    assert len(edges) > len(minutes) / 2
+
+
+def test_simulate_minute_bars_reproducible():
+    days = list(trading_days(date(2018, 9, 3), date(2018, 9, 5)))
+    bars1 = list(simulate_minute_bars(seeded_random(1, 'p'), 1000.0, days))
+    bars2 = list(simulate_minute_bars(seeded_random(1, 'p'), 1000.0, days))
+    assert bars1 == bars2
+
+    for _, bars in bars1:
+        assert len(bars) == MARKET_MINUTES
+        for minute, open_, high, low, close_, volume in bars:
+            assert low <= open_ <= high
+            assert low <= close_ <= high
+
+
+def test_load_stock_universe():
+    with open('stock_codes.csv') as fin:
+        stocks1 = load_stock_universe(fin, 5, seed=3)
+    with open('stock_codes.csv') as fin:
+        stocks2 = load_stock_universe(fin, 5, seed=3)
+    assert stocks1 == stocks2
+    assert len(stocks1) == 5
+
+
+def test_generate_dataset(db):
+    end_date = date(2018, 9, 15)
+    start_date = end_date - timedelta(days=7)
+
+    with open('stock_codes.csv') as fin:
+        counts = generate_dataset(
+            fin, seed=7, account_count=3, record_count=30, stock_count=2,
+            start_date=start_date, end_date=end_date, batch_size=500)
+
+    days = len(list(trading_days(start_date, end_date)))
+    # Two stocks and four foreign currencies
+    assert counts['asset_value'] == 6 * days * (MARKET_MINUTES + 1)
+    assert AssetValue.query.filter_by(granularity=Granularity.day).count() \
+        == 6 * days
+    assert counts['account'] == 3
+    assert counts['portfolio'] == 1
+    assert counts['record'] == Record.query.count()
+
+    accounts = Account.query.filter_by(institution='Synthetic-7').all()
+    assert len(accounts) == 3
+    for account in accounts:
+        assert account.records.count() > 1
+
+    with pytest.raises(ValueError):
+        with open('stock_codes.csv') as fin:
+            generate_dataset(fin, seed=7, account_count=3, record_count=30,
+                             start_date=start_date, end_date=end_date)
@@ -1,7 +1,15 @@
 from decimal import Decimal
 
-from finance.importers import import_miraeasset_foreign_records
-from finance.models import Asset
+import pytest
+
+from finance.__main__ import insert_stock_assets
+from finance.exceptions import (AccountNotFoundException,
+                                AssetNotFoundException)
+from finance.importers import (
+    find_export_files, import_broker_exports,
+    import_miraeasset_foreign_records, import_shinhancard_statements,
+    import_stock_records, sync_stock_assets)
+from finance.models import Account, Asset, StockAsset, db
 
 
 def test_import_miraeasset_foreign_records(
@@ -10,6 +18,61 @@ def test_import_miraeasset_foreign_records(
 ):
     with open('tests/samples/miraeasset_foreign.csv') as fin:
         import_miraeasset_foreign_records(fin, account_stock)
+    count = account_stock.records.count()
+
+    # Trades that have been imported already are rolled back one by one
+    with open('tests/samples/miraeasset_foreign.csv') as fin:
+        import_miraeasset_foreign_records(fin, account_stock)
+    assert account_stock.records.count() == count
+
+    balance = account_stock.balance()
+    balance_sheet = [
+        ('USD', -483.39),
+        ('AMD', 22),
+        ('SPY', 5),
+        ('SBUX', 2),
+        ('AMZN', 3),
+        ('NVDA', 13),
+    ]
+    for symbol, amount in balance_sheet:
+        asset = Asset.get_by_symbol(symbol)
+        assert balance[asset] == Decimal(str(amount))
+
+
+def split_export(path, directory, count):
+    with open(path) as fin:
+        header, *lines = fin.readlines()
+    size = -(-len(lines) // count)
+    for i in range(count):
+        directory.join('{}.csv'.format(i)).write(
+            ''.join([header] + lines[i * size:(i + 1) * size]))
+
+
+def test_find_export_files(tmpdir):
+    for name in ['b.csv', 'a.csv', '.hidden', 'c.txt']:
+        tmpdir.join(name).write('')
+    tmpdir.mkdir('sub')
+    assert find_export_files([str(tmpdir), str(tmpdir.join('*.csv'))]) == \
+        [str(tmpdir.join(name)) for name in ['a.csv', 'b.csv', 'c.txt']]
+    assert find_export_files([str(tmpdir.join('*.xls'))]) == []
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_import_broker_exports(
+    tmpdir, jobs, asset_usd, asset_krw, account_stock, stock_asset_spy,
+    stock_asset_amzn, stock_asset_nvda, stock_asset_amd, stock_asset_sbux
+):
+    split_export('tests/samples/miraeasset_foreign.csv', tmpdir, 3)
+    paths = find_export_files([str(tmpdir)])
+    reports = []
+
+    result = import_broker_exports(
+        paths, 'miraeasset', {'stock': account_stock}, jobs=jobs,
+        batch_size=4, progress=reports.append)
+    assert result.files == 3
+    assert result.inserted == result.entries == account_stock.records.count()
+    assert [r.path for r in reports] == paths
+    assert [r.files for r in reports] == [1, 2, 3]
 
     balance = account_stock.balance()
     balance_sheet = [
@@ -23,3 +86,118 @@ def test_import_miraeasset_foreign_records(
     for symbol, amount in balance_sheet:
         asset = Asset.get_by_symbol(symbol)
         assert balance[asset] == Decimal(str(amount))
+
+    # Records that already exist are skipped
+    result = import_broker_exports(
+        paths, 'miraeasset', {'stock': account_stock}, jobs=jobs)
+    assert result.inserted == 0
+
+    for record in account_stock.records:
+        db.session.delete(record)
+    db.session.commit()
+
+
+def test_import_stock_records(asset_krw, account_stock, account_checking):
+    assets = list(insert_stock_assets())
+    try:
+        with open('tests/samples/shinhan_stock_records.csv') as fin:
+            count = import_stock_records(
+                fin, account_stock, account_checking, batch_size=5)
+        assert count > 0
+        assert account_stock.records.count() + \
+            account_checking.records.count() == count
+        assert account_stock.balance()[Asset.get_by_symbol('145210.KS')] > 0
+
+        # Records that already exist are skipped
+        with open('tests/samples/shinhan_stock_records.csv') as fin:
+            assert import_stock_records(
+                fin, account_stock, account_checking) == 0
+    finally:
+        for asset in assets:
+            db.session.delete(asset)
+        db.session.commit()
+
+
+def test_import_stock_records_with_unknown_assets(
+        asset_krw, account_stock, account_checking):
+    assert Asset.query.filter(Asset.code == '145210.KS').first() is None
+    with pytest.raises(AssetNotFoundException):
+        with open('tests/samples/shinhan_stock_records.csv') as fin:
+            import_stock_records(fin, account_stock, account_checking)
+    assert account_stock.records.count() == 0
+
+
+def test_import_stock_records_without_accounts(asset_krw, account_stock):
+    with pytest.raises(AccountNotFoundException):
+        with open('tests/samples/shinhan_stock_records.csv') as fin:
+            import_stock_records(fin, account_stock, None)
+    assert account_stock.records.count() == 0
+
+    with pytest.raises(AccountNotFoundException):
+        import_broker_exports(
+            ['tests/samples/shinhan_stock_records.csv'], 'shinhan',
+            {'bank': None, 'stock': account_stock}, jobs=1)
+
+
+def test_import_shinhancard_statements(asset_krw):
+    cards = [Account.create(type='credit card', name='신한카드 {}'.format(i))
+             for i in range(2)]
+    sample = 'tests/samples/shinhancard_statement.csv'
+    try:
+        with open(sample) as fin1, open(sample) as fin2:
+            count = import_shinhancard_statements(
+                [(cards[0], fin1), (cards[1], fin2)], batch_size=3)
+        # Identical charges of a day are kept apart
+        assert count == 8
+        for card in cards:
+            assert card.balance()[asset_krw] == -44410
+            assert {r.category for r in card.records} == \
+                {'스타벅스 강남점', '이마트 성수점', '쿠팡 (취소)'}
+
+        with open(sample) as fin:
+            assert import_shinhancard_statements([(cards[0], fin)]) == 0
+    finally:
+        for card in cards:
+            card.records.delete()
+            db.session.delete(card)
+        db.session.commit()
+
+
+def test_sync_stock_assets(stock_asset_ncsoft, stock_asset_nvda):
+    delisted = StockAsset.create(code='999991.KQ', name='상장폐지')
+    try:
+        changes = sync_stock_assets([
+            ('036570.KS', '엔씨소프트'),
+            ('999990.KS', '신규상장'),
+        ])
+        assert changes.inserted == ['999990.KS']
+        assert '036570.KS' in changes.updated
+        assert '999991.KQ' in changes.delisted
+
+        db.session.expire_all()
+        assert stock_asset_ncsoft.name == '엔씨소프트'
+        assert stock_asset_ncsoft.delisted_at is None
+        assert Asset.get_by_symbol('999990.KS').type == 'stock'
+        assert delisted.delisted_at is not None
+        # Non-KRX stocks are left alone
+        assert stock_asset_nvda.delisted_at is None
+
+        # Nothing changes when synced again, and a relisted asset comes back
+        changes = sync_stock_assets([
+            ('036570.KS', '엔씨소프트'),
+            ('999990.KS', '신규상장'),
+            ('999991.KQ', '상장폐지'),
+        ])
+        assert changes.inserted == []
+        assert changes.updated == ['999991.KQ']
+        db.session.expire_all()
+        assert delisted.delisted_at is None
+    finally:
+        Asset.query.filter(Asset.code.in_(['999990.KS', '999991.KQ'])) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+
+def test_sync_stock_assets_without_codes():
+    with pytest.raises(ValueError):
+        sync_stock_assets([])
@@ -0,0 +1,45 @@
+import subprocess
+import sys
+
+from finance.importtime import (ImportTime, measure, parse_importtime,
+                                summarize)
+
+
+def test_parse_importtime():
+    lines = [
+        'import time: self [us] | cumulative | imported package',
+        'import time:       100 |        100 |   _json',
+        'import time:       300 |        400 | json',
+        'import time:        50 |         50 |   requests.compat',
+        'import time:       200 |        250 | requests',
+        'Traceback (most recent call last):',
+    ]
+    imports = list(parse_importtime(lines))
+    assert imports == [
+        ImportTime('_json', 100, 100, 1),
+        ImportTime('json', 300, 400, 0),
+        ImportTime('requests.compat', 50, 50, 1),
+        ImportTime('requests', 200, 250, 0),
+    ]
+
+    total, heaviest = summarize(imports, top=1)
+    assert total == 650
+    assert heaviest == [('json', 400)]
+
+
+def test_measure():
+    wall_time, imports = measure(['-c', 'import json'])
+    assert wall_time > 0
+    assert 'json' in [i.module for i in imports]
+
+
+def test_cli_startup_imports():
+    """The CLI should not load heavy dependencies until a command needs
+    them."""
+    heavy = ['boto3', 'flask', 'flask_admin', 'sqlalchemy']
+    output = subprocess.check_output([
+        sys.executable, '-c',
+        'import sys, finance.__main__; '
+        'print(",".join(m for m in {!r} if m in sys.modules))'.format(heavy)],
+        universal_newlines=True)
+    assert output.strip() == ''
@@ -0,0 +1,67 @@
+import os
+
+import logbook
+
+from finance import create_app
+from finance.instrumentation import (
+    Profile, SLOWEST_STATEMENT_COUNT, current_profile, finish_profile,
+    start_profile)
+from finance.models import Account, db
+
+
+def test_profile():
+    profile = Profile('test')
+    for i in range(10):
+        profile.record('SELECT {}'.format(i), i / 1000.0)
+    profile.finish()
+
+    assert profile.statement_count == 10
+    assert abs(profile.db_time - 0.045) < 1e-9
+
+    slowest = profile.slowest_statements()
+    assert len(slowest) == SLOWEST_STATEMENT_COUNT
+    assert [s for _, s in slowest][:2] == ['SELECT 9', 'SELECT 8']
+
+    timing = profile.server_timing()
+    assert timing.startswith('db;dur=45.00;desc="10 SQL statements"')
+    assert 'total;dur=' in timing
+    assert timing.endswith('memo;desc="0 computations saved"')
+
+
+def test_profile_statements(account_checking):
+    profile = start_profile('test')
+    assert current_profile() is profile
+
+    Account.query.all()
+    Account.query.all()
+
+    finish_profile(profile)
+    assert current_profile() is None
+    assert profile.statement_count == 2
+    assert profile.db_time > 0
+
+    # Statements are not recorded once the profile has been finished
+    Account.query.all()
+    assert profile.statement_count == 2
+
+
+def test_server_timing_header(portfolio):
+    app = create_app(__name__, config={
+        'SQLALCHEMY_DATABASE_URI': os.environ['TEST_DB_URL'],
+        'INSTRUMENTATION': True,
+    })
+    # Makes sure the portfolio is actually loaded from the database
+    url = '/portfolios/{}/nav'.format(portfolio.id)
+    db.session.expire_all()
+
+    with logbook.TestHandler() as handler:
+        with app.test_client() as client:
+            resp = client.get(url)
+
+    assert resp.status_code == 200
+    assert resp.headers['Server-Timing'].startswith('db;dur=')
+
+    records = [r for r in handler.records if 'statement_count' in r.extra]
+    assert len(records) == 1
+    assert records[0].extra['statement_count'] >= 1
+    assert records[0].extra['name'].endswith('/nav')
@@ -1,5 +1,84 @@
+from finance.models import deposit
+from finance.utils import parse_date
 
 
 def test_portfolios_nav(testapp, portfolio):
     resp = testapp.get('/portfolios/{}/nav'.format(portfolio.id))
     assert resp.status_code == 200
+
+
+def test_portfolios_nav_json(testapp, portfolio, account_checking,
+                             asset_krw):
+    deposit(account_checking, asset_krw, 1000, parse_date('2016-01-02'))
+
+    resp = testapp.get('/portfolios/{}/nav?start=2016-01-01&end=2016-01-04'
+                       .format(portfolio.id))
+    assert resp.status_code == 200
+    assert resp.get_json()['nav'] == [
+        {'date': '2016-01-01', 'nav': 0.0},
+        {'date': '2016-01-02', 'nav': 1000.0},
+        {'date': '2016-01-03', 'nav': 1000.0},
+    ]
+
+
+def test_portfolios_nav_csv(testapp, portfolio, account_checking,
+                            asset_krw):
+    deposit(account_checking, asset_krw, 1000, parse_date('2016-01-02'))
+
+    resp = testapp.get('/portfolios/{}/nav?start=2016-01-01&end=2016-01-03'
+                       .format(portfolio.id), headers={'Accept': 'text/csv'})
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/csv'
+    assert resp.get_data(as_text=True).splitlines() == [
+        'date,nav', '2016-01-01,0', '2016-01-02,1000.0000']
+
+
+def test_portfolios_nav_etag(testapp, portfolio, account_checking,
+                             asset_krw):
+    url = '/portfolios/{}/nav?start=2016-01-01&end=2016-01-04'.format(
+        portfolio.id)
+    resp = testapp.get(url)
+    etag = resp.headers['ETag']
+
+    resp = testapp.get(url, headers={'If-None-Match': etag})
+    assert resp.status_code == 304
+
+    deposit(account_checking, asset_krw, 1000, parse_date('2016-01-02'))
+
+    resp = testapp.get(url, headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.headers['ETag'] != etag
+    assert resp.get_json()['nav'][-1]['nav'] == 1000.0
+
+
+def test_portfolios_nav_not_found(testapp):
+    resp = testapp.get('/portfolios/1/nav')
+    assert resp.status_code == 404
+
+
+def test_portfolios_nav_bad_request(testapp, portfolio):
+    url = '/portfolios/{}/nav'.format(portfolio.id)
+    assert testapp.get(url + '?start=2016-01-10&end=2016-01-01') \
+        .status_code == 400
+    assert testapp.get(url + '?start=yesterday').status_code == 400
+    assert testapp.get(url + '?format=xml').status_code == 400
+
+
+def test_search_dart_reports(testapp, dart_reports):
+    resp = testapp.get('/dart_reports/search?q=유상증자&per_page=1')
+    assert resp.status_code == 200
+
+    data = resp.get_json()
+    assert data['total'] == 2
+    assert data['per_page'] == 1
+    hit, = data['hits']
+    assert hit['id'] == dart_reports[0].id
+    assert hit['registered_at'] == '2018-01-02T00:00:00'
+    assert '유상증자' in hit['snippet']
+
+
+def test_search_dart_reports_bad_request(testapp):
+    assert testapp.get('/dart_reports/search').status_code == 400
+    assert testapp.get('/dart_reports/search?q=a&page=0').status_code == 400
+    assert testapp.get(
+        '/dart_reports/search?q=a&per_page=1000').status_code == 400
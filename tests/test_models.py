@@ -1,4 +1,6 @@
+import zlib
 from datetime import datetime
+from decimal import Decimal
 
 import pytest
 from sqlalchemy.exc import IntegrityError
@@ -6,9 +8,10 @@ from sqlalchemy.exc import IntegrityError
 from finance.exceptions import (AssetNotFoundException,
                                 AssetValueUnavailableException)
 from finance.models import (
-    Account, Asset, AssetValue, Granularity, Portfolio, Record, RecordType,
-    Transaction, TransactionState, db, balance_adjustment, deposit,
-    get_asset_by_fund_code)
+    Account, Asset, AssetValue, DartReport, Granularity, Portfolio, Record,
+    RecordType, Transaction, TransactionState, UnitOfWork, db,
+    balance_adjustment, current_unit_of_work, deposit, get_asset_by_fund_code,
+    make_snippet, make_tsquery, stream_asset_values, stream_records)
 from finance.utils import parse_date, parse_datetime
 
 
@@ -204,6 +207,48 @@ def test_record_created_at(account_checking, asset_krw):
     assert record.created_at
 
 
+def test_unit_of_work(account_checking, asset_krw):
+    date = parse_date('2016-03-14')
+    with UnitOfWork() as uow:
+        assert current_unit_of_work() is uow
+        with pytest.raises(RuntimeError):
+            with UnitOfWork():
+                pass
+
+        with uow.savepoint():
+            with Transaction.create() as t:
+                deposit(account_checking, asset_krw, -1000, date, t)
+                deposit(account_checking, asset_krw, 1000, date, t)
+            assert t in db.session.new
+
+        # Only the trade that fails is rolled back
+        with uow.savepoint():
+            with Transaction.create() as t:
+                deposit(account_checking, asset_krw, 500, date, t)
+                deposit(account_checking, asset_krw, 1000, date, t)
+        with uow.savepoint():
+            deposit(account_checking, asset_krw, 300, date)
+
+        assert len(uow.failures) == 1
+        assert isinstance(uow.failures[0], IntegrityError)
+    assert current_unit_of_work() is None
+
+    db.session.rollback()  # Nothing to roll back, as it has been committed
+    assert sorted(r.quantity for r in account_checking.records) == \
+        [-1000, 300, 1000]
+
+
+def test_unit_of_work_with_errors(account_checking, asset_krw):
+    with pytest.raises(ValueError):
+        with UnitOfWork() as uow:
+            with uow.savepoint():
+                deposit(account_checking, asset_krw, 100)
+            with uow.savepoint():
+                raise ValueError()
+    assert current_unit_of_work() is None
+    assert account_checking.records.count() == 0
+
+
 def test_net_worth_without_asset_value(request, account_sp500, asset_krw,
                                        asset_sp500):
     asset_values = AssetValue.query.filter_by(asset=asset_sp500)
@@ -367,3 +412,183 @@ def test_record_type_enum():
 
     with pytest.raises(AttributeError):
         RecordType.steal
+
+
+def test_dart_report_search(dart_reports):
+    result = DartReport.search('유상증자')
+    assert result.total == 2
+    # The one that mentions it more often ranks higher
+    assert [h['id'] for h in result.hits] == \
+        [dart_reports[0].id, dart_reports[1].id]
+    assert '<b>유상증자를</b>' in result.hits[0]['snippet']
+
+    # Words are matched by prefixes and all of them are required
+    assert DartReport.search('자기주식 SK').total == 1
+    assert DartReport.search('자기주식 삼성').total == 0
+
+    page = DartReport.search('삼성전자', page=2, per_page=1)
+    assert page.total == 2
+    assert [h['id'] for h in page.hits] == [dart_reports[1].id]
+
+
+def test_dart_report_search_vector_update(dart_reports):
+    report = dart_reports[2]
+    report.content = '신규 시설투자를 결정하였습니다.'
+    db.session.commit()
+
+    assert DartReport.search('시설투자').total == 1
+    assert DartReport.search('자기주식').total == 1  # By its title
+    assert 'search_vector' not in dict(report)
+
+    # Only the title changes while the content is not loaded
+    db.session.expire_all()
+    report = DartReport.query.get(report.id)
+    report.title = '주요사항보고서(타법인주식취득결정)'
+    db.session.commit()
+
+    assert DartReport.search('타법인주식').total == 1
+    assert DartReport.search('시설투자').total == 1
+
+
+def test_dart_report_content(dart_reports):
+    content = dart_reports[0].content
+    stored = bytes(db.session.execute(
+        'SELECT content FROM dart_report WHERE id = :id',
+        {'id': dart_reports[0].id}).scalar())
+    assert len(stored) < len(content.encode('utf-8'))
+    assert zlib.decompress(stored).decode('utf-8') == content
+
+    # Bodies are not loaded until accessed
+    db.session.expire_all()
+    reports = DartReport.query.all()
+    assert all('content' not in r.__dict__ for r in reports)
+    assert 'content' not in dict(reports[0])
+    assert {r.content for r in reports} == {r.content for r in dart_reports}
+
+
+def test_bulk_create_and_upsert(asset_krw):
+    rows = [{'type': 'stock', 'code': '99999{}.KS'.format(i),
+             'name': 'Stock {}'.format(i)} for i in range(3)]
+    try:
+        ids = Asset.bulk_create(rows, batch_size=2)
+        assert len(set(ids)) == 3
+        assert Asset.get(ids[0]).code == '999990.KS'
+
+        # Existing assets are skipped or updated
+        assert Asset.bulk_create(rows, conflict_columns=['code']) == []
+        rows[0]['name'] = 'Renamed'
+        assert Asset.bulk_upsert(
+            rows[:1] + [{'type': 'stock', 'code': '999993.KS'}],
+            conflict_columns=['code'])[0] == ids[0]
+        db.session.expire_all()
+        assert Asset.get(ids[0]).name == 'Renamed'
+
+        values = [{'asset_id': ids[0], 'base_asset_id': asset_krw.id,
+                   'evaluated_at': parse_date('2018-01-0{}'.format(d)),
+                   'granularity': Granularity.day, 'close': 100 * d}
+                  for d in range(1, 4)]
+        conflict_columns = ['asset_id', 'evaluated_at', 'granularity']
+        assert len(AssetValue.bulk_create(values)) == 3
+        assert AssetValue.bulk_create(values, conflict_columns) == []
+        values[0]['close'] = 150
+        AssetValue.bulk_upsert(values[:1], conflict_columns,
+                               update_columns=['close'])
+        assert AssetValue.query.filter_by(asset_id=ids[0]) \
+            .order_by(AssetValue.evaluated_at).first().close == 150
+    finally:
+        AssetValue.query.filter_by(asset_id=ids[0]).delete()
+        Asset.query.filter(Asset.code.like('99999%.KS')).delete(
+            synchronize_session=False)
+        db.session.commit()
+
+
+def test_stream_records(account_checking, asset_krw):
+    for day in range(1, 6):
+        deposit(account_checking, asset_krw, 1000 * day,
+                parse_date('2018-01-0{}'.format(day)))
+
+    rows = list(stream_records([account_checking.id],
+                               until=parse_date('2018-01-04'), batch_size=2))
+    assert [r[2] for r in rows] == [1000, 2000, 3000, 4000]
+    assert rows[0] == (account_checking.id, asset_krw.id, 1000,
+                       RecordType.deposit, parse_date('2018-01-01'))
+    assert list(stream_records([])) == []
+
+
+def test_stream_asset_values(asset_sp500, asset_krw):
+    AssetValue.bulk_create([
+        {'asset_id': asset_sp500.id, 'base_asset_id': asset_krw.id,
+         'evaluated_at': parse_date('2018-01-0{}'.format(d)),
+         'granularity': Granularity.day, 'close': '1000.5'}
+        for d in range(1, 6)])
+    try:
+        rows = list(stream_asset_values(
+            [asset_sp500.id], Granularity.day, asset_krw.id,
+            since=parse_date('2018-01-01'), until=parse_date('2018-01-04'),
+            batch_size=2))
+        assert [r[1] for r in rows] == \
+            [parse_date('2018-01-0{}'.format(d)) for d in range(2, 5)]
+        assert rows[0][5] == Decimal('1000.5')
+
+        rows = list(stream_asset_values(
+            [asset_sp500.id], Granularity.day, asset_krw.id,
+            since=parse_date('2017-12-31'), as_float=True))
+        assert len(rows) == 5
+        assert type(rows[0][5]) is float and rows[0][5] == 1000.5
+    finally:
+        AssetValue.query.filter(
+            AssetValue.asset_id == asset_sp500.id,
+            AssetValue.evaluated_at >= parse_date('2018-01-01')).delete()
+        db.session.commit()
+
+
+def test_dart_report_bulk_upsert(dart_reports):
+    rows = [
+        {'id': 20180401000001, 'registered_at': parse_date('2018-04-01'),
+         'title': '주요사항보고서(자기주식처분결정)', 'entity_id': 164779,
+         'entity': 'SK하이닉스', 'reporter': 'SK하이닉스',
+         'content': '자기주식을 처분하기로 결정하였습니다.'},
+        {'id': dart_reports[2].id, 'title': '정정 주요사항보고서',
+         'entity_id': 164779, 'entity': 'SK하이닉스',
+         'content': '시설투자를 정정합니다.'},
+    ]
+    try:
+        assert DartReport.bulk_upsert(rows, batch_size=1) == \
+            [20180401000001, dart_reports[2].id]
+
+        db.session.expire_all()
+        assert DartReport.get(dart_reports[2].id).title == '정정 주요사항보고서'
+        assert DartReport.search('자기주식').total == 1
+        assert DartReport.search('시설투자 정정').total == 1
+
+        assert DartReport.latest_reports([164779, 1]) == {
+            164779: (max(20180401000001, dart_reports[2].id),
+                     parse_date('2018-04-01'))}
+    finally:
+        DartReport.query.filter_by(id=20180401000001).delete()
+        db.session.commit()
+
+
+def test_make_snippet():
+    content = '<p>삼성전자는 &amp; 이사회에서</p>' + '가나다 ' * 100 + \
+        '유상증자를 결정하였습니다.'
+    snippet = make_snippet(content, ['유상증자'], length=40)
+    assert snippet.startswith('가나다')
+    assert '<b>유상증자를</b> 결정하였습니다.' in snippet
+
+    assert make_snippet(content, ['이사회'], length=40).startswith(
+        '삼성전자는 &amp; <b>이사회에서</b> 가나다')
+    assert make_snippet(None, ['이사회']) == ''
+
+    # Entities that are unescaped along the way must not turn into markup
+    content = '<p>&lt;script&gt;alert(1)&lt;/script&gt; 유상증자 결정</p>'
+    assert make_snippet(content, ['유상증자']) == \
+        '&lt;script&gt;alert(1)&lt;/script&gt; <b>유상증자</b> 결정'
+
+
+def test_make_tsquery():
+    assert make_tsquery('유상증자') == "'유상증자':*"
+    assert make_tsquery("a & (b | !c):* 'd'") == \
+        "'a':* & 'b':* & 'c':* & 'd':*"
+    assert make_tsquery(' & ') == ''
+    assert DartReport.search('&').total == 0
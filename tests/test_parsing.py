@@ -0,0 +1,79 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from finance.parsing import (
+    benchmark, FAST_DATE_FORMATS, parse_amount, parse_date, parse_decimal,
+    parse_int, try_parse_date)
+
+
+@pytest.mark.parametrize('value, format', [
+    ('2016-02-22', '%Y-%m-%d'),
+    ('20160222', '%Y%m%d'),
+    ('2016/02/22', '%Y/%m/%d'),
+    ('2016.02.22', '%Y.%m.%d'),
+    ('16.02.22', '%y.%m.%d'),
+    ('70.02.22', '%y.%m.%d'),
+    ('20160222.000003', '%Y%m%d.%f'),
+    ('20160222.5', '%Y%m%d.%f'),
+    ('2016-02-22 13:04:05', '%Y-%m-%d %H:%M:%S'),
+])
+def test_parse_date_fast_paths(value, format):
+    assert format in FAST_DATE_FORMATS
+    assert parse_date(value, format) == datetime.strptime(value, format)
+
+
+@pytest.mark.parametrize('value, format', [
+    ('2016-2-2', '%Y-%m-%d'),  # Not a fast path, but strptime() accepts it
+    ('22/02/2016', '%d/%m/%Y'),
+])
+def test_parse_date_fallback(value, format):
+    assert parse_date(value, format) == datetime.strptime(value, format)
+
+
+@pytest.mark.parametrize('value, format', [
+    ('2016-02-30', '%Y-%m-%d'),
+    ('20161322', '%Y%m%d'),
+    ('2016.02.22', '%Y-%m-%d'),
+])
+def test_parse_date_invalid(value, format):
+    with pytest.raises(ValueError):
+        parse_date(value, format)
+
+
+def test_try_parse_date():
+    assert try_parse_date('18.01.23', '%y.%m.%d') == datetime(2018, 1, 23)
+    assert try_parse_date('18.02.30', '%y.%m.%d') is None
+    assert try_parse_date('이용일자', '%y.%m.%d') is None
+
+
+def test_parse_int_and_decimal():
+    assert parse_int(' -12 ') == -12
+    assert parse_int('  ') == 0
+    assert parse_int('1.1', fallback_to=None) is None
+    assert parse_decimal('.5') == 0.5
+    assert parse_decimal('1.5', Decimal) == Decimal('1.5')
+    assert parse_decimal('1e3') == 1000.0
+    assert parse_decimal('', fallback_to=None) is None
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('1,234,567', Decimal(1234567)),
+    (' -12,000 ', Decimal(-12000)),
+    ('300', Decimal(300)),
+    ('1,234.5', Decimal('1234.5')),
+    ('1,23', None),
+    ('12,3456', None),
+    ('', None),
+    ('합계', None),
+])
+def test_parse_amount(value, expected):
+    assert parse_amount(value) == expected
+
+
+def test_benchmark():
+    results = benchmark(100)
+    assert [name for name, _, _ in results] == \
+        ['parse_date', 'extract_numbers', 'parse_int']
+    assert all(before > 0 and after > 0 for _, before, after in results)
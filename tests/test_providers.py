@@ -5,7 +5,7 @@ from datetime import datetime, time, timedelta
 import pytest
 
 from finance.models import Granularity
-from finance.providers import Dart, Kofia, Miraeasset
+from finance.providers import Dart, Kofia, Miraeasset, ShinhanCard
 from finance.providers.dart import Report as DartReport
 from finance.providers.record import Decimal, Float
 from finance.providers.yahoo import Yahoo
@@ -141,3 +141,20 @@ def test_yahoo_provider_with_invalid_symbol():
 
     with pytest.raises(ValueError):
         provider.asset_values(symbol, start_time, end_time, Granularity.day)
+
+
+def test_shinhancard_parse_statement():
+    provider = ShinhanCard()
+    with open('tests/samples/shinhancard_statement.csv') as fin:
+        records = list(provider.parse_statement(fin))
+
+    assert len(records) == 4
+    assert records[0].date == datetime(2018, 1, 3)
+    assert records[0].description == '스타벅스 강남점'
+    assert records[0].amount == decimal.Decimal(5600)
+    assert records[3].amount == decimal.Decimal(-12000)
+
+    # Short rows and rows that are not charges are skipped
+    assert provider.parse_row(['18.01.03', '', '가맹점']) is None
+    assert provider.parse_row(['합계', '', '', '', '', '', '44,410']) is None
+    assert provider.parse_row(['18.01.03', '', '', '', '', '', '1,23']) is None
@@ -0,0 +1,113 @@
+import os
+
+import pytest
+
+from finance.models import Account, Asset, AssetValue, db
+from finance.replica import (LagMonitor, get_lag_monitor, make_lag_query,
+                             read_only)
+
+
+@pytest.fixture
+def replica(app):
+    """Uses the test database as its own replica, via a separate engine."""
+    binds = app.config['SQLALCHEMY_BINDS']
+    app.config['SQLALCHEMY_BINDS'] = dict(binds, **{
+        'replica': os.environ['TEST_DB_URL'],
+        'timeseries_replica': os.environ['TEST_DB_URL'],
+    })
+    yield db.get_engine(app, bind='replica')
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.extensions.pop('replica_lag_monitors', None)
+
+
+def test_read_only(replica):
+    session = db.session()
+    mapper = db.inspect(Account)
+    assert session.get_bind(mapper) is not replica
+
+    with read_only():
+        assert session.get_bind(mapper) is replica
+        with read_only():
+            assert session.get_bind(mapper) is replica
+        assert session.get_bind(mapper) is replica
+        assert Account.query.count() >= 0
+
+    assert session.get_bind(mapper) is not replica
+
+
+def test_read_only_without_replica():
+    session = db.session()
+    with read_only():
+        assert session.get_bind(db.inspect(Account)) is db.engine
+
+
+def test_read_only_after_write(replica):
+    session = db.session()
+    mapper = db.inspect(Account)
+
+    with read_only():
+        Asset.create(type='currency', code='XYZ', commit=False)
+        assert Asset.query.filter_by(code='XYZ').count() == 1
+        # Stays on the primary until the transaction is over
+        assert session.get_bind(mapper) is not replica
+
+        db.session.rollback()
+        assert session.get_bind(mapper) is replica
+        assert Asset.query.filter_by(code='XYZ').count() == 0
+
+
+def test_read_only_after_core_write(replica):
+    session = db.session()
+    mapper = db.inspect(Account)
+
+    with read_only():
+        Asset.bulk_create([{'type': 'currency', 'code': 'XYZ'}],
+                          commit=False)
+        assert session.get_bind(mapper) is not replica
+        assert Asset.query.filter_by(code='XYZ').count() == 1
+
+        # Writes before a savepoint outlive it
+        db.session.begin_nested()
+        db.session.rollback()
+        assert session.get_bind(mapper) is not replica
+
+        db.session.rollback()
+        assert session.get_bind(mapper) is replica
+
+
+def test_read_only_generator(replica):
+    session = db.session()
+
+    @read_only
+    def binds():
+        yield session.get_bind(db.inspect(Account))
+
+    assert list(binds()) == [replica]
+    assert session.get_bind(db.inspect(Account)) is not replica
+
+
+def test_replica_lag(app, replica):
+    monitor = get_lag_monitor(app)
+    assert monitor.is_acceptable(replica)
+    # The test database is not a standby
+    assert monitor.lag == 0
+
+    app.extensions['replica_lag_monitors']['replica'] = LagMonitor(-1, 60)
+    with read_only():
+        assert db.session().get_bind(db.inspect(Account)) is not replica
+
+
+def test_read_only_timeseries(app, replica):
+    session = db.session()
+    mapper = db.inspect(AssetValue)
+    assert session.get_bind(mapper) is db.get_engine(app, bind='timeseries')
+
+    with read_only():
+        assert session.get_bind(mapper) is \
+            db.get_engine(app, bind='timeseries_replica')
+
+
+def test_make_lag_query():
+    assert 'pg_last_xlog_replay_location()' in make_lag_query((9, 6, 10))
+    assert 'pg_last_wal_replay_lsn()' in make_lag_query((10, 5))
+    assert 'pg_last_wal_replay_lsn()' in make_lag_query(None)
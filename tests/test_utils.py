@@ -1,3 +1,4 @@
+import io
 import os
 import re
 import types
@@ -9,7 +10,8 @@ from finance.utils import (DictReader, date_range, date_to_datetime,
                            extract_numbers, get_dart_code, get_dart_codes,
                            insert_stock_record, parse_date, parse_datetime,
                            parse_decimal, parse_int, parse_stock_code,
-                           parse_stock_records, serialize_datetime)
+                           parse_stock_records, read_json_lines,
+                           serialize_datetime)
 
 BASE_PATH = os.path.abspath(os.path.dirname(__file__))
 PROJECT_PATH = os.path.abspath(os.path.join(BASE_PATH, '..'))
@@ -226,3 +228,18 @@ def test_serialize_datetime():
         serialize_datetime(None)
     with pytest.raises(TypeError):
         serialize_datetime('test')
+
+
+def test_read_json_lines():
+    fin = io.StringIO('{"id": 1}\n\n{"id": 2, "title": "[정정]"}\n')
+    rows = read_json_lines(fin)
+    assert isinstance(rows, types.GeneratorType)
+    assert list(rows) == [{'id': 1}, {'id': 2, 'title': '[정정]'}]
+
+    # A JSON array, which `fetch_dart` used to write, is also accepted
+    fin = io.StringIO('\n[{"id": 1},\n {"id": 2}]\n')
+    assert list(read_json_lines(fin)) == [{'id': 1}, {'id': 2}]
+
+    with pytest.raises(ValueError) as e:
+        list(read_json_lines(io.StringIO('{"id": 1}\n{"id": \n')))
+    assert str(e.value).startswith('Line 2:')
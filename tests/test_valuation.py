@@ -0,0 +1,121 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+from finance.exceptions import AssetValueUnavailableException
+from finance.models import (AssetValue, Granularity, balance_adjustment,
+                            deposit)
+from finance.utils import date_range, parse_date
+from finance.valuation import daily_net_worth, portfolio_version
+
+
+@pytest.fixture
+def sp500_values(request, db, asset_krw, asset_sp500):
+    closes = [
+        ('2016-02-22', 921.76),
+        ('2016-02-23', 921.06),
+        ('2016-02-24', 932.00),
+        ('2016-02-26', 921.77),
+    ]
+    values = [
+        AssetValue.create(
+            evaluated_at=parse_date(date), asset=asset_sp500,
+            base_asset=asset_krw, granularity=Granularity.day, close=close)
+        for date, close in closes]
+
+    def teardown():
+        for value in values:
+            db.session.delete(value)
+        db.session.commit()
+    request.addfinalizer(teardown)
+
+    return values
+
+
+def test_daily_net_worth(portfolio, account_checking, account_sp500,
+                         asset_krw, asset_sp500, sp500_values):
+    deposit(account_checking, asset_krw, 1000000, parse_date('2016-02-20'))
+    deposit(account_sp500, asset_sp500, 100, parse_date('2016-02-23'))
+    deposit(account_checking, asset_krw, -92106, parse_date('2016-02-23'))
+    deposit(account_sp500, asset_sp500, 50, parse_date('2016-02-25'))
+    balance_adjustment(
+        account_checking, asset_krw, 500000, parse_date('2016-02-27'))
+
+    start, end = '2016-02-21', '2016-03-02'
+    series = list(portfolio.daily_net_worth(start, end))
+
+    expected = [(date, portfolio.net_worth(date))
+                for date in date_range(start, end)]
+    assert series == expected
+    assert len(series) == 10
+    assert series[0][1] == 1000000
+    # The close of 02-24 is used for 02-25, as there is no value on that day
+    assert series[4][1] == 1000000 - 92106 + 150 * 932
+
+
+def test_daily_net_worth_relative_dates(portfolio, account_checking,
+                                        asset_krw):
+    deposit(account_checking, asset_krw, 1000, parse_date(-10))
+
+    series = list(portfolio.daily_net_worth(-30, 0))
+    assert len(series) == 30
+    assert series[0][1] == 0
+    assert series[-1][1] == 1000
+
+
+def test_daily_net_worth_without_asset_value(
+    portfolio, account_sp500, asset_sp500
+):
+    deposit(account_sp500, asset_sp500, 100, parse_date('2016-01-01'))
+
+    with pytest.raises(AssetValueUnavailableException):
+        list(daily_net_worth(portfolio.accounts, portfolio.base_asset,
+                             '2016-01-01', '2016-01-05'))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_daily_net_worth_matches_decimal(
+    request, db, seed, portfolio, account_checking, account_sp500, asset_krw,
+    asset_sp500
+):
+    rng = random.Random(seed)
+    dates = list(date_range('2017-03-01', '2017-03-11'))
+    closes = {d: Decimal(rng.randint(1, 10 ** 8)).scaleb(-4) for d in dates}
+    values = [AssetValue.create(
+        evaluated_at=d, asset=asset_sp500, base_asset=asset_krw,
+        granularity=Granularity.day, close=c) for d, c in closes.items()]
+
+    def teardown():
+        for value in values:
+            db.session.delete(value)
+        db.session.commit()
+    request.addfinalizer(teardown)
+
+    krw, sp500 = Decimal(0), Decimal(0)
+    expected = []
+    for d in dates:
+        for _ in range(rng.randint(0, 3)):
+            quantity = Decimal(rng.randint(-10 ** 9, 10 ** 9)).scaleb(-4)
+            if rng.random() < 0.5:
+                deposit(account_checking, asset_krw, quantity, d)
+                krw += quantity
+            else:
+                deposit(account_sp500, asset_sp500, quantity, d)
+                sp500 += quantity
+        expected.append((d, krw + closes[d] * sp500))
+
+    assert list(portfolio.daily_net_worth(dates[0], '2017-03-11')) == \
+        expected
+
+
+def test_portfolio_version(portfolio, account_checking, asset_krw):
+    version1 = portfolio_version(portfolio)
+    assert portfolio_version(portfolio) == version1
+
+    record = deposit(account_checking, asset_krw, 1000)
+    version2 = portfolio_version(portfolio)
+    assert version2 != version1
+
+    record.delete()
+    assert portfolio_version(portfolio) == version1